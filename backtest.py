@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+
+import metrics
+import pipeline
+import utilities as util
+
+
+class RecursiveLeastSquares:
+    """
+    Оценки МНК, которые обновляются при добавлении и удалении отдельных строк.
+
+    Хранится обратная матрица P = (XᵀX)⁻¹ и вектор коэффициентов. Добавление и удаление
+    строки выполняются по формуле Шермана-Моррисона за O(k²). Для защиты от накопления
+    ошибок округления параллельно ведутся суммы XᵀX и Xᵀy, по которым P и коэффициенты
+    периодически пересчитываются заново.
+
+    Пока матрица XᵀX вырождена (строк меньше, чем коэффициентов, или факторы линейно зависимы),
+    формула Шермана-Моррисона неприменима, и решение пересчитывается заново при каждом обновлении.
+    """
+
+    def __init__(self, features, target, refresh_every=1000):
+        self.gram = features.T @ features
+        self.cross = features.T @ target
+        self.refresh_every = refresh_every
+        self.updates = 0
+        self.refresh()
+
+    def refresh(self):
+        self.inverse = np.linalg.pinv(self.gram, hermitian=True)
+        self.coefficients = self.inverse @ self.cross
+        self.full_rank = np.linalg.matrix_rank(self.gram, hermitian=True) == len(self.gram)
+        self.updates = 0
+
+    def _update(self, row, value, sign):
+        self.gram += sign * np.outer(row, row)
+        self.cross += sign * row * value
+        self.updates += 1
+        if not self.full_rank or self.updates >= self.refresh_every:
+            self.refresh()
+            return
+
+        projected = self.inverse @ row
+        denominator = 1 + sign * (row @ projected)
+        if abs(denominator) < 1e-12:
+            # Обновление вырождено (например, строка полностью определяла один из коэффициентов)
+            self.refresh()
+            return
+        gain = projected / denominator
+        self.coefficients += sign * gain * (value - row @ self.coefficients)
+        self.inverse -= sign * np.outer(gain, projected)
+
+    def add(self, row, value):
+        self._update(row, value, 1)
+
+    def remove(self, row, value):
+        self._update(row, value, -1)
+
+
+def _target_lag_columns(column_for_predict, factor_names):
+    """Номера столбцов матрицы факторов (со столбцом констант) с лагами прогнозируемого столбца и их лаги."""
+    prefix = f'{column_for_predict}_lag_'
+    pairs = [(position + 1, int(name[len(prefix):])) for position, name in enumerate(factor_names)
+             if name.startswith(prefix) and name[len(prefix):].isdigit()]
+    return [position for position, _ in pairs], [lag for _, lag in pairs]
+
+
+def walk_forward(data, column_for_predict, factor_names, initial_train=None, horizon=1, step=1, window=None,
+                 refresh_every=1000):
+    """
+    Бэктест со скользящим началом прогноза (walk-forward).
+
+    Для каждой точки начала прогноза t модель обучается на строках до t
+    (расширяющееся окно [0, t) или скользящее окно [t - window, t)) и прогнозирует
+    строки t..t+horizon-1 рекурсивно, как forecast_horizon: факторы берутся фактические,
+    а лаги прогнозируемого столбца после точки t - из уже спрогнозированных значений,
+    поэтому прогноз на h шагов не использует факты, неизвестные в момент t. Между
+    точками модель не переобучается заново, а обновляется рекурсивным МНК: каждая
+    добавленная или удаленная строка стоит O(k²).
+
+    Parameters:
+    - data: DataFrame. Данные с лагами (результат create_lags).
+    - column_for_predict: str. Прогнозируемый столбец.
+    - factor_names: list. Столбцы модели без константы (см. model_factor_names).
+    - initial_train: int, optional. Количество строк обучения для первой точки. Для скользящего
+      окна первая точка - window, поэтому initial_train можно не указывать (если указан, должен
+      совпадать с window).
+    - horizon: int, optional. Количество прогнозируемых строк после каждой точки.
+    - step: int, optional. Шаг между точками начала прогноза в строках.
+    - window: int, optional. Размер скользящего окна; если не указан, окно расширяется.
+    - refresh_every: int, optional. Через сколько обновлений пересчитывать решение заново.
+
+    Returns:
+    - Tuple. DataFrame по точкам (origin, train_start, train_end, count, zero_actuals, метрики
+      metrics.METRICS, params) и DataFrame по горизонтам (horizon, count, zero_actuals, метрики).
+      MASE нормируется ошибкой наивного прогноза на первом окне обучения.
+    """
+    if window is not None:
+        if initial_train is not None and initial_train != window:
+            raise ValueError(f'Для скользящего окна первая точка обучения - window ({window}), '
+                             f'initial_train ({initial_train}) должен совпадать с ним или не указываться')
+        initial_train = window
+    if initial_train is None:
+        raise ValueError('Не указан initial_train или window')
+    if initial_train < 1 or horizon < 1 or step < 1:
+        raise ValueError('initial_train, horizon и step должны быть положительными')
+
+    row_count = len(data)
+    features = np.column_stack([np.ones(row_count), data[factor_names].to_numpy(dtype=np.float64)])
+    target = data[column_for_predict].to_numpy(dtype=np.float64)
+    lag_columns, lags = _target_lag_columns(column_for_predict, factor_names)
+    exogenous_columns = np.setdiff1d(np.arange(features.shape[1]), lag_columns)
+
+    # Масштабирование столбцов по первому окну улучшает обусловленность XᵀX
+    scale = np.sqrt((features[:initial_train] ** 2).mean(axis=0))
+    scale[scale == 0] = 1.0
+    features = features / scale
+
+    origins = np.arange(initial_train, row_count, step)
+    actual = np.full((len(origins), horizon), np.nan)
+    forecast = np.full((len(origins), horizon), np.nan)
+    params = np.empty((len(origins), features.shape[1]))
+    train_starts = np.empty(len(origins), dtype=np.int64)
+
+    estimator = RecursiveLeastSquares(features[:initial_train], target[:initial_train], refresh_every)
+    train_start, train_end = 0, initial_train
+
+    for fold, origin in enumerate(origins):
+        # Добавляем новые строки и, для скользящего окна, удаляем вышедшие из окна
+        for row in range(train_end, origin):
+            estimator.add(features[row], target[row])
+        train_end = origin
+        if window is not None:
+            for row in range(train_start, origin - window):
+                estimator.remove(features[row], target[row])
+            train_start = max(train_start, origin - window)
+
+        test_end = min(origin + horizon, row_count)
+        coefficients = estimator.coefficients
+        values = features[origin:test_end, exogenous_columns] @ coefficients[exogenous_columns]
+        for h in range(test_end - origin):
+            for column, lag in zip(lag_columns, lags):
+                # Лаг, попадающий в строки до точки начала, известен; более поздний - берется из прогноза
+                lag_value = features[origin + h, column] if lag > h else values[h - lag] / scale[column]
+                values[h] += lag_value * coefficients[column]
+        actual[fold, :test_end - origin] = target[origin:test_end]
+        forecast[fold, :test_end - origin] = values
+        params[fold] = coefficients
+        train_starts[fold] = train_start
+
+    mase_scale = metrics.naive_scale(target[:initial_train])
+    fold_values = metrics.fold_metrics(actual, forecast, mase_scale)
+    horizon_values = metrics.fold_metrics(actual.T, forecast.T, mase_scale)
+
+    parameter_names = ['const', *factor_names]
+    folds = pd.concat([
+        pd.DataFrame({'origin': origins, 'train_start': train_starts, 'train_end': origins}),
+        fold_values,
+        pd.DataFrame({'params': [pd.Series(row / scale, index=parameter_names) for row in params]}),
+    ], axis=1)
+    horizons = pd.concat([pd.DataFrame({'horizon': np.arange(1, horizon + 1)}), horizon_values], axis=1)
+
+    return folds, horizons
+
+
+def walk_forward_model(data, column_for_predict, column_factors, lag_count=1, **kwargs):
+    """
+    Бэктест по подготовленным данным: создает лаги так же, как окно создания модели, и вызывает walk_forward.
+
+    Parameters:
+    - data: DataFrame. Подготовленные данные (результат data_preparation).
+    - column_for_predict: str. Прогнозируемый столбец.
+    - column_factors: list. Столбцы-факторы; если среди них есть прогнозируемый, в модель входят его лаги.
+    - lag_count: int или dict, optional. Количество лагов.
+    - kwargs: параметры walk_forward (initial_train, horizon, step, window, refresh_every).
+
+    Returns:
+    - Tuple. Результаты walk_forward.
+    """
+    columns, create_lag_for_predict = pipeline.select_columns(column_for_predict, column_factors)
+    lagged_data = util.create_lags(data, columns, lag_count, create_lag_for_predict, column_for_predict)
+    model_columns = pipeline.model_columns(column_for_predict, columns, create_lag_for_predict)
+    factor_names = util.model_factor_names(column_for_predict, model_columns, lag_count)
+
+    return walk_forward(lagged_data, column_for_predict, factor_names, **kwargs)
+
+
+def run_backtest(file, sheet, column_for_predict, column_time, column_factors, lag_count=1, train_percent=66,
+                 date_format='auto', horizon=1, step=1, window=None):
+    """
+    Читает лист и выполняет бэктест модели (см. walk_forward_model).
+
+    Первая точка начала прогноза - train_percent процентов строк (для скользящего окна - window).
+
+    Parameters:
+    - file, sheet, column_time, date_format: источник данных (см. data_preparation).
+    - column_for_predict, column_factors, lag_count: модель (см. walk_forward_model).
+    - train_percent: int, optional. Процент строк обучения для первой точки (без window).
+    - horizon, step, window: параметры walk_forward.
+
+    Returns:
+    - Tuple. Результаты walk_forward.
+    """
+    column_factors = list(dict.fromkeys(column_factors))
+    data = util.data_preparation(file, sheet, column_time, column_for_predict, column_factors, date_format)
+    initial_train = None if window is not None else int(len(data) * (train_percent / 100))
+
+    return walk_forward_model(data, column_for_predict, column_factors, lag_count, initial_train=initial_train,
+                              horizon=horizon, step=step, window=window)
+
+
+def format_backtest(folds, horizons):
+    """Текстовая таблица метрик бэктеста по горизонтам прогноза."""
+    table = horizons[['horizon', 'count', 'mape', 'smape', 'mae', 'rmse', 'mase', 'bias']]
+    text = table.to_string(index=False, float_format=lambda value: f'{value:.4g}')
+    if folds.empty:
+        return text
+    return (f"Точек начала прогноза: {len(folds)} (строки {folds['origin'].iloc[0]}..{folds['origin'].iloc[-1]})\n"
+            f"{text}")
@@ -0,0 +1,255 @@
+"""
+Пакетное построение ADL-моделей для многих столбцов, листов и файлов на пуле процессов.
+
+Задания описываются в JSON-файле списком объектов:
+    [{"file": "data.xlsx", "sheet": "Sheet1", "target": "y", "time_column": "date",
+      "factors": ["x1", "x2"], "lag_count": 1, "train_percent": 66, "date_format": "%d.%m.%Y"}]
+
+Запуск:
+    python batch.py jobs.json --workers 8 --summary summary.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import excel_loader
+import forecast_engine
+import metrics
+import pipeline
+import utilities as util
+
+JOB_DEFAULTS = {'lag_count': 1, 'train_percent': 66, 'date_format': '%d.%m.%Y'}
+
+# Этапы задания, время которых попадает в сводную таблицу (time_<этап>)
+STAGES = ('read_sheet', 'prepare', 'lags', 'fit', 'forecast', 'mape')
+SUMMARY_COLUMNS = ['file', 'sheet', 'target', 'factors', 'lag_count', 'pid', 'MAPE',
+                   *(f'test_{name}' for name in metrics.METRICS), 'rows', 'params', 'error',
+                   *(f'time_{stage}' for stage in STAGES), 'time_total']
+
+
+def job_columns(job):
+    """Столбцы листа, которые использует задание."""
+    return list(dict.fromkeys([job['time_column'], *job['factors'], job['target']]))
+
+
+def normalize_job(job):
+    """Дополняет задание значениями по умолчанию и проверяет обязательные поля."""
+    missing = [key for key in ('file', 'sheet', 'target', 'time_column', 'factors') if key not in job]
+    if missing:
+        raise ValueError(f'В задании не указаны поля: {missing}')
+    normalized = {**JOB_DEFAULTS, **job}
+    normalized['file'] = os.path.abspath(normalized['file'])
+    normalized['factors'] = list(normalized['factors'])
+    return normalized
+
+
+def _read_sheet(file, sheet, columns):
+    start = time.perf_counter()
+    # Столбцы, которых нет на листе, не читаются: ошибку получит только задание, которому они нужны
+    header = excel_loader.read_header(file, sheet)
+    columns = [column for column in dict.fromkeys(columns) if column in header]
+    data = excel_loader.read_sheet(file, sheet, usecols=columns, cache=None)
+    return data, time.perf_counter() - start
+
+
+def read_sheets_once(jobs, max_workers=None):
+    """
+    Читает каждый нужный лист один раз (только столбцы, которые используются заданиями).
+
+    Ошибка чтения одного листа не прерывает чтение остальных: она сохраняется
+    в словаре ошибок и попадает в сводную таблицу заданий этого листа.
+
+    Parameters:
+    - jobs: list. Нормализованные задания.
+    - max_workers: int, optional. Количество процессов для чтения.
+
+    Returns:
+    - Tuple. Словарь {(файл, лист): DataFrame}, словарь {(файл, лист): время чтения в секундах}
+      и словарь {(файл, лист): текст ошибки} для листов, которые не удалось прочитать.
+    """
+    columns_by_sheet = {}
+    for job in jobs:
+        columns = columns_by_sheet.setdefault((job['file'], job['sheet']), [])
+        columns.extend(job_columns(job))
+
+    sheets, read_times, errors = {}, {}, {}
+    if not columns_by_sheet:
+        return sheets, read_times, errors
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_read_sheet, key[0], key[1], columns): key
+                   for key, columns in columns_by_sheet.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                sheets[key], read_times[key] = future.result()
+            except Exception as e:
+                errors[key] = f'Ошибка чтения листа: {e}'
+
+    return sheets, read_times, errors
+
+
+def _job_summary(job):
+    """Начало строки сводной таблицы: описание задания."""
+    factors = job.get('factors', [])
+    return {'file': job.get('file'), 'sheet': job.get('sheet'), 'target': job.get('target'),
+            'factors': ', '.join(factors) if isinstance(factors, (list, tuple)) else str(factors),
+            'lag_count': job.get('lag_count')}
+
+
+def _job_frame(data, job):
+    """Столбцы листа, нужные заданию (отсутствующие на листе пропускаются, ошибку сообщит run_job)."""
+    return data[[column for column in job_columns(job) if column in data.columns]]
+
+
+def run_job(job, data):
+    """
+    Строит модель для одного задания.
+
+    Parameters:
+    - job: dict. Нормализованное задание.
+    - data: DataFrame. Столбцы листа, которые использует задание.
+
+    Returns:
+    - dict. Строка сводной таблицы: параметры модели, MAPE и время этапов.
+    """
+    summary = {**_job_summary(job), 'pid': os.getpid()}
+    timings = {}
+
+    try:
+        missing = [column for column in job_columns(job) if column not in data.columns]
+        if missing:
+            raise ValueError(f"Столбцы отсутствуют на листе {job['sheet']}: {missing}")
+        selected_columns, create_lag_for_predict = pipeline.select_columns(job['target'], job['factors'])
+
+        start = time.perf_counter()
+        prepared_data = util.prepare_frame(data, job['time_column'], job['target'], selected_columns,
+                                           job['date_format'])
+        timings['prepare'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lagged_data = util.create_lags(prepared_data, selected_columns, job['lag_count'], create_lag_for_predict,
+                                       job['target'])
+        timings['lags'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data_learn, data_test = util.separation_data(lagged_data, job['train_percent'])
+        model = util.create_model(data_learn, job['target'],
+                                  pipeline.model_columns(job['target'], selected_columns, create_lag_for_predict),
+                                  job['lag_count'])
+        timings['fit'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result_data = util.learn_on_params(lagged_data, model.params, job['train_percent'], job['target'])
+        timings['forecast'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model_metrics = metrics.evaluate_frame(result_data, job['target'])
+        summary['MAPE'] = model_metrics[metrics.ALL_SEGMENT]['mape']
+        test_metrics = model_metrics[forecast_engine.TEST_LABEL]
+        for name in metrics.METRICS:
+            summary[f'test_{name}'] = test_metrics[name]
+        timings['mape'] = time.perf_counter() - start
+
+        summary['rows'] = len(result_data)
+        summary['params'] = json.dumps(model.params.to_dict(), ensure_ascii=False)
+        summary['error'] = ''
+    except Exception as e:
+        summary['error'] = str(e)
+
+    for stage, seconds in timings.items():
+        summary[f'time_{stage}'] = seconds
+    summary['time_total'] = sum(timings.values())
+
+    return summary
+
+
+def run_batch(jobs, max_workers=None):
+    """
+    Выполняет набор заданий на пуле процессов и собирает сводную таблицу.
+
+    Каждый лист читается один раз, поэтому задания одного листа не перечитывают файл.
+    Каждому заданию передаются только используемые им столбцы его листа, а не все
+    прочитанные листы, поэтому память процессов пула не растет с общим объемом данных.
+    Ошибка в задании или при чтении его листа записывается в столбец error строки
+    этого задания; остальные задания выполняются как обычно.
+
+    Parameters:
+    - jobs: list. Задания (словари с полями file, sheet, target, time_column, factors
+      и необязательными lag_count, train_percent, date_format).
+    - max_workers: int, optional. Количество процессов (по умолчанию число ядер).
+
+    Returns:
+    - DataFrame. Сводная таблица по заданиям в исходном порядке (столбцы SUMMARY_COLUMNS).
+    """
+    summaries = [None] * len(jobs)
+    valid = {}
+    for index, job in enumerate(jobs):
+        try:
+            valid[index] = normalize_job(job)
+        except Exception as e:
+            summaries[index] = {**_job_summary(job if isinstance(job, dict) else {}), 'error': str(e)}
+
+    sheets, read_times, read_errors = read_sheets_once(list(valid.values()), max_workers)
+
+    runnable = {}
+    for index, job in valid.items():
+        key = (job['file'], job['sheet'])
+        if key in read_errors:
+            summaries[index] = {**_job_summary(job), 'error': read_errors[key]}
+        else:
+            runnable[index] = job
+
+    if runnable:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_job, job, _job_frame(sheets[(job['file'], job['sheet'])], job)): index
+                       for index, job in runnable.items()}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    summaries[index] = future.result()
+                except Exception as e:
+                    # Ошибка вне run_job (например, аварийное завершение процесса пула)
+                    summaries[index] = {**_job_summary(runnable[index]), 'error': str(e)}
+
+    for index, job in valid.items():
+        summaries[index]['time_read_sheet'] = read_times.get((job['file'], job['sheet']))
+
+    return pd.DataFrame(summaries, columns=SUMMARY_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетное построение ADL-моделей.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('jobs', help='JSON-файл со списком заданий')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов (по умолчанию число ядер)')
+    parser.add_argument('--summary', default=None, help='путь к сводной таблице (.csv или .xlsx)')
+    args = parser.parse_args(argv)
+
+    with open(args.jobs, encoding='utf-8') as jobs_file:
+        jobs = json.load(jobs_file)
+
+    start = time.perf_counter()
+    summary_df = run_batch(jobs, args.workers)
+    elapsed = time.perf_counter() - start
+
+    if args.summary:
+        if args.summary.lower().endswith('.xlsx'):
+            summary_df.to_excel(args.summary, index=False)
+        else:
+            summary_df.to_csv(args.summary, index=False)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(summary_df.drop(columns=['params']) if 'params' in summary_df else summary_df)
+    print(f'Заданий: {len(summary_df)}, ошибок: {(summary_df["error"] != "").sum()}, время: {elapsed:.2f} с')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
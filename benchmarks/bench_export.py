@@ -0,0 +1,85 @@
+"""
+Скорость записи результата (строк в секунду) для каждого формата export.
+
+Для сравнения xlsx записывается и исходным способом (DataFrame.to_excel через openpyxl).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 10000 100000 --formats xlsx csv --compression gzip
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import export
+import forecast_engine
+
+
+def make_result(rows, factor_count=3, seed=0):
+    """Создает синтетический результат модели: время, факторы с лагами, прогноз, тип данных и MAPE."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({'Дата': pd.date_range('2000-01-01', periods=rows, freq='h')})
+    for i in range(factor_count):
+        data[f'x{i}'] = rng.normal(size=rows).round(2)
+        data[f'x{i}_lag_1'] = data[f'x{i}'].shift(1).fillna(0)
+    data['y'] = rng.normal(size=rows).round(2)
+    data['Прогноз y'] = rng.normal(size=rows)
+    data['Тип данных'] = forecast_engine.label_data_type(rows, int(rows * 0.66))
+    data['MAPE'] = rng.random(size=rows) * 100
+
+    return data
+
+
+def writers(formats, compressions):
+    """Варианты записи: (название, формат, сжатие, функция записи)."""
+    variants = []
+    for file_format in formats:
+        if file_format == 'xlsx':
+            variants.append(('xlsx pandas.to_excel', 'xlsx', None,
+                             lambda data, path: data.to_excel(path, sheet_name='Prediction', index=False)))
+            for engine in ('xlsxwriter', 'openpyxl'):
+                variants.append((f'xlsx {engine}', 'xlsx', None,
+                                 lambda data, path, engine=engine: export.write_xlsx(data, path, engine=engine)))
+            continue
+        for compression in [None, *compressions]:
+            if compression not in export.COMPRESSIONS[file_format]:
+                continue
+            name = f'{file_format} {compression}' if compression else file_format
+            variants.append((name, file_format, compression,
+                             lambda data, path, file_format=file_format, compression=compression:
+                             export.export_frame(data, path, file_format, compression=compression)))
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--formats', nargs='+', default=list(export.FORMATS), choices=export.FORMATS)
+    parser.add_argument('--compression', nargs='*', default=['gzip', 'zstd'],
+                        help='варианты сжатия, которые проверяются для подходящих форматов')
+    args = parser.parse_args()
+
+    print(f'{"rows":>10} {"writer":<24} {"seconds":>9} {"rows/s":>12} {"size, MB":>10}')
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            data = make_result(rows)
+            for name, file_format, compression, write in writers(args.formats, args.compression):
+                path = os.path.join(directory, f'result.{export.file_extension(file_format, compression)}')
+                start = time.perf_counter()
+                try:
+                    write(data, path)
+                except ImportError as e:
+                    print(f'{rows:>10} {name:<24} пропущено: {e}')
+                    continue
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(path) / (1024 * 1024)
+                print(f'{rows:>10} {name:<24} {elapsed:>9.3f} {rows / elapsed:>12,.0f} {size:>10.2f}')
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Сравнение построчного прогноза (iterrows) с векторизованным forecast_engine.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_forecast
+    python -m benchmarks.bench_forecast --sizes 10000 100000 --loop-limit 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecast_engine
+
+
+def learn_on_params_loop(data, params_train, len_dataset_learn, chosen_column_for_predict):
+    """Исходная построчная реализация learn_on_params, сохраненная для сравнения."""
+    split_index = int(len(data) * (len_dataset_learn / 100))
+    forecast_values = []
+
+    const_param = params_train.get('const', 0)
+    selected_params = list(params_train.keys())[1:]
+
+    for index, row in data.iterrows():
+        forecast = const_param + sum(params_train[param] * row[param] for param in selected_params)
+        forecast_values.append(forecast)
+
+    data[f'Прогноз {chosen_column_for_predict}'] = forecast_values
+    data.loc[0:split_index - 1, 'Тип данных'] = 'Обучающая'
+    data.loc[split_index:, 'Тип данных'] = 'Тестовая'
+    data['Тип данных'] = data['Тип данных'].astype(str)
+
+    return data
+
+
+def make_data(rows, factor_count=4, seed=0):
+    """Создает синтетический набор данных с факторами и их первыми лагами."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({f'x{i}': rng.normal(size=rows) for i in range(factor_count)})
+    for i in range(factor_count):
+        data[f'x{i}_lag_1'] = data[f'x{i}'].shift(1).fillna(0)
+    data['y'] = rng.normal(size=rows)
+
+    factors = [column for column in data.columns if column != 'y']
+    params = pd.Series(rng.normal(size=len(factors) + 1), index=['const'] + factors)
+
+    return data, params
+
+
+def measure(function, data, params):
+    start = time.perf_counter()
+    result = function(data.copy(), params, 66, 'y')
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--loop-limit', type=int, default=1_000_000,
+                        help='максимальное число строк, для которого запускается построчный вариант')
+    args = parser.parse_args()
+
+    print(f'{"rows":>10} {"iterrows, s":>12} {"vectorized, s":>14} {"speedup":>9}')
+    for rows in args.sizes:
+        data, params = make_data(rows)
+        vectorized_time, vectorized = measure(forecast_engine.learn_on_params_vectorized, data, params)
+
+        if rows > args.loop_limit:
+            print(f'{rows:>10} {"-":>12} {vectorized_time:>14.4f} {"-":>9}')
+            continue
+
+        loop_time, looped = measure(learn_on_params_loop, data, params)
+        pd.testing.assert_frame_equal(looped, vectorized, check_dtype=False)
+        print(f'{rows:>10} {loop_time:>12.4f} {vectorized_time:>14.4f} {loop_time / vectorized_time:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
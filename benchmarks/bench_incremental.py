@@ -0,0 +1,78 @@
+"""
+Время инкрементального обновления модели (incremental.py) в зависимости от длины истории.
+
+Для каждого размера истории модель строится по листу из history строк, затем на лист
+дописываются new строк и обновление выполняется по этапам: чтение листа (_read_rows)
+и учет новых строк (prepare_frame и IncrementalModel.update). Учет новых строк не
+зависит от длины истории, чтение листа растет вместе с ней: openpyxl разбирает
+лист xlsx с начала, даже если прежние строки пропускаются.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_incremental
+    python -m benchmarks.bench_incremental --history 1000 10000 100000 --new 100
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import export
+import incremental
+import utilities as util
+from benchmarks import synthetic
+
+
+def measure_refresh(directory, history, new, factor_count=3):
+    """
+    Строит модель по history строкам, дописывает new строк и замеряет этапы обновления.
+
+    Returns:
+    - Tuple. Время чтения листа и время учета новых строк в секундах.
+    """
+    data = synthetic.make_frame(history + new, factor_count)
+    path = os.path.join(directory, f'incremental_{history}_{new}.xlsx')
+    factors = [*synthetic.factor_names(factor_count), synthetic.TARGET_COLUMN]
+
+    export.write_xlsx(data.iloc[:history], path, synthetic.SHEET)
+    state, _ = incremental.IncrementalModel.fit(path, synthetic.SHEET, synthetic.TARGET_COLUMN,
+                                                synthetic.TIME_COLUMN, factors,
+                                                output_path=os.path.join(directory, f'incremental_{history}.csv'))
+    export.write_xlsx(data, path, synthetic.SHEET)
+
+    spec = state.spec
+    start = time.perf_counter()
+    raw, consumed = incremental._read_rows(path, spec['sheet'], state.usecols, spec['column_for_predict'],
+                                           state.source_rows)
+    read_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_rows = util.prepare_frame(raw, spec['column_time'], spec['column_for_predict'], spec['selected_columns'],
+                                  spec['date_format'])
+    result = state.update(new_rows)
+    update_time = time.perf_counter() - start
+
+    if consumed != new or len(result) != new:
+        raise AssertionError(f'Ожидалось новых строк: {new}, прочитано: {consumed}, учтено: {len(result)}')
+
+    return read_time, update_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, nargs='+', default=[1000, 10_000, 50_000],
+                        help='количество строк листа при построении модели')
+    parser.add_argument('--new', type=int, default=100, help='количество строк, дописанных перед обновлением')
+    parser.add_argument('--data-dir', default=None, help='каталог для книг (по умолчанию временный)')
+    args = parser.parse_args()
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix='adl_incremental_')
+    os.makedirs(directory, exist_ok=True)
+
+    print(f'{"history":>10} {"new":>6} {"read sheet, s":>14} {"update, s":>10}')
+    for history in args.history:
+        read_time, update_time = measure_refresh(directory, history, args.new)
+        print(f'{history:>10} {args.new:>6} {read_time:>14.3f} {update_time:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
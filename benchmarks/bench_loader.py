@@ -0,0 +1,89 @@
+"""
+Сравнение чтения листа через pd.read_excel, excel_loader.read_columns и read_sheet_streaming.
+
+Книга содержит заголовки, которые pandas обрабатывает особо: число (2021),
+повторяющиеся названия (x0, x0.1) и пустую ячейку (Unnamed: i). Перед замером
+проверяется, что все способы чтения дают те же названия столбцов и значения, что
+pd.read_excel, иначе выбор столбцов по названию работал бы только в одном режиме.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_loader
+    python -m benchmarks.bench_loader --rows 1000 50000 --data-dir /tmp/adl_bench
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import excel_loader
+
+SHEET = 'Data'
+HEADER = ['Время', 'y', 'x0', 2021, 'x0', None, 'x0.1', 'x1']
+
+
+def make_workbook(path, rows, seed=0):
+    """Записывает книгу с заголовком HEADER (через openpyxl, чтобы сохранить повторы и числа)."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2020-01-01', periods=rows, freq='h').to_pydatetime()
+    values = rng.normal(size=(rows, len(HEADER) - 1)).round(3)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(SHEET)
+    worksheet.append(HEADER)
+    for time_value, row in zip(times, values.tolist()):
+        worksheet.append([time_value, *row])
+    workbook.save(path)
+
+
+def check_readers(path, usecols):
+    """Проверяет, что названия столбцов и значения совпадают с pd.read_excel."""
+    expected = pd.read_excel(path, SHEET)
+
+    header = excel_loader.read_header(path, SHEET)
+    if header != list(expected.columns):
+        raise AssertionError(f'read_header: {header} != {list(expected.columns)}')
+
+    selected = excel_loader.read_sheet(path, SHEET, usecols=usecols, cache=None)
+    pd.testing.assert_frame_equal(selected, expected[usecols])
+
+    streamed = excel_loader.read_sheet_streaming(path, SHEET, date_columns=[expected.columns[0]])
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+
+
+def measure(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10_000])
+    parser.add_argument('--data-dir', default=None, help='каталог для книг (по умолчанию временный)')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='adl_loader_')
+    os.makedirs(data_dir, exist_ok=True)
+    # Число, повтор и его исходное название: именно они различались между режимами чтения
+    usecols = ['Время', 2021, 'x0.2', 'x0.1']
+
+    print(f'{"rows":>10} {"read_excel, s":>14} {"read_columns, s":>16} {"streaming, s":>13}')
+    for rows in args.rows:
+        path = os.path.join(data_dir, f'loader_{rows}.xlsx')
+        if not os.path.exists(path):
+            make_workbook(path, rows)
+        check_readers(path, usecols)
+
+        read_excel_time = measure(pd.read_excel, path, SHEET)
+        read_columns_time = measure(excel_loader.read_sheet, path, SHEET, usecols=usecols, cache=None)
+        streaming_time = measure(excel_loader.read_sheet_streaming, path, SHEET, usecols=usecols,
+                                 date_columns=['Время'])
+        print(f'{rows:>10} {read_excel_time:>14.3f} {read_columns_time:>16.3f} {streaming_time:>13.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Время и пиковая память каждого этапа построения модели на синтетических книгах разного размера.
+
+Этапы: data_preparation, create_lags, create_model, learn_on_params, write_to_excel.
+Время - минимум по нескольким повторам без трассировки памяти, пиковая память -
+отдельный прогон под tracemalloc (см. instrumentation.tracing). Результаты можно
+сохранить как базовые (--save) и сравнить с ними следующий запуск (--compare):
+этапы, которые стали медленнее или тяжелее больше допустимого, помечаются, и
+программа завершается с кодом 1. Сравниваются только размеры, которые есть в обоих
+запусках, поэтому --rows и --repeat могут отличаться от базовых.
+
+Базовые результаты зависят от машины и в репозитории не хранятся: перед первым
+сравнением их нужно сохранить на той же машине (в benchmarks/baselines).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000 --save main
+    python -m benchmarks.bench_pipeline --rows 10000 --compare main
+    python -m benchmarks.bench_pipeline --date-format serial --missing 0.05 --data-dir /tmp/adl_bench
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import excel_loader
+import instrumentation
+import pipeline
+import utilities as util
+from benchmarks import synthetic
+
+STAGES = ('data_preparation', 'create_lags', 'create_model', 'learn_on_params', 'write_to_excel')
+BASELINE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Замедление меньше этих порогов считается шумом измерения
+MIN_SECONDS_DIFFERENCE = 0.005
+MIN_MEMORY_DIFFERENCE = 1024 * 1024
+
+# Параметры, которые не влияют на результаты отдельного размера и не мешают сравнению
+NON_COMPARABLE_OPTIONS = ('rows', 'repeat')
+
+
+def run_stages(spec, output_directory, lag_count=1, train_percent=66, file_format='xlsx', streaming=False):
+    """
+    Выполняет этапы построения модели по отдельности.
+
+    Returns:
+    - dict. Время каждого этапа в секундах и число строк подготовленных данных ('rows').
+    """
+    column_for_predict = spec['column_for_predict']
+    selected_columns, create_lag_flag = pipeline.select_columns(column_for_predict, spec['column_factors'])
+    # Лист читается заново при каждом прогоне, а не из кэша
+    excel_loader.sheet_cache.clear()
+    timings = {}
+
+    def timed(stage, function, *args, **kwargs):
+        with instrumentation.span(stage):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            timings[stage] = time.perf_counter() - start
+        return result
+
+    prepared = timed('data_preparation', util.data_preparation, spec['file'], spec['sheet'], spec['column_time'],
+                     column_for_predict, selected_columns, 'auto', streaming=streaming)
+    data = timed('create_lags', util.create_lags, prepared, selected_columns, lag_count, create_lag_flag,
+                 column_for_predict)
+    data_learn, _ = util.separation_data(data, train_percent)
+    model = timed('create_model', util.create_model, data_learn, column_for_predict,
+                  pipeline.model_columns(column_for_predict, selected_columns, create_lag_flag), lag_count)
+    result_data = timed('learn_on_params', util.learn_on_params, data, model.params, train_percent,
+                        column_for_predict)
+    result_write = timed('write_to_excel', util.write_to_excel, result_data, column_for_predict, output_directory,
+                         file_format)
+    if not result_write['Result']:
+        raise RuntimeError(f"Ошибка записи результата: {result_write.get('Error')}")
+    os.remove(result_write['Path'])
+
+    return {'timings': timings, 'rows': len(prepared)}
+
+
+def measure(spec, output_directory, repeat=3, **options):
+    """
+    Время (минимум по repeat прогонам) и пиковая память каждого этапа.
+
+    Returns:
+    - dict. Этап -> {'seconds', 'peak_memory_bytes'}, а также 'rows' - число строк после подготовки.
+    """
+    best = {}
+    rows = None
+    for _ in range(repeat):
+        run = run_stages(spec, output_directory, **options)
+        rows = run['rows']
+        for stage, seconds in run['timings'].items():
+            best[stage] = min(best.get(stage, np.inf), seconds)
+
+    with instrumentation.tracing(memory=True) as tracer:
+        run_stages(spec, output_directory, **options)
+    peaks = {span['name']: span['peak_memory_bytes'] for span in tracer.spans if span['depth'] == 0}
+
+    return {'rows': rows,
+            'stages': {stage: {'seconds': round(best[stage], 6), 'peak_memory_bytes': peaks[stage]}
+                       for stage in STAGES}}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def baseline_path(name, directory=BASELINE_DIRECTORY):
+    return name if name.endswith('.json') else os.path.join(directory, f'{name}.json')
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as results_file:
+        return json.load(results_file)
+
+
+def compare_results(current, baseline, tolerance=0.25):
+    """
+    Сравнивает результаты с базовыми для совпадающих размеров и этапов.
+
+    Parameters:
+    - current: dict. Результаты текущего запуска.
+    - baseline: dict. Сохраненные базовые результаты.
+    - tolerance: float, optional. Допустимое относительное ухудшение (0.25 - на 25%).
+
+    Returns:
+    - list. Строки сравнения: (строк, этап, показатель, базовое, текущее, отношение, ухудшение).
+    """
+    comparison = []
+    for size, result in current['results'].items():
+        base = baseline['results'].get(size)
+        if base is None:
+            continue
+        for stage, values in result['stages'].items():
+            base_values = base['stages'].get(stage)
+            if base_values is None:
+                continue
+            for metric, min_difference in (('seconds', MIN_SECONDS_DIFFERENCE),
+                                           ('peak_memory_bytes', MIN_MEMORY_DIFFERENCE)):
+                old, new = base_values[metric], values[metric]
+                ratio = new / old if old else np.inf
+                regression = ratio > 1 + tolerance and new - old > min_difference
+                comparison.append((size, stage, metric, old, new, ratio, regression))
+    return comparison
+
+
+def comparable_options(options):
+    """Параметры запуска, которые должны совпадать с базовыми, чтобы результаты можно было сравнивать."""
+    return {key: value for key, value in options.items() if key not in NON_COMPARABLE_OPTIONS}
+
+
+def _format_value(metric, value):
+    return f'{value:.4f} s' if metric == 'seconds' else f'{value / (1024 * 1024):.1f} MB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--factors', type=int, default=3, help='количество факторов')
+    parser.add_argument('--lags', type=int, default=1, help='количество лагов')
+    parser.add_argument('--date-format', default=synthetic.DEFAULT_DATE_FORMAT,
+                        help="формат столбца времени в книге, 'datetime' или 'serial'")
+    parser.add_argument('--missing', type=float, default=0.0, help='доля пустых ячеек в числовых столбцах')
+    parser.add_argument('--bad-time', type=float, default=0.0, help='доля пустых ячеек в столбце времени')
+    parser.add_argument('--output-format', default='xlsx', help='формат файла результата')
+    parser.add_argument('--streaming', action='store_true', help='потоковое чтение листа')
+    parser.add_argument('--repeat', type=int, default=3, help='число повторов для замера времени')
+    parser.add_argument('--data-dir', default=None,
+                        help='каталог для синтетических книг (книги сохраняются между запусками)')
+    parser.add_argument('--save', default=None, help='сохранить результаты как базовые под этим именем (или в .json)')
+    parser.add_argument('--compare', default=None, help='сравнить с базовыми результатами (имя или путь к .json)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение (по умолчанию 0.25)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        path = baseline_path(args.compare)
+        if not os.path.exists(path):
+            print(f'Нет базовых результатов {path}: сначала сохраните их с --save', file=sys.stderr)
+            return 2
+        baseline = load_results(path)
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': {key: value for key, value in vars(args).items()
+                    if key not in ('data_dir', 'save', 'compare', 'tolerance')},
+        'results': {},
+    }
+
+    print(f'{"rows":>10} ' + ' '.join(f'{stage:>18}' for stage in STAGES))
+    with tempfile.TemporaryDirectory() as temp_directory:
+        data_directory = args.data_dir or temp_directory
+        for rows in args.rows:
+            spec = synthetic.cached_workbook(data_directory, rows, args.factors, args.date_format, args.missing,
+                                             args.bad_time)
+            result = measure(spec, temp_directory, args.repeat, lag_count=args.lags,
+                             file_format=args.output_format, streaming=args.streaming)
+            results['results'][str(rows)] = result
+            print(f'{rows:>10} ' + ' '.join(f"{_format_value('seconds', values['seconds']):>9} "
+                                            f"{_format_value('peak_memory_bytes', values['peak_memory_bytes']):>8}"
+                                            for values in result['stages'].values()))
+
+    if args.save:
+        print(f'Базовые результаты: {save_results(results, baseline_path(args.save))}')
+
+    if baseline is None:
+        return 0
+
+    if comparable_options(baseline.get('options', {})) != comparable_options(results['options']):
+        print('Внимание: параметры запуска отличаются от базовых', file=sys.stderr)
+    comparison = compare_results(results, baseline, args.tolerance)
+    if not comparison:
+        print('Нет общих размеров с базовыми результатами', file=sys.stderr)
+        return 0
+
+    print(f'\n{"rows":>10} {"stage":<18} {"metric":<18} {"baseline":>12} {"current":>12} {"ratio":>7}')
+    for size, stage, metric, old, new, ratio, regression in comparison:
+        mark = '  УХУДШЕНИЕ' if regression else ''
+        print(f'{size:>10} {stage:<18} {metric:<18} {_format_value(metric, old):>12} '
+              f'{_format_value(metric, new):>12} {ratio:>6.2f}x{mark}')
+    regressions = sum(row[-1] for row in comparison)
+    print(f'Ухудшений: {regressions}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
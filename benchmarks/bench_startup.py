@@ -0,0 +1,47 @@
+"""
+Измерение времени запуска графического интерфейса (до показа главного окна).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_startup --runs 5
+
+Каждый запуск выполняет `python main.py --measure-startup` в отдельном процессе,
+поэтому время включает импорт модулей, создание QApplication и главного окна.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def measure_once(script=MAIN_SCRIPT):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, script, '--measure-startup'], capture_output=True, text=True,
+                               check=True)
+    process_time = time.perf_counter() - start
+    for line in completed.stdout.splitlines():
+        if line.startswith('startup_time='):
+            return float(line.split('=', 1)[1]), process_time
+    raise RuntimeError(f'main.py не сообщил время запуска:\n{completed.stdout}\n{completed.stderr}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--script', default=MAIN_SCRIPT, help='путь к main.py')
+    args = parser.parse_args()
+
+    results = [measure_once(args.script) for _ in range(args.runs)]
+    window_times = [window_time for window_time, _ in results]
+    process_times = [process_time for _, process_time in results]
+
+    print(f'runs: {args.runs}')
+    print(f'window shown, s:  median {statistics.median(window_times):.3f}  max {max(window_times):.3f}')
+    print(f'whole process, s: median {statistics.median(process_times):.3f}  max {max(process_times):.3f}')
+
+
+if __name__ == '__main__':
+    main()
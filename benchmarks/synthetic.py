@@ -0,0 +1,142 @@
+"""
+Генератор синтетических книг Excel для ADL-модели.
+
+Книга содержит столбец времени, факторы (авторегрессионные ряды) и прогнозируемый
+столбец, линейно зависящий от факторов и их первых лагов, поэтому модель на них хорошо обучается.
+Столбец времени записывается текстом в заданном формате, датами Excel ('datetime')
+или числами Excel ('serial'); часть ячеек можно оставить пустыми.
+
+Запуск из корня проекта:
+    python -m benchmarks.synthetic data.xlsx --rows 100000 --factors 4 --date-format "%d.%m.%Y %H:%M"
+    python -m benchmarks.synthetic data.xlsx --rows 10000 --missing 0.05 --bad-time 0.01
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import export
+import time_parsing
+
+SHEET = 'Data'
+TIME_COLUMN = 'Время'
+TARGET_COLUMN = 'y'
+
+DEFAULT_DATE_FORMAT = '%d.%m.%Y %H:%M'
+
+
+def factor_names(factor_count):
+    return [f'x{i}' for i in range(factor_count)]
+
+
+def make_frame(rows, factor_count=3, date_format=DEFAULT_DATE_FORMAT, missing=0.0, bad_time=0.0, freq='h',
+               start='2000-01-01', seed=0):
+    """
+    Создает синтетические данные для книги.
+
+    Parameters:
+    - rows: int. Количество строк.
+    - factor_count: int, optional. Количество факторов.
+    - date_format: str, optional. Формат текста в столбце времени, 'datetime' или 'serial'.
+    - missing: float, optional. Доля пустых ячеек в факторах и прогнозируемом столбце.
+    - bad_time: float, optional. Доля пустых ячеек в столбце времени (такие строки отбрасываются при разборе).
+    - freq: str, optional. Шаг временных меток (для форматов без времени нужен шаг не меньше суток).
+    - start: str, optional. Первая временная метка.
+    - seed: int, optional. Начальное значение генератора случайных чисел.
+
+    Returns:
+    - DataFrame. Данные в том виде, в котором они записываются в книгу.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=rows, freq=freq)
+
+    factors = {}
+    for name in factor_names(factor_count):
+        # AR(1)-процесс вокруг ненулевого уровня, чтобы MAPE был определен
+        noise = rng.normal(scale=1.0, size=rows)
+        values = np.empty(rows)
+        values[0] = noise[0]
+        coefficient = rng.uniform(0.3, 0.9)
+        for i in range(1, rows):
+            values[i] = coefficient * values[i - 1] + noise[i]
+        factors[name] = (values + rng.uniform(5, 50)).round(3)
+
+    target = rng.normal(scale=0.5, size=rows) + 100
+    for name, values in factors.items():
+        lagged = np.concatenate([[values[0]], values[:-1]])
+        target += rng.uniform(-2, 2) * values + rng.uniform(-1, 1) * lagged
+
+    data = pd.DataFrame({TIME_COLUMN: _time_values(times, date_format), TARGET_COLUMN: target.round(3), **factors})
+
+    numeric_columns = [TARGET_COLUMN, *factors]
+    if missing > 0:
+        mask = rng.random((rows, len(numeric_columns))) < missing
+        data[numeric_columns] = data[numeric_columns].mask(mask)
+    if bad_time > 0:
+        data[TIME_COLUMN] = data[TIME_COLUMN].astype(object).mask(rng.random(rows) < bad_time)
+
+    return data
+
+
+def _time_values(times, date_format):
+    if date_format == 'datetime':
+        return times
+    if date_format == 'serial':
+        return ((times - time_parsing.EXCEL_EPOCH) / pd.Timedelta(days=1)).to_numpy()
+    return times.strftime(date_format)
+
+
+def make_workbook(path, rows, factor_count=3, date_format=DEFAULT_DATE_FORMAT, missing=0.0, bad_time=0.0, freq='h',
+                  seed=0, sheet=SHEET):
+    """
+    Записывает синтетическую книгу (параметры - см. make_frame).
+
+    Returns:
+    - dict. Параметры для построения модели: file, sheet, column_for_predict, column_time, column_factors.
+    """
+    data = make_frame(rows, factor_count, date_format, missing, bad_time, freq, seed=seed)
+    export.write_xlsx(data, path, sheet)
+
+    return {'file': path, 'sheet': sheet, 'column_for_predict': TARGET_COLUMN, 'column_time': TIME_COLUMN,
+            'column_factors': factor_names(factor_count)}
+
+
+def cached_workbook(directory, rows, factor_count=3, date_format=DEFAULT_DATE_FORMAT, missing=0.0, bad_time=0.0,
+                    freq='h', seed=0):
+    """Как make_workbook, но книга с теми же параметрами создается один раз и затем берется из каталога."""
+    format_name = ''.join(character if character.isalnum() else '_' for character in date_format)
+    name = f'adl_{rows}_{factor_count}_{format_name}_{missing}_{bad_time}_{freq}_{seed}.xlsx'
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.tmp.xlsx'
+        make_workbook(temp_path, rows, factor_count, date_format, missing, bad_time, freq, seed)
+        os.replace(temp_path, path)
+
+    return {'file': path, 'sheet': SHEET, 'column_for_predict': TARGET_COLUMN, 'column_time': TIME_COLUMN,
+            'column_factors': factor_names(factor_count)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетических книг Excel для ADL-модели.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('path', help='путь к создаваемой книге .xlsx')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--factors', type=int, default=3, help='количество факторов')
+    parser.add_argument('--date-format', default=DEFAULT_DATE_FORMAT,
+                        help="формат текста в столбце времени, 'datetime' или 'serial'")
+    parser.add_argument('--missing', type=float, default=0.0, help='доля пустых ячеек в числовых столбцах')
+    parser.add_argument('--bad-time', type=float, default=0.0, help='доля пустых ячеек в столбце времени')
+    parser.add_argument('--freq', default='h', help='шаг временных меток (pandas), например h или D')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = make_workbook(args.path, args.rows, args.factors, args.date_format, args.missing, args.bad_time,
+                         args.freq, args.seed)
+    print(f"Файл: {spec['file']}, лист {spec['sheet']}, время '{spec['column_time']}', "
+          f"прогноз '{spec['column_for_predict']}', факторы {' '.join(spec['column_factors'])}")
+
+
+if __name__ == '__main__':
+    main()
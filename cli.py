@@ -0,0 +1,172 @@
+"""
+Запуск построения ADL-модели из командной строки, без графического интерфейса.
+
+Пример:
+    python cli.py --file data.xlsx --sheet WeatherArchivePrepared --target "Средняя температура, C"
+                  --time-column "День месяца" --factors "Атмосферное давление" --date-format %Y-%m-%d
+
+Подбор модели: с флагом --select перебираются порядки лагов 1..--lags и наборы из не более
+--max-factors столбцов --factors, лучший по --criterion вариант используется для построения:
+    python cli.py --file data.xlsx --sheet Sheet1 --target y --time-column date --factors x1 x2 x3 y
+                  --lags 4 --select --criterion bic
+
+Бэктест: с флагом --backtest модель оценивается со скользящим началом прогноза
+(первая точка - --train-percent строк или --window) и выводятся метрики по горизонтам:
+    python cli.py --file data.xlsx --sheet Sheet1 --target y --time-column date --factors x1 y
+                  --backtest --backtest-horizon 7 --window 365
+"""
+import argparse
+import sys
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Построение ADL-модели и прогноза по листу Excel.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--file', required=True,
+                        help='путь к файлу Excel, каталогу или шаблону (например, "data/2024-*.xlsx"); '
+                             'несколько книг читаются параллельно и объединяются по столбцу времени')
+    parser.add_argument('--sheet', required=True, help='название листа (для нескольких книг * - все листы)')
+    parser.add_argument('--target', required=True, help='столбец, который нужно прогнозировать')
+    parser.add_argument('--time-column', required=True, help='столбец с временными метками')
+    parser.add_argument('--factors', required=True, nargs='+', help='столбцы-факторы модели')
+    parser.add_argument('--lags', type=int, default=1,
+                        help='количество лагов (по умолчанию 1); с --select - наибольший перебираемый порядок')
+    parser.add_argument('--train-percent', type=int, default=66,
+                        help='процент данных для обучающей выборки (по умолчанию 66)')
+    parser.add_argument('--horizon', type=int, default=0,
+                        help='количество будущих периодов рекурсивного прогноза (по умолчанию 0)')
+    parser.add_argument('--date-format', default='auto',
+                        help='формат даты, например %%d.%%m.%%Y, или serial для номеров дней Excel '
+                             '(по умолчанию auto - определяется по данным)')
+    parser.add_argument('--output-format', default='xlsx', choices=['xlsx', 'csv', 'parquet', 'feather'],
+                        help='формат файла результата (parquet и feather требуют pyarrow)')
+    parser.add_argument('--compression', default=None,
+                        help='сжатие файла результата: gzip, bz2, zip, xz, zstd для csv; '
+                             'snappy, gzip, brotli, lz4, zstd для parquet; lz4, zstd для feather')
+    parser.add_argument('--output-dir', default=None, help='каталог для файла результата (по умолчанию текущий)')
+    parser.add_argument('--streaming', action='store_true', help='потоковое чтение больших листов')
+    parser.add_argument('--disk-cache', action='store_true', help='использовать кэш подготовленных данных на диске')
+    parser.add_argument('--compact', action='store_true',
+                        help='режим экономии памяти (компактные типы данных, отчет о сэкономленной памяти)')
+    parser.add_argument('--save-model', action='store_true',
+                        help='сохранить модель рядом с файлом результата (см. model_artifact.py)')
+    parser.add_argument('--select', action='store_true',
+                        help='подобрать порядок лагов и набор факторов из --factors перед построением модели')
+    parser.add_argument('--criterion', default='aic', choices=['aic', 'bic', 'mape'],
+                        help='критерий подбора (по умолчанию aic; mape - на тестовой выборке)')
+    parser.add_argument('--max-factors', type=int, default=4,
+                        help='наибольшее число факторов в модели при подборе (по умолчанию 4)')
+    parser.add_argument('--backtest', action='store_true',
+                        help='бэктест со скользящим началом прогноза вместо построения модели (см. backtest.py)')
+    parser.add_argument('--backtest-horizon', type=int, default=1,
+                        help='количество прогнозируемых строк после каждой точки бэктеста (по умолчанию 1)')
+    parser.add_argument('--backtest-step', type=int, default=1,
+                        help='шаг между точками бэктеста в строках (по умолчанию 1)')
+    parser.add_argument('--window', type=int, default=None,
+                        help='размер скользящего окна обучения в бэктесте (по умолчанию окно расширяется)')
+    parser.add_argument('--diagnostics', action='store_true',
+                        help='полная оценка statsmodels со сводкой модели (медленнее)')
+    parser.add_argument('--quiet', action='store_true', help='не выводить ход выполнения')
+    parser.add_argument('--trace', default=None,
+                        help='записать время, пиковую память и число строк по этапам в файл .json или .csv '
+                             '(по умолчанию из переменной ADL_TRACE)')
+    parser.add_argument('--profile', default=None,
+                        help='записать профиль cProfile в файл (по умолчанию из переменной ADL_PROFILE)')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='уровень журнала (DEBUG - запись о каждом этапе)')
+    parser.add_argument('--log-json', action='store_true', help='выводить журнал в виде JSON-строк')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Импорт после разбора аргументов: --help выводится без загрузки pandas/statsmodels
+    import instrumentation
+    import pipeline
+
+    instrumentation.configure_logging(args.log_level, json_format=args.log_json or None)
+
+    def print_progress(percent, stage):
+        print(f'[{percent:3d}%] {stage}', file=sys.stderr)
+
+    factors, lag_count = args.factors, args.lags
+    try:
+        with instrumentation.session(args.trace, args.profile):
+            if args.select:
+                import model_selection
+                ranking = model_selection.select_model(args.file, args.sheet, args.target, args.time_column,
+                                                       args.factors, args.lags, args.max_factors,
+                                                       args.train_percent, args.criterion, args.date_format)
+                if ranking.empty:
+                    raise ValueError('Нет вариантов модели для подбора')
+                factors, lag_count = ranking.loc[0, 'factors'], int(ranking.loc[0, 'lag_count'])
+                print(f'Подбор модели по {args.criterion.upper()}, вариантов: {len(ranking)}')
+                print(model_selection.format_ranking(ranking))
+                print(f"Выбрано: лагов {lag_count}, факторы: {', '.join(factors)}")
+            if args.backtest:
+                import backtest
+                folds, horizons = backtest.run_backtest(args.file, args.sheet, args.target, args.time_column,
+                                                        factors, lag_count, args.train_percent, args.date_format,
+                                                        args.backtest_horizon, args.backtest_step, args.window)
+                print(backtest.format_backtest(folds, horizons))
+                return 0
+            result = pipeline.run_model_pipeline(
+                file=args.file,
+                sheet=args.sheet,
+                column_for_predict=args.target,
+                column_time=args.time_column,
+                column_factors=factors,
+                lag_count=lag_count,
+                train_percent=args.train_percent,
+                date_format=args.date_format,
+                output_directory=args.output_dir,
+                file_format=args.output_format,
+                compression=args.compression,
+                save_model=args.save_model,
+                streaming=args.streaming,
+                disk_cache=args.disk_cache,
+                forecast_steps=args.horizon,
+                backend='statsmodels' if args.diagnostics else 'lstsq',
+                compact=args.compact,
+                progress_callback=None if args.quiet else print_progress
+            )
+    except Exception as e:
+        print(f'Ошибка: {e}', file=sys.stderr)
+        return 1
+
+    time_report = result['time_parsing']
+    if time_report is not None and not args.quiet:
+        import time_parsing
+        date_format = f" (формат даты: {time_report['format']})" if time_report['format'] else ''
+        print(f'{time_parsing.format_report(time_report)}{date_format}', file=sys.stderr)
+
+    if result['ingestion'] is not None and not args.quiet:
+        import ingestion
+        print(ingestion.format_ingestion(result['ingestion']), file=sys.stderr)
+
+    if result['memory'] is not None and not args.quiet:
+        import memory_optimization
+        print(memory_optimization.format_memory_report(result['memory']), file=sys.stderr)
+
+    print('Параметры модели:')
+    for name, value in result['params'].items():
+        print(f'  {name}: {value:.6g}')
+    print(f"MAPE: {result['mape']:.4f}%")
+    import metrics
+    print(metrics.format_metrics(result['metrics']))
+    if args.diagnostics:
+        print(result['model'].summary())
+
+    if not result['result_write']['Result']:
+        print(f"Ошибка записи файла: {result['result_write'].get('Error')}", file=sys.stderr)
+        return 1
+    print(f"Файл: {result['result_write']['Path']}")
+    if result['model_path']:
+        print(f"Модель: {result['model_path']}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+
+# Каталог кэша можно переопределить переменной окружения ADL_CACHE_DIR
+DEFAULT_CACHE_DIR = os.environ.get('ADL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.adl_cache'))
+
+_file_hashes = {}
+
+
+def file_hash(file, block_size=1024 * 1024):
+    """
+    Считает SHA-256 содержимого файла.
+
+    Результат запоминается по (путь, время изменения, размер), чтобы не перечитывать
+    файл, пока он не изменился.
+
+    Parameters:
+    - file: str. Путь к файлу.
+    - block_size: int, optional. Размер блока чтения в байтах.
+
+    Returns:
+    - str. Шестнадцатеричный хэш файла.
+    """
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_mtime_ns, stat.st_size)
+    if memo_key in _file_hashes:
+        return _file_hashes[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+    _file_hashes[memo_key] = digest.hexdigest()
+
+    return _file_hashes[memo_key]
+
+
+def _entry_dir(file, sheet, columns, date_format, cache_dir):
+    """Каталог записи кэша для сочетания файла, листа, набора столбцов и формата даты."""
+    key = json.dumps([os.path.abspath(file), sheet, list(columns), date_format], ensure_ascii=False)
+    return os.path.join(cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+
+def load_prepared(file, sheet, columns, date_format, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Загружает подготовленные данные из кэша на диске.
+
+    Числовые столбцы и столбцы с датами открываются через отображение файла в память
+    (np.load с mmap_mode), поэтому загрузка занимает миллисекунды.
+
+    Parameters:
+    - file: str. Путь к исходному файлу Excel.
+    - sheet: str. Название листа.
+    - columns: list. Набор столбцов, по которому готовились данные.
+    - date_format: str. Формат даты, использованный при подготовке.
+    - cache_dir: str, optional. Каталог кэша.
+
+    Returns:
+    - DataFrame или None, если записи нет или файл Excel изменился.
+    """
+    entry_dir = _entry_dir(file, sheet, columns, date_format, cache_dir)
+    meta_path = os.path.join(entry_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != CACHE_VERSION or meta.get('file_hash') != file_hash(file):
+            return None
+
+        data = {}
+        for column in meta['columns']:
+            path = os.path.join(entry_dir, column['file'])
+            if column['dtype'] == 'object':
+                data[column['name']] = np.load(path, allow_pickle=True)
+            else:
+                # Копирование при записи: массив можно менять, не трогая файл кэша
+                data[column['name']] = np.asarray(np.load(path, mmap_mode='c'))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    result = pd.DataFrame(data, copy=False)
+    result.attrs.update(meta.get('attrs', {}))
+
+    return result
+
+
+def save_prepared(data, file, sheet, columns, date_format, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Сохраняет подготовленные данные в кэш на диске (по одному файлу .npy на столбец).
+
+    Parameters:
+    - data: DataFrame. Подготовленные данные.
+    - file: str. Путь к исходному файлу Excel.
+    - sheet: str. Название листа.
+    - columns: list. Набор столбцов, по которому готовились данные.
+    - date_format: str. Формат даты, использованный при подготовке.
+    - cache_dir: str, optional. Каталог кэша.
+
+    Returns:
+    - str. Путь к каталогу записи кэша.
+    """
+    entry_dir = _entry_dir(file, sheet, columns, date_format, cache_dir)
+    temp_dir = f'{entry_dir}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(temp_dir)
+
+    try:
+        meta_columns = []
+        for i, name in enumerate(data.columns):
+            values = data[name].to_numpy()
+            dtype = 'object' if values.dtype == object else values.dtype.str
+            file_name = f'col_{i}.npy'
+            np.save(os.path.join(temp_dir, file_name), values, allow_pickle=dtype == 'object')
+            meta_columns.append({'name': str(name), 'file': file_name, 'dtype': dtype})
+
+        meta = {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(file),
+            'file_hash': file_hash(file),
+            'sheet': sheet,
+            'date_format': date_format,
+            'rows': len(data),
+            'columns': meta_columns,
+            'attrs': data.attrs,
+        }
+        with open(os.path.join(temp_dir, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file, ensure_ascii=False, indent=2)
+
+        # Заменяем старую запись новой (старая могла относиться к прежней версии файла)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.rename(temp_dir, entry_dir)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    return entry_dir
+
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """Удаляет все записи кэша подготовленных данных."""
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,363 @@
+import numbers
+import os
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import instrumentation
+import time_parsing
+
+# Максимальный объем памяти, который могут занимать закэшированные листы (в байтах)
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+# Количество строк, которое потоковое чтение держит в памяти одновременно
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def _unique_columns(usecols):
+    """Убирает повторы из списка столбцов, сохраняя порядок."""
+    if usecols is None:
+        return None
+    return tuple(dict.fromkeys(usecols))
+
+
+def _frame_size(data):
+    """Возвращает объем памяти, занимаемый DataFrame, в байтах."""
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+class SheetCache:
+    """
+    LRU-кэш разобранных листов Excel.
+
+    Ключ записи: (абсолютный путь, время изменения файла, лист, набор столбцов).
+    Когда суммарный объем закэшированных DataFrame превышает max_bytes,
+    удаляются записи, к которым дольше всего не обращались.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _find(self, path, mtime, sheet, usecols):
+        """Ищет запись с точным набором столбцов либо запись, содержащую все нужные столбцы."""
+        exact_key = (path, mtime, sheet, usecols)
+        if exact_key in self._entries:
+            return exact_key
+        for key, (data, _) in reversed(self._entries.items()):
+            if key[:3] != (path, mtime, sheet):
+                continue
+            if usecols is None:
+                if key[3] is None:
+                    return key
+            elif set(usecols).issubset(data.columns):
+                return key
+        return None
+
+    def get(self, path, mtime, sheet, usecols=None):
+        with self._lock:
+            key = self._find(path, mtime, sheet, usecols)
+            if key is None:
+                return None
+            self._entries.move_to_end(key)
+            data = self._entries[key][0]
+        if usecols is not None:
+            data = data[list(usecols)]
+        return data.copy()
+
+    def put(self, path, mtime, sheet, usecols, data):
+        size = _frame_size(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            key = (path, mtime, sheet, usecols)
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Удаляем устаревшие версии этого же файла
+            for stale_key in [k for k in self._entries if k[0] == path and k[1] != mtime]:
+                self.current_bytes -= self._entries.pop(stale_key)[1]
+            self._entries[key] = (data, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+sheet_cache = SheetCache()
+
+
+@instrumentation.traced()
+def read_sheet(file, sheet, usecols=None, cache=sheet_cache):
+    """
+    Читает лист Excel один раз и возвращает его копию из кэша при повторных обращениях.
+
+    Если указаны столбцы, в память попадают только их значения (см. read_columns).
+
+    Parameters:
+    - file: str. Путь к файлу Excel.
+    - sheet: str. Название листа.
+    - usecols: list, optional. Столбцы, которые нужно прочитать. Если не указан, читается весь лист.
+    - cache: SheetCache, optional. Кэш листов; None отключает кэширование.
+
+    Returns:
+    - DataFrame. Данные листа (копия, которую можно изменять).
+    """
+    path = os.path.abspath(file)
+    mtime = os.path.getmtime(path)
+    usecols = _unique_columns(usecols)
+
+    if cache is not None:
+        data = cache.get(path, mtime, sheet, usecols)
+        if data is not None:
+            return data
+
+    if usecols is None:
+        data = pd.read_excel(path, sheet, engine='openpyxl')
+    else:
+        # pd.read_excel разбирает все ячейки листа, поэтому нужные столбцы читаются потоково
+        data = read_columns(path, sheet, usecols)
+
+    if cache is not None:
+        cache.put(path, mtime, sheet, usecols, data)
+        return data.copy()
+
+    return data
+
+
+def iter_sheet_chunks(file, sheet, usecols=None, chunk_size=DEFAULT_CHUNK_SIZE, skip_rows=0):
+    """
+    Потоково читает лист Excel в режиме openpyxl read_only и возвращает строки порциями.
+
+    Parameters:
+    - file: str. Путь к файлу Excel.
+    - sheet: str. Название листа.
+    - usecols: list, optional. Столбцы, которые нужно прочитать. Если не указан, читаются все столбцы.
+    - chunk_size: int, optional. Количество строк в одной порции.
+    - skip_rows: int, optional. Количество пропускаемых строк данных после заголовка
+      (значения пропущенных строк не преобразуются и не сохраняются).
+
+    Returns:
+    - Генератор пар (названия столбцов, список кортежей значений строк).
+    """
+    workbook = load_workbook(filename=file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = _header_names(header)
+
+        if usecols is None:
+            names = header
+            positions = list(range(len(header)))
+        else:
+            names = list(_unique_columns(usecols))
+            missing = [name for name in names if name not in header]
+            if missing:
+                raise ValueError(f'Столбцы отсутствуют на листе {sheet}: {missing}')
+            positions = [header.index(name) for name in names]
+
+        if skip_rows:
+            rows = islice(rows, skip_rows, None)
+        while True:
+            # Значения ненужных столбцов отбрасываются сразу, порция хранит только выбранные
+            chunk = [tuple(row[i] if i < len(row) else None for i in positions) for row in islice(rows, chunk_size)]
+            if not chunk:
+                break
+            yield names, chunk
+    finally:
+        workbook.close()
+
+
+def _convert_cell(value):
+    """Значение ячейки в том виде, в котором его передает разбору pd.read_excel."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header_names(header):
+    """
+    Названия столбцов по строке заголовка так же, как в pd.read_excel: числа и даты
+    остаются своими значениями, пустые ячейки называются 'Unnamed: i', повторы
+    переименовываются в 'name.1', 'name.2' и т. д.
+    """
+    from pandas.io.parsers import TextParser
+
+    return list(TextParser([[_convert_cell(value) for value in header]], header=0).read().columns)
+
+
+def read_header(file, sheet):
+    """
+    Читает только строку заголовка листа (openpyxl read_only).
+
+    Returns:
+    - list. Названия столбцов в том виде, в котором их возвращает pd.read_excel.
+    """
+    workbook = load_workbook(filename=file, read_only=True, data_only=True)
+    try:
+        header = next(workbook[sheet].iter_rows(max_row=1, values_only=True), None)
+    finally:
+        workbook.close()
+
+    return _header_names(header) if header is not None else []
+
+
+def read_columns(file, sheet, usecols, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Читает только указанные столбцы листа: строки идут потоково (openpyxl read_only),
+    значения остальных столбцов отбрасываются сразу и не преобразуются.
+
+    Типы столбцов определяются тем же разбором, что и в pd.read_excel, поэтому результат
+    совпадает с pd.read_excel(..., usecols=usecols), но память пропорциональна только
+    выбранным столбцам.
+
+    Parameters:
+    - file: str. Путь к файлу Excel.
+    - sheet: str. Название листа.
+    - usecols: list. Столбцы, которые нужно прочитать.
+    - chunk_size: int, optional. Количество строк в одной порции чтения.
+
+    Returns:
+    - DataFrame. Данные выбранных столбцов в запрошенном порядке.
+    """
+    from pandas.io.parsers import TextParser
+
+    names = list(_unique_columns(usecols))
+    rows = []
+    for names, chunk in iter_sheet_chunks(file, sheet, usecols=names, chunk_size=chunk_size):
+        rows.extend([_convert_cell(value) for value in row] for row in chunk)
+    if not rows:
+        return pd.DataFrame(columns=names)
+
+    return TextParser([names, *rows], header=0).read()
+
+
+def _is_numeric_column(values):
+    """Определяет, содержит ли столбец только числа (пустые ячейки не учитываются)."""
+    has_values = False
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, numbers.Number):
+            return False
+        has_values = True
+    return has_values
+
+
+class _ColumnBuffer:
+    """Растущий типизированный массив NumPy, в который дописываются порции значений."""
+
+    def __init__(self, dtype, capacity):
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self.values = np.empty(max(capacity, 1), dtype=self.dtype)
+
+    def extend(self, chunk_values):
+        new_size = self.size + len(chunk_values)
+        if new_size > len(self.values):
+            capacity = max(new_size, 2 * len(self.values))
+            grown = np.empty(capacity, dtype=self.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+        self.values[self.size:new_size] = chunk_values
+        self.size = new_size
+
+    def finish(self):
+        if self.size == len(self.values):
+            return self.values
+        return self.values[:self.size].copy()
+
+
+def _convert_chunk(values, kind, date_format):
+    """Приводит значения одной порции столбца к типу буфера; для дат возвращает также отчет разбора."""
+    series = pd.Series(values, dtype=object)
+    if kind == 'datetime':
+        parsed, report = time_parsing.parse_time_column(series, date_format)
+        return parsed.to_numpy(dtype='datetime64[ns]'), report
+    if kind == 'numeric':
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64), None
+    return series.to_numpy(dtype=object), None
+
+
+@instrumentation.traced()
+def read_sheet_streaming(file, sheet, usecols=None, date_columns=(), date_format=time_parsing.AUTO_FORMAT,
+                         chunk_size=DEFAULT_CHUNK_SIZE, skip_rows=0):
+    """
+    Читает большой лист Excel порциями, не загружая в память весь граф ячеек openpyxl.
+
+    Тип каждого столбца определяется по первой порции: столбцы из date_columns
+    хранятся как datetime64, числовые как float64, остальные как object.
+    Даты и числа разбираются в каждой порции отдельно, нераспознанные значения
+    заменяются на NaT/NaN. При date_format='auto' формат дат определяется по первой
+    порции и используется для остальных. Отчеты разбора дат (см. time_parsing)
+    сохраняются в attrs['time_parsing'] результата. Пиковый расход памяти
+    пропорционален размеру порции и итоговым массивам.
+
+    Parameters:
+    - file: str. Путь к файлу Excel.
+    - sheet: str. Название листа.
+    - usecols: list, optional. Столбцы, которые нужно прочитать.
+    - date_columns: list, optional. Столбцы, которые нужно разобрать как даты.
+    - date_format: str, optional. Формат дат для date_columns или 'auto'.
+    - chunk_size: int, optional. Количество строк в одной порции.
+    - skip_rows: int, optional. Количество пропускаемых строк данных после заголовка.
+
+    Returns:
+    - DataFrame. Данные листа.
+    """
+    names = list(_unique_columns(usecols)) if usecols is not None else None
+    buffers = None
+    kinds = None
+    date_formats = {}
+    reports = {}
+
+    for names, chunk in iter_sheet_chunks(file, sheet, usecols=usecols, chunk_size=chunk_size, skip_rows=skip_rows):
+        columns = list(zip(*chunk))
+        if buffers is None:
+            kinds = []
+            for name, values in zip(names, columns):
+                if name in date_columns:
+                    kinds.append('datetime')
+                elif _is_numeric_column(values):
+                    kinds.append('numeric')
+                else:
+                    kinds.append('object')
+            dtypes = {'datetime': 'datetime64[ns]', 'numeric': np.float64, 'object': object}
+            buffers = [_ColumnBuffer(dtypes[kind], chunk_size) for kind in kinds]
+
+        for name, buffer, kind, values in zip(names, buffers, kinds, columns):
+            converted, report = _convert_chunk(values, kind, date_formats.get(name, date_format))
+            buffer.extend(converted)
+            if report is not None:
+                # Номера дней Excel, найденные при 'auto', не закрепляются: в остальных порциях
+                # числа по-прежнему проверяются по правдоподобному диапазону
+                if report['format'] not in (None, time_parsing.SERIAL_FORMAT):
+                    date_formats.setdefault(name, report['format'])
+                reports.setdefault(name, []).append(report)
+
+    if buffers is None:
+        return pd.DataFrame(columns=names)
+
+    result = pd.DataFrame({name: buffer.finish() for name, buffer in zip(names, buffers)}, copy=False)
+    result.attrs['time_parsing'] = {name: time_parsing.merge_reports(column_reports)
+                                    for name, column_reports in reports.items()}
+
+    return result
@@ -0,0 +1,195 @@
+"""
+Запись результатов в файлы: xlsx, csv, parquet и feather.
+
+xlsx записывается потоково через xlsxwriter в режиме constant_memory: строки сразу
+уходят в файл и граф ячеек в памяти не строится. Если xlsxwriter не установлен,
+используется DataFrame.to_excel (openpyxl); книга openpyxl в режиме write_only
+расходует меньше памяти, но медленнее, и выбирается только явно.
+Для parquet и feather нужен pyarrow; он импортируется только при записи в этих форматах.
+"""
+import importlib.util
+import os
+
+import pandas as pd
+
+import memory_optimization
+
+FORMATS = ('xlsx', 'csv', 'parquet', 'feather')
+
+# Допустимое сжатие для каждого формата (None - без сжатия) и расширения файлов
+COMPRESSIONS = {
+    'xlsx': (None,),
+    'csv': (None, 'gzip', 'bz2', 'zip', 'xz', 'zstd'),
+    'parquet': (None, 'snappy', 'gzip', 'brotli', 'lz4', 'zstd'),
+    'feather': (None, 'lz4', 'zstd'),
+}
+CSV_COMPRESSION_EXTENSIONS = {'gzip': 'gz', 'bz2': 'bz2', 'zip': 'zip', 'xz': 'xz', 'zstd': 'zst'}
+
+XLSX_ENGINES = ('auto', 'xlsxwriter', 'openpyxl', 'pandas')
+XLSX_DATE_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def file_extension(file_format, compression=None):
+    """Расширение файла с учетом сжатия (например, 'csv.gz')."""
+    if file_format == 'csv' and compression is not None:
+        return f'csv.{CSV_COMPRESSION_EXTENSIONS[compression]}'
+    return file_format
+
+
+def check_format(file_format, compression=None):
+    """Проверяет формат и сжатие; возвращает формат в нижнем регистре."""
+    file_format = file_format.lower()
+    if file_format not in FORMATS:
+        raise ValueError(f'Неизвестный формат файла: {file_format}. Допустимые значения: {FORMATS}')
+    if compression not in COMPRESSIONS[file_format]:
+        raise ValueError(f'Сжатие {compression} недоступно для формата {file_format}. '
+                         f'Допустимые значения: {COMPRESSIONS[file_format]}')
+    return file_format
+
+
+def _column_values(series):
+    """Значения столбца в виде списка объектов Python; пропуски заменяются на None."""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _iter_rows(data):
+    """Строки данных в виде кортежей; столбцы преобразуются целиком, а не по ячейкам."""
+    return zip(*(_column_values(data[column]) for column in data.columns))
+
+
+def _xlsx_engine(engine):
+    if engine not in XLSX_ENGINES:
+        raise ValueError(f'Неизвестный способ записи xlsx: {engine}. Допустимые значения: {XLSX_ENGINES}')
+    if engine == 'auto':
+        return 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'pandas'
+    return engine
+
+
+def write_xlsx(data, path, sheet='Prediction', engine='auto'):
+    """
+    Потоковая запись DataFrame в xlsx.
+
+    Ячейки Excel хранят числа как float64, поэтому столбцы float32 (режим compact)
+    записываются через кратчайшую десятичную запись значений (см. widen_float32).
+
+    Parameters:
+    - data: DataFrame. Данные для записи.
+    - path: str. Путь к файлу.
+    - sheet: str, optional. Название листа.
+    - engine: str, optional. 'xlsxwriter' (constant_memory), 'openpyxl' (write_only),
+      'pandas' (DataFrame.to_excel) или 'auto' - xlsxwriter, если он установлен, иначе 'pandas'.
+    """
+    header = [str(column) for column in data.columns]
+    engine = _xlsx_engine(engine)
+    data = memory_optimization.widen_float32(data)
+
+    if engine == 'pandas':
+        data.to_excel(path, sheet_name=sheet, index=False, engine='openpyxl')
+        return
+
+    if engine == 'xlsxwriter':
+        import xlsxwriter
+
+        # constant_memory: каждая строка сбрасывается на диск после перехода к следующей
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                              'default_date_format': XLSX_DATE_FORMAT})
+        try:
+            worksheet = workbook.add_worksheet(sheet)
+            worksheet.write_row(0, 0, header)
+            for row_number, row in enumerate(_iter_rows(data), start=1):
+                worksheet.write_row(row_number, 0, row)
+        finally:
+            workbook.close()
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet)
+    worksheet.append(header)
+    for row in _iter_rows(data):
+        worksheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(data, path, compression=None):
+    """Запись DataFrame в csv (UTF-8 с BOM, чтобы Excel правильно открыл кириллицу)."""
+    data.to_csv(path, index=False, encoding='utf-8-sig', compression=compression)
+
+
+def append_csv(data, path):
+    """
+    Дописывает строки в конец csv; заголовок и BOM записываются только при создании файла.
+
+    Parameters:
+    - data: DataFrame. Новые строки (столбцы в том же порядке, что и в файле).
+    - path: str. Путь к файлу.
+    """
+    exists = os.path.exists(path) and os.path.getsize(path) > 0
+    data.to_csv(path, index=False, mode='a' if exists else 'w', header=not exists,
+                encoding='utf-8' if exists else 'utf-8-sig')
+
+
+def _require_pyarrow(file_format):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f'Для записи в формате {file_format} нужен пакет pyarrow ({e})') from e
+
+
+def write_parquet(data, path, compression=None):
+    """Запись DataFrame в parquet (pyarrow)."""
+    _require_pyarrow('parquet')
+    data.to_parquet(path, index=False, engine='pyarrow', compression=compression)
+
+
+def write_feather(data, path, compression=None):
+    """Запись DataFrame в feather (pyarrow); индекс должен быть RangeIndex от нуля."""
+    _require_pyarrow('feather')
+    data.reset_index(drop=True).to_feather(path, compression=compression or 'uncompressed')
+
+
+def export_frame(data, path, file_format='xlsx', sheet='Prediction', compression=None, xlsx_engine='auto'):
+    """
+    Записывает DataFrame в файл выбранного формата.
+
+    Parameters:
+    - data: DataFrame. Данные для записи.
+    - path: str. Путь к файлу (расширение не добавляется, см. file_extension).
+    - file_format: str, optional. 'xlsx', 'csv', 'parquet' или 'feather'.
+    - sheet: str, optional. Название листа (только для xlsx).
+    - compression: str, optional. Сжатие (см. COMPRESSIONS).
+    - xlsx_engine: str, optional. Способ записи xlsx (см. write_xlsx).
+
+    Returns:
+    - str. Путь к записанному файлу.
+    """
+    file_format = check_format(file_format, compression)
+    if file_format == 'xlsx':
+        write_xlsx(data, path, sheet, xlsx_engine)
+    elif file_format == 'csv':
+        write_csv(data, path, compression)
+    elif file_format == 'parquet':
+        write_parquet(data, path, compression)
+    else:
+        write_feather(data, path, compression)
+
+    return path
+
+
+def read_exported(path, file_format, sheet=0):
+    """Читает файл, записанный export_frame (для проверки и бенчмарка)."""
+    file_format = check_format(file_format)
+    if file_format == 'xlsx':
+        return pd.read_excel(path, sheet_name=sheet)
+    if file_format == 'csv':
+        return pd.read_csv(path, encoding='utf-8-sig')
+    if file_format == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+
+def output_path(directory, file_name, file_format, compression=None):
+    """Полный путь к файлу результата с расширением формата."""
+    return os.path.join(directory, f'{file_name}.{file_extension(file_format, compression)}')
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+TRAIN_LABEL = 'Обучающая'
+TEST_LABEL = 'Тестовая'
+FORECAST_LABEL = 'Прогноз'
+
+# Категории столбца 'Тип данных' при хранении меток в виде Categorical
+LABEL_CATEGORIES = pd.CategoricalDtype([TRAIN_LABEL, TEST_LABEL, FORECAST_LABEL])
+
+
+def split_params(params_train):
+    """
+    Разделяет обученные параметры на свободный член и коэффициенты факторов.
+
+    Parameters:
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+
+    Returns:
+    - Tuple. Свободный член, список названий факторов и вектор коэффициентов.
+    """
+    params = pd.Series(params_train, dtype='float64')
+    const_param = float(params.get('const', 0))
+    selected_params = [param for param in params.index if param != 'const']
+    coefficients = params[selected_params].to_numpy(dtype=np.float64)
+
+    return const_param, selected_params, coefficients
+
+
+def build_design_matrix(data, selected_params):
+    """
+    Собирает матрицу факторов (без столбца констант) в виде непрерывного массива float64.
+
+    Parameters:
+    - data: DataFrame. Данные для прогноза.
+    - selected_params: list. Названия столбцов-факторов в порядке коэффициентов.
+
+    Returns:
+    - np.ndarray. Матрица размера (число строк, число факторов).
+    """
+    return np.ascontiguousarray(data[selected_params].to_numpy(dtype=np.float64))
+
+
+def predict_values(data, params_train):
+    """
+    Рассчитывает прогноз для всех строк одним матричным умножением.
+
+    Parameters:
+    - data: DataFrame. Данные для прогноза.
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+
+    Returns:
+    - np.ndarray. Прогнозные значения для каждой строки.
+    """
+    const_param, selected_params, coefficients = split_params(params_train)
+    if not selected_params:
+        return np.full(len(data), const_param, dtype=np.float64)
+
+    design_matrix = build_design_matrix(data, selected_params)
+
+    return design_matrix @ coefficients + const_param
+
+
+def label_data_type(row_count, split_index, categorical=False):
+    """
+    Формирует метки обучающей и тестовой выборки для всех строк сразу.
+
+    Parameters:
+    - row_count: int. Количество строк.
+    - split_index: int. Номер первой строки тестовой выборки.
+    - categorical: bool, optional. Вернуть Categorical (один байт на строку) вместо строк.
+
+    Returns:
+    - np.ndarray или pd.Categorical. Метки 'Обучающая' / 'Тестовая'.
+    """
+    is_test = np.arange(row_count) >= split_index
+    if categorical:
+        return pd.Categorical.from_codes(is_test.astype(np.int8), dtype=LABEL_CATEGORIES)
+    return np.where(is_test, TEST_LABEL, TRAIN_LABEL).astype(object)
+
+
+@instrumentation.traced()
+def learn_on_params_vectorized(data, params_train, len_dataset_learn, chosen_column_for_predict,
+                               categorical_labels=False):
+    """
+    Векторизованный аналог learn_on_params: тот же результат без построчного обхода.
+
+    Parameters:
+    - data: DataFrame. Данные для прогноза.
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+    - len_dataset_learn: int. Процент данных, используемых для обучения (от 1 до 100).
+    - chosen_column_for_predict: str. Название прогнозируемого столбца.
+    - categorical_labels: bool, optional. Хранить 'Тип данных' как Categorical.
+
+    Returns:
+    - DataFrame. Данные с добавленным столбцом 'Прогноз' и меткой 'Тип данных'.
+    """
+    split_index = int(len(data) * (len_dataset_learn / 100))
+
+    data[f'Прогноз {chosen_column_for_predict}'] = predict_values(data, params_train)
+    data['Тип данных'] = label_data_type(len(data), split_index, categorical_labels)
+
+    return data
+
+
+def parse_model_terms(params_train, columns):
+    """
+    Разбирает названия параметров модели на (столбец, лаг, коэффициент).
+
+    Parameters:
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+    - columns: iterable. Столбцы данных.
+
+    Returns:
+    - Tuple. Свободный член и список кортежей (столбец, лаг, коэффициент); лаг 0 - текущее значение.
+    """
+    const_param, selected_params, coefficients = split_params(params_train)
+    columns = set(columns)
+    terms = []
+    for name, coefficient in zip(selected_params, coefficients):
+        # Лаговый столбец '<столбец>_lag_<номер>' сводится к исходному столбцу со сдвигом
+        column, separator, lag = name.rpartition('_lag_')
+        if separator and column in columns and lag.isdigit():
+            terms.append((column, int(lag), coefficient))
+        elif name in columns:
+            terms.append((name, 0, coefficient))
+        else:
+            raise ValueError(f'Не удалось определить столбец и лаг параметра {name}')
+
+    return const_param, terms
+
+
+def future_time_index(times, steps):
+    """
+    Продолжает ряд временных меток на steps периодов вперед.
+
+    Шаг определяется по частоте последних меток (pd.infer_freq), а если частоту
+    определить нельзя - по разнице между двумя последними метками.
+    """
+    times = pd.to_datetime(pd.Series(times)).dropna()
+    if len(times) < 2:
+        return pd.Series(pd.NaT, index=range(steps), dtype='datetime64[ns]')
+    last_time = times.iloc[-1]
+    frequency = pd.infer_freq(times.iloc[-10:]) if len(times) >= 3 else None
+    if frequency is not None:
+        return pd.Series(pd.date_range(start=last_time, periods=steps + 1, freq=frequency)[1:])
+
+    time_step = last_time - times.iloc[-2]
+    return pd.Series(last_time + time_step * np.arange(1, steps + 1))
+
+
+def forecast_horizon(data, params_train, chosen_column_for_predict, steps, future_factors=None):
+    """
+    Рекурсивный прогноз на steps шагов вперед после последней строки данных.
+
+    Вклад факторов считается для всех шагов сразу, а лаги прогнозируемого столбца
+    на каждом шаге берутся из уже спрогнозированных значений. Все расчеты ведутся
+    на заранее выделенных массивах NumPy.
+
+    Parameters:
+    - data: DataFrame. История (подготовленные данные, лаги не обязательны).
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+    - chosen_column_for_predict: str. Прогнозируемый столбец.
+    - steps: int. Количество шагов прогноза.
+    - future_factors: dict или DataFrame, optional. Будущие значения факторов (не короче steps).
+      Для факторов, значения которых не переданы, сохраняется последнее известное значение.
+
+    Returns:
+    - Tuple. Массив прогнозов длины steps и словарь {столбец: массив история+будущее},
+      где первые max_lag значений - хвост истории.
+    """
+    const_param, terms = parse_model_terms(params_train, data.columns)
+    max_lag = max([lag for _, lag, _ in terms], default=0)
+    future_factors = future_factors if future_factors is not None else {}
+
+    # Массивы столбцов: последние max_lag значений истории, затем steps будущих значений
+    series = {}
+    for column in dict.fromkeys([*(column for column, _, _ in terms), chosen_column_for_predict]):
+        history = data[column].to_numpy(dtype=np.float64)[-max_lag:] if max_lag else np.empty(0)
+        values = np.zeros(max_lag + steps, dtype=np.float64)
+        values[max_lag - len(history):max_lag] = np.nan_to_num(history)
+        if column == chosen_column_for_predict:
+            values[max_lag:] = np.nan
+        elif column in future_factors:
+            future_values = np.asarray(future_factors[column], dtype=np.float64)
+            if len(future_values) < steps:
+                raise ValueError(f'Для фактора {column} передано меньше {steps} будущих значений')
+            values[max_lag:] = future_values[:steps]
+        else:
+            values[max_lag:] = values[max_lag - 1] if max_lag else data[column].iloc[-1]
+        series[column] = values
+
+    # Вклад константы и факторов известен заранее для всех шагов
+    exogenous = np.full(steps, const_param, dtype=np.float64)
+    target_lags = {}
+    for column, lag, coefficient in terms:
+        if column == chosen_column_for_predict:
+            target_lags[lag] = coefficient
+        else:
+            exogenous += coefficient * series[column][max_lag - lag:max_lag - lag + steps]
+
+    target = series[chosen_column_for_predict]
+    if not target_lags:
+        target[max_lag:] = exogenous
+        return exogenous, series
+
+    # Коэффициенты лагов прогнозируемого столбца в порядке лаг 1, 2, ...
+    target_lag_count = max(target_lags)
+    autoregression = np.array([target_lags.get(lag, 0.0) for lag in range(1, target_lag_count + 1)])
+    for step in range(steps):
+        position = max_lag + step
+        window = target[position - target_lag_count:position][::-1]
+        target[position] = exogenous[step] + autoregression @ window
+
+    return target[max_lag:].copy(), series
+
+
+@instrumentation.traced()
+def append_horizon_forecast(data, params_train, chosen_column_for_predict, steps, future_factors=None,
+                            column_time=None):
+    """
+    Добавляет к данным steps будущих строк с рекурсивным прогнозом.
+
+    Parameters:
+    - data: DataFrame. Данные с прогнозом (результат learn_on_params).
+    - params_train: dict или Series. Обученные параметры, включая 'const'.
+    - chosen_column_for_predict: str. Прогнозируемый столбец.
+    - steps: int. Количество шагов прогноза.
+    - future_factors: dict или DataFrame, optional. Будущие значения факторов.
+    - column_time: str, optional. Столбец с временными метками, который нужно продолжить.
+
+    Returns:
+    - DataFrame. Исходные данные и будущие строки с меткой 'Прогноз' в столбце 'Тип данных'.
+    """
+    if steps <= 0:
+        return data
+
+    forecast, series = forecast_horizon(data, params_train, chosen_column_for_predict, steps, future_factors)
+    max_lag = len(next(iter(series.values()))) - steps
+
+    future = {}
+    if column_time is not None and column_time in data.columns:
+        future[column_time] = future_time_index(data[column_time], steps).to_numpy()
+    for column, values in series.items():
+        if column != chosen_column_for_predict:
+            future[column] = values[max_lag:]
+        # Лаговые столбцы будущих строк заполняются из тех же массивов
+        for lag in range(1, max_lag + 1):
+            lag_column_name = f'{column}_lag_{lag}'
+            if lag_column_name in data.columns:
+                future[lag_column_name] = series[column][max_lag - lag:max_lag - lag + steps]
+    future[f'Прогноз {chosen_column_for_predict}'] = forecast
+    if isinstance(data['Тип данных'].dtype, pd.CategoricalDtype):
+        # Те же категории, что и у данных: при объединении столбец остается Categorical
+        future['Тип данных'] = pd.Categorical(np.full(steps, FORECAST_LABEL), dtype=data['Тип данных'].dtype)
+    else:
+        future['Тип данных'] = np.full(steps, FORECAST_LABEL, dtype=object)
+
+    future_df = pd.DataFrame(future, index=pd.RangeIndex(len(data), len(data) + steps))
+    # Будущие строки хранятся в тех же типах с плавающей точкой, что и данные (например, float32)
+    future_df = future_df.astype({column: data[column].dtype for column in future_df.columns
+                                  if column in data.columns and pd.api.types.is_float_dtype(data[column])})
+
+    return pd.concat([data, future_df], axis=0)
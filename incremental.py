@@ -0,0 +1,390 @@
+"""
+Инкрементальное обновление ADL-модели при появлении новых строк на листе Excel.
+
+Первый запуск оценивает модель на обучающей части листа, проверяет ее на тестовой
+части (MAPE вне выборки), затем оценивает модель по всем строкам и сохраняет рядом с
+файлом данных (в каталоге .adl_state) ее состояние: суммы XᵀX и Xᵀy по всем строкам,
+последние значения столбцов с лагами, последнюю временную метку и число прочитанных
+строк листа. Прогнозы в файле результата получены той же моделью, что сохранена.
+Последующие запуски берут только новые строки, прогнозируют их текущими
+коэффициентами (вне выборки), добавляют их в суммы и пересчитывают коэффициенты. Новые
+прогнозы дописываются в конец файла результата (csv). Пересчет модели зависит от
+количества новых строк и числа факторов, но не от длины истории. Чтение листа - нет:
+xlsx нельзя прочитать с середины, поэтому openpyxl разбирает и все прежние строки
+(их значения только не преобразуются и не сохраняются), и время чтения растет
+с размером листа (см. benchmarks/bench_incremental.py).
+
+Запуск:
+    python incremental.py --file data.xlsx --sheet Sheet1 --target y --time-column date --factors x1 x2 y
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import excel_loader
+import export
+import forecast_engine
+import metrics
+import pipeline
+import utilities as util
+
+STATE_VERSION = 2
+STATE_DIRECTORY = '.adl_state'
+
+
+def state_path(file, sheet, column_for_predict):
+    """Путь к файлу состояния модели рядом с файлом данных."""
+    directory = os.path.join(os.path.dirname(os.path.abspath(file)), STATE_DIRECTORY)
+    base_name = os.path.splitext(os.path.basename(file))[0]
+    name = util.process_string_filename(f'{base_name} {sheet} {column_for_predict}')
+    return os.path.join(directory, f'{name}.npz')
+
+
+def _read_rows(file, sheet, usecols, column_for_predict, skip_rows):
+    """
+    Читает строки листа после skip_rows первых строк данных.
+
+    Пропущенные строки все равно разбираются openpyxl (лист xlsx читается только с начала),
+    поэтому время чтения пропорционально всему листу, а не только новым строкам.
+
+    Returns:
+    - Tuple. DataFrame новых строк и количество строк листа, которые считаются прочитанными.
+      Строки в конце листа без значения прогнозируемого столбца не учитываются: они будут
+      прочитаны при следующем обновлении, когда значение появится.
+    """
+    raw = excel_loader.read_sheet_streaming(file, sheet, usecols=usecols, skip_rows=skip_rows)
+    filled = np.flatnonzero(raw[column_for_predict].notna().to_numpy())
+    consumed = int(filled[-1]) + 1 if len(filled) else 0
+
+    return raw.iloc[:consumed], consumed
+
+
+def _ape_totals(actual, forecast):
+    """Сумма процентных ошибок и число строк с ненулевым фактом (как в metrics.evaluate)."""
+    values = metrics.group_metrics(actual, forecast, np.zeros(len(actual), dtype=np.int64), 1)
+    count = int(values['count'][0] - values['zero_actuals'][0])
+    return (float(values['mape'][0]) * count if count else 0.0), count
+
+
+def _solve(gram, cross):
+    """Решает нормальные уравнения; масштабирование по диагонали XᵀX улучшает обусловленность."""
+    scale = np.sqrt(np.diag(gram))
+    scale[scale == 0] = 1.0
+    scaled = np.linalg.lstsq(gram / np.outer(scale, scale), cross / scale, rcond=None)[0]
+    return scaled / scale
+
+
+class IncrementalModel:
+    """
+    Состояние модели для инкрементального обновления.
+
+    Коэффициенты - решение нормальных уравнений по всем учтенным строкам
+    (XᵀX)β = Xᵀy. MAPE считается отдельно в выборке (строки первого построения,
+    прогноз моделью по всем этим строкам) и вне выборки (тестовая часть первого
+    построения и новые строки, прогноз которых сделан коэффициентами, полученными
+    до их добавления).
+    """
+
+    def __init__(self, spec, factor_names, lags, gram, cross, window, last_time, rows, source_rows,
+                 ape_sum, ape_count, in_sample_ape_sum, in_sample_ape_count, output_columns, output_path):
+        self.spec = spec
+        self.factor_names = factor_names
+        self.lags = lags
+        self.gram = gram
+        self.cross = cross
+        self.coefficients = _solve(gram, cross)
+        self.window = window
+        self.last_time = last_time
+        self.rows = rows
+        self.source_rows = source_rows
+        self.ape_sum = ape_sum
+        self.ape_count = ape_count
+        self.in_sample_ape_sum = in_sample_ape_sum
+        self.in_sample_ape_count = in_sample_ape_count
+        self.output_columns = output_columns
+        self.output_path = output_path
+
+    @property
+    def params(self):
+        return pd.Series(self.coefficients, index=['const', *self.factor_names])
+
+    @property
+    def mape(self):
+        """MAPE вне выборки."""
+        return self.ape_sum / self.ape_count if self.ape_count else np.nan
+
+    @property
+    def in_sample_mape(self):
+        """MAPE в выборке первого построения."""
+        return self.in_sample_ape_sum / self.in_sample_ape_count if self.in_sample_ape_count else np.nan
+
+    @property
+    def usecols(self):
+        spec = self.spec
+        return list(dict.fromkeys([spec['column_time'], *spec['selected_columns'], spec['column_for_predict']]))
+
+    @property
+    def window_size(self):
+        return max(self.lags.values(), default=0)
+
+    def _features(self, data):
+        return np.column_stack([np.ones(len(data)), data[self.factor_names].to_numpy(dtype=np.float64)])
+
+    @classmethod
+    def fit(cls, file, sheet, column_for_predict, column_time, column_factors, lag_count=1, train_percent=66,
+            date_format='auto', output_path=None):
+        """
+        Строит модель по листу и создает состояние.
+
+        Модель, оцененная на первых train_percent процентах строк (как в run_model_pipeline),
+        прогнозирует остальные строки - по ним считается MAPE вне выборки. Сохраняемое
+        состояние и прогноз в файле результата - модель, оцененная по всем строкам
+        ('Тип данных' - 'Обучающая'); по ним считается MAPE в выборке.
+
+        Parameters:
+        - file, sheet, column_for_predict, column_time, column_factors, lag_count, train_percent,
+          date_format: параметры модели (см. run_model_pipeline).
+        - output_path: str, optional. Файл результата (csv); по умолчанию рядом с файлом состояния.
+
+        Returns:
+        - Tuple. IncrementalModel и DataFrame с прогнозом для всех строк.
+        """
+        selected_columns, create_lag_flag = pipeline.select_columns(column_for_predict, column_factors)
+        usecols = list(dict.fromkeys([column_time, *selected_columns, column_for_predict]))
+        raw, consumed = _read_rows(file, sheet, usecols, column_for_predict, 0)
+        prepared = util.prepare_frame(raw, column_time, column_for_predict, selected_columns, date_format)
+
+        data = util.create_lags(prepared, selected_columns, lag_count, create_lag_flag, column_for_predict)
+        model_columns = pipeline.model_columns(column_for_predict, selected_columns, create_lag_flag)
+        factor_names = util.model_factor_names(column_for_predict, model_columns, lag_count)
+        data_learn, _ = util.separation_data(data, train_percent)
+        features = np.column_stack([np.ones(len(data)), data[factor_names].to_numpy(dtype=np.float64)])
+        target = data[column_for_predict].to_numpy(dtype=np.float64)
+
+        # Проверка вне выборки: модель обучающей части прогнозирует тестовую часть
+        model = util.create_model(data_learn, column_for_predict, model_columns, lag_count)
+        holdout = features[len(data_learn):] @ model.params[['const', *factor_names]].to_numpy(dtype=np.float64)
+        ape_sum, ape_count = _ape_totals(target[len(data_learn):], holdout)
+
+        lags = util.lag_depths(util.lag_columns(selected_columns, create_lag_flag, column_for_predict), lag_count)
+        lags = {column: depth for column, depth in lags.items() if depth > 0}
+        window_size = max(lags.values(), default=0)
+        # Последние значения столбцов с лагами; недостающие в начале - нули, как в create_lags
+        window = {}
+        for column in lags:
+            values = data[column].to_numpy(dtype=np.float64)[-window_size:] if window_size else np.empty(0)
+            window[column] = np.concatenate([np.zeros(window_size - len(values)), values])
+
+        if output_path is None:
+            output_path = os.path.splitext(state_path(file, sheet, column_for_predict))[0] + '.csv'
+
+        time_report = prepared.attrs.get('time_parsing', {})
+        spec = {
+            'file': os.path.abspath(file),
+            'sheet': sheet,
+            'column_for_predict': column_for_predict,
+            'column_time': column_time,
+            'column_factors': list(column_factors),
+            'selected_columns': selected_columns,
+            'lag_count': lag_count,
+            'train_percent': train_percent,
+            # Формат, определенный при первом чтении, используется и для новых строк
+            'date_format': time_report.get('format') or date_format,
+        }
+        state = cls(spec, factor_names, lags, features.T @ features, features.T @ target, window,
+                    data[column_time].iloc[-1] if len(data) else None, len(data), consumed,
+                    ape_sum, ape_count, 0.0, 0, None, output_path)
+
+        # Файл результата и MAPE в выборке - по модели, которая сохраняется в состоянии
+        result_data = util.learn_on_params(data, state.params, 100, column_for_predict)
+        util.calculate_mape(result_data, column_for_predict)
+        state.in_sample_ape_sum, state.in_sample_ape_count = _ape_totals(
+            target, result_data[f'Прогноз {column_for_predict}'].to_numpy(dtype=np.float64))
+        state.output_columns = list(result_data.columns)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        export.append_csv(result_data, output_path)
+
+        return state, result_data
+
+    def update(self, new_rows):
+        """
+        Учитывает новые подготовленные строки (результат prepare_frame).
+
+        Строки с временной меткой не позже последней учтенной пропускаются.
+
+        Returns:
+        - DataFrame. Новые строки с лагами, прогнозом ('Тип данных' - 'Тестовая') и MAPE.
+        """
+        spec = self.spec
+        column_time = spec['column_time']
+        column_for_predict = spec['column_for_predict']
+        if self.last_time is not None:
+            new_rows = new_rows[new_rows[column_time] > self.last_time]
+        new_rows = new_rows.reset_index(drop=True)
+        for column in spec['selected_columns'] + [column_for_predict]:
+            new_rows[column] = pd.to_numeric(new_rows[column], errors='coerce').fillna(0)
+        if new_rows.empty:
+            return new_rows.reindex(columns=self.output_columns)
+
+        # Лаги новых строк строятся по сохраненному окну и самим новым строкам
+        window_size = self.window_size
+        extended = pd.DataFrame({column: np.concatenate([self.window[column], new_rows[column].to_numpy()])
+                                 for column in self.lags}, index=pd.RangeIndex(window_size + len(new_rows)))
+        lag_data = util.build_lag_matrix(extended, self.lags, fill_value=0).iloc[window_size:]
+        new_rows = pd.concat([new_rows, lag_data.set_axis(new_rows.index)], axis=1)
+
+        features = self._features(new_rows)
+        target = new_rows[column_for_predict].to_numpy(dtype=np.float64)
+        new_rows[f'Прогноз {column_for_predict}'] = features @ self.coefficients
+        new_rows['Тип данных'] = forecast_engine.TEST_LABEL
+        util.calculate_mape(new_rows, column_for_predict)
+
+        # Обновление сумм и коэффициентов: O(новые строки · k² + k³)
+        self.gram += features.T @ features
+        self.cross += features.T @ target
+        self.coefficients = _solve(self.gram, self.cross)
+        self.window = {column: extended[column].to_numpy()[len(extended) - window_size:] for column in self.lags}
+        self.last_time = new_rows[column_time].iloc[-1]
+        self.rows += len(new_rows)
+        ape_sum, ape_count = _ape_totals(target, new_rows[f'Прогноз {column_for_predict}'].to_numpy())
+        self.ape_sum += ape_sum
+        self.ape_count += ape_count
+
+        return new_rows.reindex(columns=self.output_columns)
+
+    def refresh(self):
+        """
+        Берет с листа только строки, появившиеся после прошлого обновления, учитывает их
+        и дописывает их прогноз в файл результата. Лист при этом читается с начала (см. _read_rows).
+
+        Returns:
+        - DataFrame. Новые строки с прогнозом (пустой, если новых строк нет).
+        """
+        spec = self.spec
+        raw, consumed = _read_rows(spec['file'], spec['sheet'], self.usecols, spec['column_for_predict'],
+                                   self.source_rows)
+        if not consumed:
+            return pd.DataFrame(columns=self.output_columns)
+
+        new_rows = util.prepare_frame(raw, spec['column_time'], spec['column_for_predict'],
+                                      spec['selected_columns'], spec['date_format'])
+        result = self.update(new_rows)
+        self.source_rows += consumed
+        if not result.empty:
+            export.append_csv(result, self.output_path)
+
+        return result
+
+    def save(self, path):
+        """Сохраняет состояние в файл .npz (запись через временный файл)."""
+        meta = {
+            'version': STATE_VERSION,
+            'spec': self.spec,
+            'factor_names': self.factor_names,
+            'lags': self.lags,
+            'last_time': None if self.last_time is None else pd.Timestamp(self.last_time).isoformat(),
+            'rows': self.rows,
+            'source_rows': self.source_rows,
+            'ape_sum': self.ape_sum,
+            'ape_count': self.ape_count,
+            'in_sample_ape_sum': self.in_sample_ape_sum,
+            'in_sample_ape_count': self.in_sample_ape_count,
+            'output_columns': [str(column) for column in self.output_columns],
+            'output_path': os.path.abspath(self.output_path),
+        }
+        windows = {f'window_{i}': self.window[column] for i, column in enumerate(self.lags)}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as state_file:
+            np.savez(state_file, meta=np.array(json.dumps(meta, ensure_ascii=False)), gram=self.gram,
+                     cross=self.cross, **windows)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Загружает состояние, сохраненное save; для другой версии формата возвращает None."""
+        with np.load(path, allow_pickle=False) as state_file:
+            meta = json.loads(str(state_file['meta']))
+            if meta.get('version') != STATE_VERSION:
+                return None
+            window = {column: state_file[f'window_{i}'] for i, column in enumerate(meta['lags'])}
+            gram, cross = state_file['gram'], state_file['cross']
+
+        return cls(meta['spec'], meta['factor_names'], meta['lags'], gram, cross, window,
+                   None if meta['last_time'] is None else pd.Timestamp(meta['last_time']),
+                   meta['rows'], meta['source_rows'], meta['ape_sum'], meta['ape_count'],
+                   meta['in_sample_ape_sum'], meta['in_sample_ape_count'], meta['output_columns'],
+                   meta['output_path'])
+
+
+def refresh_model(file, sheet, column_for_predict, column_time, column_factors, lag_count=1, train_percent=66,
+                  date_format='auto', path=None, rebuild=False):
+    """
+    Обновляет модель по новым строкам листа, а при первом запуске (или rebuild) строит ее заново.
+
+    Если сохраненное состояние относится к другим параметрам модели, модель также строится заново.
+
+    Returns:
+    - Tuple. IncrementalModel и DataFrame строк, прогноз которых записан при этом запуске.
+    """
+    path = path or state_path(file, sheet, column_for_predict)
+    state = None if rebuild or not os.path.exists(path) else IncrementalModel.load(path)
+    requested = {'column_time': column_time, 'column_factors': list(column_factors), 'lag_count': lag_count,
+                 'train_percent': train_percent}
+    if state is not None and any(state.spec[key] != value for key, value in requested.items()):
+        state = None
+
+    if state is None:
+        state, new_rows = IncrementalModel.fit(file, sheet, column_for_predict, column_time, column_factors,
+                                               lag_count, train_percent, date_format)
+    else:
+        new_rows = state.refresh()
+    state.save(path)
+
+    return state, new_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Инкрементальное обновление ADL-модели по новым строкам листа.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--file', required=True, help='путь к файлу Excel')
+    parser.add_argument('--sheet', required=True, help='название листа')
+    parser.add_argument('--target', required=True, help='столбец, который нужно прогнозировать')
+    parser.add_argument('--time-column', required=True, help='столбец с временными метками')
+    parser.add_argument('--factors', required=True, nargs='+', help='столбцы-факторы модели')
+    parser.add_argument('--lags', type=int, default=1, help='количество лагов (по умолчанию 1)')
+    parser.add_argument('--train-percent', type=int, default=66,
+                        help='процент обучающей выборки при первом построении (по умолчанию 66)')
+    parser.add_argument('--date-format', default='auto', help='формат даты (по умолчанию auto)')
+    parser.add_argument('--state', default=None, help='файл состояния (по умолчанию в каталоге .adl_state)')
+    parser.add_argument('--rebuild', action='store_true', help='построить модель заново по всему листу')
+    args = parser.parse_args(argv)
+
+    try:
+        state, new_rows = refresh_model(args.file, args.sheet, args.target, args.time_column, args.factors,
+                                        args.lags, args.train_percent, args.date_format, args.state, args.rebuild)
+    except Exception as e:
+        print(f'Ошибка: {e}', file=sys.stderr)
+        return 1
+
+    print(f'Новых строк: {len(new_rows)}, всего строк: {state.rows}')
+    print('Параметры модели:')
+    for name, value in state.params.items():
+        print(f'  {name}: {value:.6g}')
+    print(f'MAPE в выборке: {state.in_sample_mape:.4f}% (строк с ненулевым фактом {state.in_sample_ape_count})')
+    print(f'MAPE вне выборки: {state.mape:.4f}% (строк с ненулевым фактом {state.ape_count})')
+    print(f'Файл: {state.output_path}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Чтение данных из нескольких книг Excel: каталога или шаблона пути (например, data/2024-*.xlsx).
+
+Каждая книга (и каждый ее лист, если выбраны все листы) читается в отдельном
+процессе; там же разбирается столбец времени. Затем части объединяются,
+сортируются по времени, а повторяющиеся временные метки из пересекающихся
+файлов удаляются. Общее время чтения близко ко времени чтения самой большой книги.
+
+data_preparation использует этот модуль, если вместо файла указан каталог или шаблон.
+"""
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import excel_loader
+import instrumentation
+import time_parsing
+
+WORKBOOK_PATTERN = '*.xlsx'
+# Название листа, означающее все листы каждой книги
+ALL_SHEETS = '*'
+KEEP = ('last', 'first')
+
+
+def is_multi_source(source):
+    """
+    Указан ли каталог или шаблон пути, а не один файл.
+
+    Существующий файл всегда считается одним файлом, даже если в его имени есть символы шаблона
+    (например, 'Отчет [v2].xlsx').
+    """
+    if os.path.isfile(source):
+        return False
+    return os.path.isdir(source) or any(character in source for character in '*?[')
+
+
+def expand_sources(source):
+    """
+    Список книг каталога или шаблона пути в порядке имен файлов.
+
+    Временные файлы Excel ('~$...') пропускаются.
+    """
+    if os.path.isdir(source):
+        source = os.path.join(source, WORKBOOK_PATTERN)
+    files = sorted(path for path in glob.glob(source, recursive=True)
+                   if os.path.isfile(path) and not os.path.basename(path).startswith('~$'))
+    if not files:
+        raise FileNotFoundError(f'Не найдено ни одной книги Excel: {source}')
+    return [os.path.abspath(path) for path in files]
+
+
+def sheet_names(source):
+    """Листы книги; для каталога или шаблона - листы первой книги и ALL_SHEETS."""
+    from openpyxl import load_workbook
+
+    file = expand_sources(source)[0] if is_multi_source(source) else source
+    workbook = load_workbook(filename=file, read_only=True)
+    try:
+        names = list(workbook.sheetnames)
+    finally:
+        workbook.close()
+    return [*names, ALL_SHEETS] if is_multi_source(source) else names
+
+
+def _read_workbook(file, sheet, usecols, column_time, date_format):
+    """Читает лист (или все листы) одной книги и разбирает столбец времени; выполняется в процессе пула."""
+    start = time.perf_counter()
+    parts = []
+    try:
+        for name in sheet_names(file) if sheet == ALL_SHEETS else [sheet]:
+            data = excel_loader.read_sheet(file, name, usecols=usecols, cache=None)
+            report = None
+            if column_time is not None:
+                data[column_time], report = time_parsing.parse_time_column(data[column_time], date_format)
+                data = data.dropna(subset=[column_time])
+            parts.append((name, data, report))
+    except Exception as e:
+        raise ValueError(f'{os.path.basename(file)}: {e}') from e
+
+    return parts, time.perf_counter() - start
+
+
+@instrumentation.traced()
+def read_sources(source, sheet, usecols=None, column_time=None, date_format=time_parsing.AUTO_FORMAT, keep='last',
+                 max_workers=None):
+    """
+    Читает все книги каталога или шаблона пути параллельно и объединяет их в одну таблицу.
+
+    Parameters:
+    - source: str. Каталог (читаются все *.xlsx) или шаблон пути.
+    - sheet: str. Название листа в каждой книге или ALL_SHEETS - все листы.
+    - usecols: list, optional. Читаемые столбцы (по умолчанию все).
+    - column_time: str, optional. Столбец времени: разбирается при чтении, по нему строки
+      сортируются и удаляются повторяющиеся метки. Без него части просто объединяются.
+    - date_format: str, optional. Формат даты или 'auto' (формат определяется для каждой книги).
+    - keep: str, optional. Какую строку оставить при повторе метки: 'last' - из книги, которая
+      позже в порядке имен файлов (по умолчанию), или 'first'.
+    - max_workers: int, optional. Количество процессов (по умолчанию - по числу книг, не больше числа ядер).
+
+    Returns:
+    - DataFrame. Объединенные данные; отчет о разборе времени хранится в attrs['time_parsing'],
+      сведения о прочитанных книгах - в attrs['ingestion'].
+    """
+    if keep not in KEEP:
+        raise ValueError(f'Неизвестное значение keep: {keep}. Допустимые значения: {KEEP}')
+    files = expand_sources(source) if is_multi_source(source) else [os.path.abspath(source)]
+    arguments = [files, [sheet] * len(files), [usecols] * len(files), [column_time] * len(files),
+                 [date_format] * len(files)]
+
+    workers = min(len(files), max_workers or os.cpu_count() or 1)
+    if workers == 1:
+        results = list(map(_read_workbook, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_workbook, *arguments))
+
+    parts = [(file, name, data, report) for file, (file_parts, _) in zip(files, results)
+             for name, data, report in file_parts]
+    data = pd.concat([part[2] for part in parts], ignore_index=True) if parts else pd.DataFrame(columns=usecols)
+    row_count = len(data)
+
+    duplicates = 0
+    if column_time is not None:
+        # Устойчивая сортировка сохраняет порядок книг для одинаковых меток
+        data = data.sort_values(column_time, kind='stable')
+        duplicated = data[column_time].duplicated(keep=keep).to_numpy()
+        duplicates = int(duplicated.sum())
+        data = data[~duplicated]
+        data.attrs['time_parsing'] = {column_time: time_parsing.merge_reports([part[3] for part in parts])}
+    data = data.reset_index(drop=True)
+
+    data.attrs['ingestion'] = {
+        'files': files,
+        'sheets': [f'{os.path.basename(file)}: {name}' for file, name, _, _ in parts],
+        'rows': row_count,
+        'duplicates': duplicates,
+        'read_seconds': {file: round(seconds, 6) for file, (_, seconds) in zip(files, results)},
+    }
+
+    return data
+
+
+def read_table(source, sheet, usecols=None):
+    """Лист одной книги (через кэш excel_loader) или объединение листов всех книг каталога или шаблона."""
+    if is_multi_source(source):
+        return read_sources(source, sheet, usecols=usecols)
+    return excel_loader.read_sheet(source, sheet, usecols=usecols)
+
+
+def format_ingestion(info):
+    """Краткое текстовое описание attrs['ingestion']."""
+    slowest = max(info['read_seconds'].values(), default=0)
+    text = (f"Прочитано книг: {len(info['files'])}, листов: {len(info['sheets'])}, строк: {info['rows']}, "
+            f"самая долгая книга: {slowest:.2f} с")
+    if info['duplicates']:
+        text += f", удалено повторяющихся меток времени: {info['duplicates']}"
+    return text
@@ -0,0 +1,337 @@
+"""
+Замеры построения модели: интервалы времени по этапам, пиковая память, число строк,
+структурированные записи журнала, файл трассировки (JSON или CSV) и профиль cProfile.
+
+Пока трассировка не включена, декоратор traced и span почти ничего не стоят: они
+только проверяют, есть ли активная трассировка. Трассировка включается контекстом
+session (в cli.py - флагами --trace и --profile) или переменными окружения:
+    ADL_TRACE=trace.json    - записать интервалы в JSON (или CSV, если расширение .csv)
+    ADL_PROFILE=run.prof    - записать профиль cProfile (смотреть: python -m pstats run.prof)
+    ADL_LOG_FORMAT=json     - выводить журнал в виде JSON-строк (см. configure_logging)
+
+tracemalloc работает на весь процесс, поэтому его запуском и остановкой владеет счетчик
+активных трассировок: tracemalloc останавливается, когда завершается последняя из них.
+Пиковая память интервала замеряется, только если все это время трассировка была единственной;
+если одновременно идут несколько расчетов (например, в окне программы), пик не
+разделяется между ними, и peak_memory_bytes таких интервалов - None.
+"""
+import contextlib
+import contextvars
+import cProfile
+import csv
+import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger('adl')
+
+TRACE_ENV = 'ADL_TRACE'
+PROFILE_ENV = 'ADL_PROFILE'
+LOG_FORMAT_ENV = 'ADL_LOG_FORMAT'
+
+SPAN_FIELDS = ['name', 'parent', 'depth', 'start', 'duration_s', 'peak_memory_bytes', 'rows_in', 'rows_out',
+               'status', 'error']
+
+_current_tracer = contextvars.ContextVar('adl_tracer', default=None)
+
+_memory_lock = threading.Lock()
+# Число трассировок, замеряющих память, и запущен ли tracemalloc ими (а не извне)
+_memory_users = 0
+_memory_owned = False
+# Увеличивается каждый раз, когда память начинают замерять одновременно несколько трассировок
+_memory_overlaps = 0
+
+
+def _acquire_memory():
+    global _memory_users, _memory_owned, _memory_overlaps
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_owned = True
+        _memory_users += 1
+        if _memory_users > 1:
+            _memory_overlaps += 1
+
+
+def _release_memory():
+    global _memory_users, _memory_owned
+    with _memory_lock:
+        _memory_users -= 1
+        if _memory_users == 0 and _memory_owned:
+            tracemalloc.stop()
+            _memory_owned = False
+
+
+def _exclusive_memory():
+    """Номер периода, в котором память замеряет только одна трассировка, или None."""
+    with _memory_lock:
+        return _memory_overlaps if _memory_users == 1 else None
+
+
+def _rows(value):
+    """Число строк результата или аргумента: DataFrame, Series, массив, кортеж из них или dict с 'data'."""
+    if isinstance(value, tuple) and value:
+        return _rows(value[0])
+    if isinstance(value, dict) and 'data' in value:
+        return _rows(value['data'])
+    if hasattr(value, 'shape') and getattr(value, 'ndim', 0) >= 1:
+        return int(value.shape[0])
+    return None
+
+
+class Tracer:
+    """Собирает завершенные интервалы одного запуска."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.spans = []
+        self._stack = []
+        self.started = time.perf_counter()
+        self._memory_active = False
+
+    def start(self):
+        if self.memory and not self._memory_active:
+            _acquire_memory()
+            self._memory_active = True
+
+    def stop(self):
+        if self._memory_active:
+            _release_memory()
+            self._memory_active = False
+
+    def _memory(self):
+        return tracemalloc.get_traced_memory() if self._memory_active and tracemalloc.is_tracing() else (0, 0)
+
+    def open(self, name, rows_in=None):
+        current, peak = self._memory()
+        if self._stack:
+            # Пик родителя до начала вложенного интервала, сброс пика - для замера вложенного
+            self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+        period = _exclusive_memory() if self._memory_active else None
+        if period is not None:
+            # Пик сбрасывается, только если его не замеряет другая трассировка
+            tracemalloc.reset_peak()
+        record = {
+            'name': name,
+            'parent': self._stack[-1]['name'] if self._stack else None,
+            'depth': len(self._stack),
+            'start': round(time.perf_counter() - self.started, 6),
+            'rows_in': rows_in,
+            '_begin': time.perf_counter(),
+            '_current': current,
+            '_peak': current,
+            '_period': period,
+        }
+        self._stack.append(record)
+        return record
+
+    def close(self, record, rows_out=None, error=None):
+        duration = time.perf_counter() - record['_begin']
+        _, peak = self._memory()
+        peak = max(peak, record['_peak'])
+        self._stack.remove(record)
+        if self._stack:
+            self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+
+        # Пик достоверен, если за время интервала память не замеряла другая трассировка
+        exclusive = record['_period'] is not None and _exclusive_memory() == record['_period']
+
+        span = {key: value for key, value in record.items() if not key.startswith('_')}
+        span.update({
+            'duration_s': round(duration, 6),
+            'peak_memory_bytes': peak - record['_current'] if exclusive else None,
+            'rows_out': rows_out,
+            'status': 'error' if error is not None else 'ok',
+            'error': None if error is None else f'{type(error).__name__}: {error}',
+        })
+        self.spans.append(span)
+        return span
+
+    def summary(self):
+        """Суммарное время и максимальная пиковая память по названиям интервалов."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span['name'], {'calls': 0, 'duration_s': 0.0, 'peak_memory_bytes': 0})
+            total['calls'] += 1
+            total['duration_s'] = round(total['duration_s'] + span['duration_s'], 6)
+            total['peak_memory_bytes'] = max(total['peak_memory_bytes'], span['peak_memory_bytes'] or 0)
+        return totals
+
+    def write(self, path):
+        """Записывает интервалы в JSON (с итогами по названиям) или CSV - по расширению файла."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        spans = sorted(self.spans, key=lambda span: span['start'])
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='', encoding='utf-8') as trace_file:
+                writer = csv.DictWriter(trace_file, fieldnames=SPAN_FIELDS)
+                writer.writeheader()
+                writer.writerows(spans)
+        else:
+            trace = {
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'spans': spans,
+                'summary': self.summary(),
+            }
+            with open(path, 'w', encoding='utf-8') as trace_file:
+                json.dump(trace, trace_file, ensure_ascii=False, indent=2, default=str)
+        return path
+
+
+@contextlib.contextmanager
+def span(name, rows_in=None):
+    """
+    Интервал замера. Внутри можно указать число строк результата: record['rows_out'] = ...
+
+    Без активной трассировки только записывает длительность в журнал на уровне DEBUG.
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        if not logger.isEnabledFor(logging.DEBUG):
+            yield {}
+            return
+        begin = time.perf_counter()
+        yield {}
+        logger.debug('%s: %.4f s', name, time.perf_counter() - begin,
+                     extra={'span': {'name': name, 'duration_s': time.perf_counter() - begin}})
+        return
+
+    record = tracer.open(name, rows_in)
+    try:
+        yield record
+    except BaseException as e:
+        finished = tracer.close(record, error=e)
+        # Ошибка записывается в журнал один раз - в самом вложенном интервале, где она возникла
+        if not getattr(e, '_adl_logged', False):
+            logger.error('%s: ошибка после %.4f s: %s', name, finished['duration_s'], finished['error'],
+                         extra={'span': finished})
+            with contextlib.suppress(AttributeError):
+                e._adl_logged = True
+        raise
+    finished = tracer.close(record, rows_out=record.get('rows_out'))
+    logger.debug('%s: %.4f s, строк %s -> %s, пик памяти %s байт', name, finished['duration_s'],
+                 finished['rows_in'], finished['rows_out'], finished['peak_memory_bytes'], extra={'span': finished})
+
+
+def traced(name=None):
+    """
+    Декоратор: каждый вызов функции - отдельный интервал с числом строк на входе и выходе.
+
+    Число строк на входе берется из первого аргумента-таблицы, на выходе - из результата.
+    """
+    def decorator(function):
+        span_name = name or f'{function.__module__}.{function.__name__}'
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_tracer.get() is None and not logger.isEnabledFor(logging.DEBUG):
+                return function(*args, **kwargs)
+            rows_in = next((rows for rows in map(_rows, (*args, *kwargs.values())) if rows is not None), None)
+            with span(span_name, rows_in) as record:
+                result = function(*args, **kwargs)
+                record['rows_out'] = _rows(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def tracing(memory=True):
+    """Собирает интервалы блока в Tracer без записи в файл (см. session)."""
+    tracer = Tracer(memory=memory)
+    token = _current_tracer.set(tracer)
+    tracer.start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        _current_tracer.reset(token)
+
+
+def suffixed_path(path, suffix):
+    """Путь с суффиксом перед расширением: trace.json -> trace.job3.json."""
+    if not path or suffix is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f'{root}.{suffix}{extension}'
+
+
+@contextlib.contextmanager
+def session(trace_path=None, profile_path=None, memory=True, suffix=None):
+    """
+    Включает трассировку (и профилирование cProfile) на время блока.
+
+    Parameters:
+    - trace_path: str, optional. Файл трассировки (.json или .csv); по умолчанию из ADL_TRACE.
+    - profile_path: str, optional. Файл профиля cProfile; по умолчанию из ADL_PROFILE.
+    - memory: bool, optional. Замерять пиковую память через tracemalloc (замедляет расчет).
+    - suffix: str, optional. Добавляется к именам файлов перед расширением, чтобы одновременные
+      расчеты (например, задания окна программы) не перезаписывали файлы друг друга.
+
+    Returns:
+    - Tracer или None, если трассировка не включена.
+    """
+    trace_path = suffixed_path(trace_path or os.environ.get(TRACE_ENV), suffix)
+    profile_path = suffixed_path(profile_path or os.environ.get(PROFILE_ENV), suffix)
+    if not trace_path and not profile_path:
+        yield None
+        return
+
+    with contextlib.ExitStack() as stack:
+        tracer = stack.enter_context(tracing(memory)) if trace_path else None
+        profiler = cProfile.Profile() if profile_path else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield tracer
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                logger.info('Профиль cProfile: %s', profile_path)
+            if tracer is not None:
+                stack.close()
+                tracer.write(trace_path)
+                logger.info('Трассировка: %s', trace_path)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Записи журнала в виде JSON-строк; данные интервала (extra span) включаются в запись."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if hasattr(record, 'span'):
+            entry['span'] = record.span
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=logging.INFO, json_format=None):
+    """
+    Настраивает журнал программы.
+
+    Parameters:
+    - level: int или str, optional. Уровень журнала (DEBUG включает записи о каждом интервале).
+    - json_format: bool, optional. Выводить JSON-строки; по умолчанию - если ADL_LOG_FORMAT=json.
+    """
+    if json_format is None:
+        json_format = os.environ.get(LOG_FORMAT_ENV, '').lower() == 'json'
+    handler = logging.StreamHandler()
+    if json_format:
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
@@ -1,16 +1,136 @@
+import time
+
+# Время запуска программы отсчитывается от начала импорта модуля
+START_TIME = time.perf_counter()
+
 import subprocess
 import sys
-import plotly.offline as offline
-import pandas as pd
-import plotly.express as px
+import threading
 import logging
-import utilities as util
 from PyQt6.QtCore import *
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWidgets import *
 from PyQt6.QtGui import *
-from openpyxl.reader.excel import load_workbook
 
+# Тяжелые модули (pandas, openpyxl, plotly, statsmodels, QtWebEngine) импортируются
+# при первом использовании: при чтении листа, построении модели или графика.
+
+logger = logging.getLogger(__name__)
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """Table model over a DataFrame: cells are formatted only when the view asks for them"""
+
+    FETCH_SIZE = 1000
+
+    def __init__(self, data=None, parent=None):
+        super().__init__(parent)
+        self._columns = []
+        self._formatters = []
+        self._column_names = []
+        self._row_count = 0
+        self._loaded_rows = 0
+        if data is not None:
+            self.set_data_frame(data)
+
+    def set_data_frame(self, data):
+        self.beginResetModel()
+        # Храним ссылки на массивы столбцов, строки формируются только для видимых ячеек
+        self._columns = [data.iloc[:, j].to_numpy() for j in range(data.shape[1])]
+        self._formatters = [self._cell_formatter(values) for values in self._columns]
+        self._column_names = [str(name) for name in data.columns]
+        self._row_count = data.shape[0]
+        self._loaded_rows = min(self.FETCH_SIZE, self._row_count)
+        self.endResetModel()
+
+    @staticmethod
+    def _cell_formatter(values):
+        """Ячейки datetime64/timedelta64 показываются как Timestamp/Timedelta pandas: 2021-01-01 00:00:00"""
+        import pandas as pd
+
+        if values.dtype.kind == 'M':
+            return lambda value: str(pd.Timestamp(value))
+        if values.dtype.kind == 'm':
+            return lambda value: str(pd.Timedelta(value))
+        return str
+
+    def column_names(self):
+        return list(self._column_names)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._formatters[index.column()](self._columns[index.column()][index.row()])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._column_names[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded_rows < self._row_count
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        rows_to_fetch = min(self.FETCH_SIZE, self._row_count - self._loaded_rows)
+        if rows_to_fetch <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded_rows, self._loaded_rows + rows_to_fetch - 1)
+        self._loaded_rows += rows_to_fetch
+        self.endInsertRows()
+
+
+class ModelJobSignals(QObject):
+    """Signals of a background modelling job, delivered to the GUI thread"""
+
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+
+class ModelJob(QRunnable):
+    """Runs pipeline.run_model_pipeline in a QThreadPool worker thread"""
+
+    def __init__(self, job_id, pipeline_kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job_id = job_id
+        self.pipeline_kwargs = pipeline_kwargs
+        self.signals = ModelJobSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        import instrumentation
+        import pipeline
+
+        try:
+            # Трассировка и профиль включаются переменными окружения ADL_TRACE и ADL_PROFILE;
+            # файлы каждого расчета получают номер задания (trace.job3.json)
+            with instrumentation.session(suffix=f'job{self.job_id}'):
+                result = pipeline.run_model_pipeline(
+                    **self.pipeline_kwargs,
+                    progress_callback=lambda percent, stage: self.signals.progress.emit(self.job_id, percent, stage),
+                    cancel_event=self.cancel_event
+                )
+        except pipeline.PipelineCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except Exception as e:
+            logger.exception('Model job %s failed: %s', self.job_id, e)
+            self.signals.failed.emit(self.job_id, str(e))
+        else:
+            self.signals.finished.emit(self.job_id, result)
 
 
 class FileSelectionApp(QMainWindow):
@@ -20,6 +140,9 @@ class FileSelectionApp(QMainWindow):
         super(FileSelectionApp, self).__init__(None)
         self.selected_file = None  # Объявляем selected_file как атрибут экземпляра класса
         self.selected_sheet = None  # Объявляем selected_sheet
+        self.thread_pool = QThreadPool.globalInstance()
+        self.jobs = {}  # Выполняющиеся и ожидающие расчеты моделей: id -> (ModelJob, QListWidgetItem)
+        self.next_job_id = 0
         self.setWindowTitle('ADL Model')
         self.resize(1200, 800)
         layout = QVBoxLayout()
@@ -28,6 +151,9 @@ class FileSelectionApp(QMainWindow):
         self.select_file_button = QPushButton('Выбрать файл')
         self.select_file_button.clicked.connect(self.open_file_and_choose_sheet)
         layout.addWidget(self.select_file_button)
+        self.select_directory_button = QPushButton('Выбрать папку с файлами')
+        self.select_directory_button.clicked.connect(self.open_directory_and_choose_sheet)
+        layout.addWidget(self.select_directory_button)
         self.select_sheet_button = QPushButton('Выбрать лист')
         self.select_sheet_button.setEnabled(False)
         self.select_sheet_button.clicked.connect(self.choose_excel_sheet)
@@ -44,8 +170,18 @@ class FileSelectionApp(QMainWindow):
         layout.addWidget(self.create_prediction_graph)
         self.sheet_label = QLabel('Выбранный лист:')
         layout.addWidget(self.sheet_label)
-        self.table_widget = QTableWidget()
-        layout.addWidget(self.table_widget)
+        self.table_model = DataFrameTableModel()
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        layout.addWidget(self.table_view)
+        self.jobs_label = QLabel('Расчеты моделей:')
+        layout.addWidget(self.jobs_label)
+        self.jobs_list = QListWidget()
+        self.jobs_list.setMaximumHeight(120)
+        layout.addWidget(self.jobs_list)
+        self.cancel_job_button = QPushButton('Отменить выбранный расчет')
+        self.cancel_job_button.clicked.connect(self.cancel_selected_job)
+        layout.addWidget(self.cancel_job_button)
         central_widget = QWidget()
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
@@ -55,8 +191,9 @@ class FileSelectionApp(QMainWindow):
         select_file_action = QAction("Выбрать файл", self)
         select_file_action.triggered.connect(self.open_file_and_choose_sheet)
         file_menu.addAction(select_file_action)
-        self.webview = QWebEngineView()
-        layout.addWidget(self.webview)
+        select_directory_action = QAction("Выбрать папку с файлами", self)
+        select_directory_action.triggered.connect(self.open_directory_and_choose_sheet)
+        file_menu.addAction(select_directory_action)
         file_menu_action.setMenu(file_menu)
         menu_bar.addAction(file_menu_action)
 
@@ -67,18 +204,32 @@ class FileSelectionApp(QMainWindow):
             selected_file, _ = file_dialog.getOpenFileName(self, 'Выберите файл', '', 'Excel Files (*.xlsx)')
             self.file_label.setText(f'Выбранный файл: {selected_file}')
             if selected_file.endswith('.xlsx'):
-                self.selected_file = selected_file
-                self.select_sheet_button.setEnabled(True)
-                self.create_model_on_chosen_file.setEnabled(True)
-                self.create_prediction_graph.setEnabled(True)
-                self.choose_excel_sheet()
+                self.set_selected_source(selected_file)
         except Exception as e:
-            print(f"Ошибка при открытии файла: {e}")
+            logger.exception("Ошибка при открытии файла: %s", e)
+
+    def open_directory_and_choose_sheet(self):
+        try:
+            # Все книги .xlsx папки читаются параллельно и объединяются по столбцу времени
+            selected_directory = QFileDialog.getExistingDirectory(self, 'Выберите папку с файлами Excel')
+            if selected_directory:
+                self.file_label.setText(f'Выбранная папка: {selected_directory}')
+                self.set_selected_source(selected_directory)
+        except Exception as e:
+            logger.exception("Ошибка при открытии папки: %s", e)
+
+    def set_selected_source(self, source):
+        self.selected_file = source
+        self.select_sheet_button.setEnabled(True)
+        self.create_model_on_chosen_file.setEnabled(True)
+        self.create_prediction_graph.setEnabled(True)
+        self.choose_excel_sheet()
 
     def choose_excel_sheet(self):
         try:
-            workbook = load_workbook(filename=self.selected_file, read_only=True)
-            sheet_names = workbook.sheetnames
+            import ingestion
+
+            sheet_names = ingestion.sheet_names(self.selected_file)
             input_dialog = QInputDialog(self)
             input_dialog.setLabelText('Выберите лист:')
             input_dialog.setWindowTitle('Выбор листа')
@@ -87,55 +238,125 @@ class FileSelectionApp(QMainWindow):
             input_dialog.setFixedSize(400, 200)
             ok_pressed = input_dialog.exec()
             if ok_pressed:
-                self.table_widget.clear()
                 self.selected_sheet = input_dialog.textValue()
-                data = pd.read_excel(self.selected_file, self.selected_sheet, engine='openpyxl')
+                data = ingestion.read_table(self.selected_file, self.selected_sheet)
                 self.display_data_in_table(data)
                 self.sheet_label.setText(f'Выбранный лист: {self.selected_sheet}')
         except Exception as e:
-            print(f"Ошибка при загрузке данных: {e}")
+            logger.exception("Ошибка при загрузке данных: %s", e)
 
     def display_data_in_table(self, data):
         try:
-            self.table_widget.setRowCount(data.shape[0])
-            self.table_widget.setColumnCount(data.shape[1])
-            self.table_widget.setHorizontalHeaderLabels(data.columns)
-            for i in range(data.shape[0]):
-                for j in range(data.shape[1]):
-                    item = QTableWidgetItem(str(data.iloc[i, j]))
-                    self.table_widget.setItem(i, j, item)
+            self.table_model.set_data_frame(data)
         except Exception as e:
-            print(f"Ошибка при отображении данных в таблице: {e}")
+            logger.exception("Ошибка при отображении данных в таблице: %s", e)
 
     def choose_column_name_for_plot(self):
         try:
             if self.selected_file and self.selected_sheet:
-                column_names = [self.table_widget.horizontalHeaderItem(j).text() for j in
-                                range(self.table_widget.columnCount())]
+                column_names = self.table_model.column_names()
                 data_selection_dialog = DataSelectionDialogPlot(column_names=column_names,
                                                                 selected_file=self.selected_file,
                                                                 selected_sheet=self.selected_sheet)
                 data_selection_dialog.exec()
         except Exception as e:
-            print(f"Ошибка при запуске диалогового окна выбора осей графика: {e}")
+            logger.exception("Ошибка при запуске диалогового окна выбора осей графика: %s", e)
 
     def create_short_term_prediction_model(self):
         try:
             if self.selected_file and self.selected_sheet:
-                column_names = [self.table_widget.horizontalHeaderItem(j).text() for j in
-                                range(self.table_widget.columnCount())]
+                column_names = self.table_model.column_names()
                 data_selection_dialog = ModelWindow(column_names=column_names, selected_file=self.selected_file,
-                                                       selected_sheet=self.selected_sheet)
+                                                       selected_sheet=self.selected_sheet,
+                                                       submit_job=self.submit_model_job)
                 data_selection_dialog.exec()
         except Exception as e:
-            print(f"Ошибка при запуске диалогового окна выбора настройки создания прогноза: {e}")
+            logger.exception("Ошибка при запуске диалогового окна выбора настройки создания прогноза: %s", e)
+
+    def submit_model_job(self, pipeline_kwargs):
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        job = ModelJob(job_id, pipeline_kwargs)
+        job.signals.progress.connect(self.on_job_progress)
+        job.signals.finished.connect(self.on_job_finished)
+        job.signals.failed.connect(self.on_job_failed)
+        job.signals.cancelled.connect(self.on_job_cancelled)
+        item = QListWidgetItem(f"{pipeline_kwargs['column_for_predict']}: в очереди")
+        item.setData(Qt.ItemDataRole.UserRole, job_id)
+        self.jobs_list.addItem(item)
+        self.jobs[job_id] = (job, item)
+        self.thread_pool.start(job)
+
+    def cancel_selected_job(self):
+        for item in self.jobs_list.selectedItems():
+            job_id = item.data(Qt.ItemDataRole.UserRole)
+            if job_id in self.jobs:
+                job, _ = self.jobs[job_id]
+                # Задача, которая еще не начала выполняться, просто убирается из очереди
+                if self.thread_pool.tryTake(job):
+                    self.on_job_cancelled(job_id)
+                else:
+                    job.cancel()
+                    item.setText(f"{job.pipeline_kwargs['column_for_predict']}: отмена...")
+
+    def set_job_status(self, job_id, status):
+        job, item = self.jobs[job_id]
+        item.setText(f"{job.pipeline_kwargs['column_for_predict']}: {status}")
+
+    def finish_job(self, job_id, status):
+        if job_id in self.jobs:
+            self.set_job_status(job_id, status)
+            del self.jobs[job_id]
+
+    def on_job_progress(self, job_id, percent, stage):
+        if job_id in self.jobs:
+            self.set_job_status(job_id, f'{stage} ({percent}%)')
+
+    def on_job_finished(self, job_id, result):
+        self.finish_job(job_id, f"готово, MAPE {result['mape']:.2f}%")
+        time_report = result['time_parsing']
+        if time_report is not None and time_report['dropped']:
+            import time_parsing
+            report_text = time_parsing.format_report(time_report)
+            logger.warning(report_text)
+            warning_box = WarningMessageBox('Часть строк не вошла в модель: не удалось разобрать время',
+                                            report_text, self)
+            warning_box.exec()
+        import metrics
+        logger.info(metrics.format_metrics(result['metrics']))
+        if result['ingestion'] is not None:
+            import ingestion
+            logger.info(ingestion.format_ingestion(result['ingestion']))
+        if result['memory'] is not None:
+            import memory_optimization
+            logger.info(memory_optimization.format_memory_report(result['memory']))
+        if result['model_path']:
+            logger.info('Модель сохранена: %s', result['model_path'])
+        result_write_file = result['result_write']
+        if result_write_file['Result']:
+            question_box = QuestionMessageBox("Открыть созданный файл?", self)
+            should_open_file = question_box.exec_and_get_result()
+            if should_open_file:
+                subprocess.run(["start", "excel", result_write_file['Path']], shell=True)
+        else:
+            error_message = ErrorMessageBox('Ошибка записи файла', self)
+            error_message.exec()
+
+    def on_job_failed(self, job_id, error):
+        self.finish_job(job_id, 'ошибка')
+        error_message = ErrorMessageBox(error, self)
+        error_message.exec()
+
+    def on_job_cancelled(self, job_id):
+        self.finish_job(job_id, 'отменено')
 
 
 class ModelWindow(QDialog):
     """In this window created predicts"""
 
-    def __init__(self, column_names, selected_file, selected_sheet):
+    def __init__(self, column_names, selected_file, selected_sheet, submit_job):
         super().__init__()
+        self.submit_job = submit_job
         self.count_factors = None
         self.column_names = column_names
         self.selected_file = selected_file
@@ -167,6 +388,10 @@ class ModelWindow(QDialog):
             f"Обучающая выборка: {self.slider_value}% Тестовая выборка: {100 - self.slider_value}%")
         self.slider_box.valueChanged.connect(self.slider_value_changed)
         self.label_5 = QLabel('Количество дней прогнозирования:')
+        self.forecast_steps_box = QSpinBox()
+        self.forecast_steps_box.setRange(0, 3650)
+        self.forecast_steps_box.setValue(0)
+        self.compact_check_box = QCheckBox('Экономия памяти (компактные типы данных)')
         self.table_widget = QTableWidget()
         self.table_widget.setColumnCount(1)
         self.table_widget.setRowCount(len(column_names) - 1)
@@ -201,6 +426,9 @@ class ModelWindow(QDialog):
         layout.addWidget(self.label_4)
         layout.addWidget(self.slider_box)
         layout.addWidget(self.percent_label)
+        layout.addWidget(self.label_5)
+        layout.addWidget(self.forecast_steps_box)
+        layout.addWidget(self.compact_check_box)
         layout.addWidget(buttons)
 
         self.setLayout(layout)
@@ -217,8 +445,15 @@ class ModelWindow(QDialog):
             self.table_widget.setItem(i, 0, item)
 
     def init_combobox_time_step(self):
+        # 'auto' - формат определяется по данным (time_parsing.infer_date_format)
+        self.time_step_combo_box.addItem('auto')
         self.time_step_combo_box.addItem('%d.%m.%Y')
         self.time_step_combo_box.addItem('%d %b %Y %H:%M:%S')
+        self.time_step_combo_box.addItem('%Y-%m-%d')
+        self.time_step_combo_box.addItem('%Y-%m-%d %H:%M:%S')
+        # Числа в столбце времени - номера дней Excel (time_parsing.SERIAL_FORMAT)
+        self.time_step_combo_box.addItem('serial')
+        self.time_step_combo_box.addItem('%Y')
 
     def slider_value_changed(self, value):
         self.percent_label.setText(f"Обучающая выборка: {value}% Тестовая выборка: {100 - value}%")
@@ -235,7 +470,7 @@ class ModelWindow(QDialog):
                 error_message = ErrorMessageBox('Выбранное количество факторов превышает 4!', self)
                 error_message.exec()
         except Exception as e:
-            print(f"Exception occurred: {e}")
+            logger.exception("Exception occurred: %s", e)
 
     def accept(self):
         try:
@@ -250,52 +485,27 @@ class ModelWindow(QDialog):
                     selected_columns.append(item.text())
             if not selected_columns:
                 raise ValueError('Не выбраны факторы для прогноза!')
-            if chosen_column_for_predict in selected_columns:
-                create_lag_for_chosen_column_for_predict = True
-            else:
-                create_lag_for_chosen_column_for_predict = False
-                selected_columns.append(chosen_column_for_predict)
-            prepared_data = util.data_preparation(
-                file=self.selected_file,
-                sheet=self.selected_sheet,
-                name_column_time=chosen_column_with_time_label,
-                name_column_for_predict=chosen_column_for_predict,
-                name_column_factors=selected_columns,
-                date_format=self.time_step_combo_box.currentText()
-            )
-            data = util.create_lags(
-                prepared_data,
-                selected_columns,
-                1,
-                create_lag_for_chosen_column_for_predict,
-                chosen_column_for_predict
-            )
-            data_learn, data_test = util.separation_data(data, self.slider_box.value())
-            model = util.create_model(data_learn, chosen_column_for_predict, selected_columns)
-            result_data = util.learn_on_params(data, model.params, self.slider_box.value(), chosen_column_for_predict)
-            util.calculate_mape(result_data, chosen_column_for_predict)
-            result_write_file = util.write_to_excel(
-                result_data,
-                output_file=chosen_column_for_predict,
-                sheet=chosen_column_for_predict
-            )
-            if result_write_file['Result']:
-                question_box = QuestionMessageBox("Открыть созданный файл?", self)
-                should_open_file = question_box.exec_and_get_result()
-                if should_open_file:
-                    subprocess.run(["start", "excel", result_write_file['Path']], shell=True)
-                else:
-                    pass
-            else:
-                error_message = ErrorMessageBox('Ошибка записи файла', self)
-                error_message.exec()
+            # Расчет выполняется в фоновом потоке, окно программы остается доступным
+            self.submit_job({
+                'file': self.selected_file,
+                'sheet': self.selected_sheet,
+                'column_for_predict': chosen_column_for_predict,
+                'column_time': chosen_column_with_time_label,
+                'column_factors': selected_columns,
+                'lag_count': 1,
+                'train_percent': self.slider_box.value(),
+                'date_format': self.time_step_combo_box.currentText(),
+                'forecast_steps': self.forecast_steps_box.value(),
+                'compact': self.compact_check_box.isChecked(),
+                'save_model': True
+            })
             super().accept()
         except ValueError as ve:
             error_message = ErrorMessageBox(str(ve), self)
             error_message.exec()
 
         except Exception as e:
-            print(f"Произошла ошибка: {e}")
+            logger.exception("Произошла ошибка: %s", e)
 
 
 
@@ -369,12 +579,29 @@ class DataSelectionDialogPlot(QDialog):
     def accept(self):
         selected_x, selected_y = self.get_selected_data()
         if selected_x and selected_y:
-            data = pd.read_excel(self.selected_file, sheet_name=self.selected_sheet)
+            import ingestion
+
+            data = ingestion.read_table(self.selected_file, self.selected_sheet, usecols=[selected_x, *selected_y])
             plot_window = PlotWindow(data=data, x_column=selected_x, y_columns=selected_y)
             super().accept()
             plot_window.exec()
 
 
+class PlotBridge(QObject):
+    """Receives the visible x-axis range from the plot page and sends back detailed data"""
+
+    def __init__(self, plot_window):
+        super().__init__()
+        self.plot_window = plot_window
+
+    @pyqtSlot(str, str)
+    def range_changed(self, x_min, x_max):
+        try:
+            self.plot_window.show_range(x_min, x_max)
+        except Exception as e:
+            logger.exception("Ошибка при обновлении графика: %s", e)
+
+
 class PlotWindow(QDialog):
     """In this window is happening choosing data for creating plot data"""
 
@@ -383,18 +610,35 @@ class PlotWindow(QDialog):
         self.setWindowTitle('График')
         self.resize(1200, 800)
         try:
-            fig = px.line(data, x=x_column, y=y_columns, title='Название графика')
-            html = '<html><body>'
-            html += offline.plot(fig, output_type='div', include_plotlyjs='cdn')
-            html += '</body></html>'
-            plot_widget = QWebEngineView()
-            plot_widget.setHtml(html)
+            import plotting
+            from PyQt6.QtWebChannel import QWebChannel
+            from PyQt6.QtWebEngineWidgets import QWebEngineView
+
+            self.plotting = plotting
+            # Прореживание до разрешения экрана: детали догружаются при увеличении масштаба
+            self.max_points = self.width() * plotting.POINTS_PER_PIXEL
+            self.plot_data = plotting.PlotData(data, x_column, y_columns)
+            fig = plotting.build_figure(self.plot_data, self.max_points)
+            html_path, self.div_id = plotting.write_plot_html(fig)
+            # Страница графика удаляется, когда окно закрывается
+            self.finished.connect(lambda: plotting.remove_plot_html(html_path))
+
+            self.plot_widget = QWebEngineView()
+            self.bridge = PlotBridge(self)
+            self.channel = QWebChannel()
+            self.channel.registerObject('bridge', self.bridge)
+            self.plot_widget.page().setWebChannel(self.channel)
+            self.plot_widget.setUrl(QUrl.fromLocalFile(html_path))
             layout = QVBoxLayout()
-            layout.addWidget(plot_widget)
+            layout.addWidget(self.plot_widget)
             self.setLayout(layout)
 
         except Exception as e:
-            print(f"Ошибка при отображении графика: {e}")
+            logger.exception("Ошибка при отображении графика: %s", e)
+
+    def show_range(self, x_min, x_max):
+        traces = self.plot_data.traces(self.max_points, self.plot_data.parse_x(x_min), self.plot_data.parse_x(x_max))
+        self.plot_widget.page().runJavaScript(self.plotting.restyle_script(self.div_id, traces))
 
 
 class ErrorMessageBox(QMessageBox):
@@ -407,6 +651,16 @@ class ErrorMessageBox(QMessageBox):
         self.setStandardButtons(QMessageBox.StandardButton.Ok)
 
 
+class WarningMessageBox(QMessageBox):
+    def __init__(self, warning_text, details, parent=None):
+        super().__init__(parent)
+        self.setIcon(QMessageBox.Icon.Warning)
+        self.setWindowTitle('Предупреждение')
+        self.setText(warning_text)
+        self.setInformativeText(details)
+        self.setStandardButtons(QMessageBox.StandardButton.Ok)
+
+
 class QuestionMessageBox(QMessageBox):
     def __init__(self, question_text, parent=None):
         super().__init__(parent)
@@ -420,8 +674,24 @@ class QuestionMessageBox(QMessageBox):
         return result == QMessageBox.StandardButton.Yes
 
 
+def report_startup_time(app, quit_after_report):
+    startup_time = time.perf_counter() - START_TIME
+    logger.info('Startup time: %.3f s', startup_time)
+    if quit_after_report:
+        print(f'startup_time={startup_time:.3f}')
+        app.quit()
+
+
 if __name__ == "__main__":
+    import instrumentation
+    instrumentation.configure_logging(logging.INFO)
+    # QtWebEngine загружается позже (в окне графика), поэтому общий OpenGL-контекст
+    # нужно включить до создания QApplication
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     window = FileSelectionApp()
     window.show()
+    # Время до первой итерации цикла событий, т.е. до показа главного окна;
+    # с ключом --measure-startup программа выводит его и завершается
+    QTimer.singleShot(0, lambda: report_startup_time(app, '--measure-startup' in sys.argv))
     sys.exit(app.exec())
@@ -0,0 +1,184 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Размер выборки, на которой сначала проверяется, можно ли хранить столбец во float32
+SAMPLE_SIZE = 1000
+
+# Доля различных значений, при которой текстовый столбец еще выгодно хранить как Categorical
+MAX_CATEGORY_SHARE = 0.5
+
+
+def frame_memory(data):
+    """Объем памяти DataFrame в байтах (включая строки в столбцах object)."""
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+def default_memory(data):
+    """
+    Объем памяти, который занимал бы DataFrame без оптимизации.
+
+    Числовые столбцы и даты считаются как float64/int64/datetime64 (8 байт на значение),
+    Categorical - как столбец object с отдельной строкой в каждой ячейке.
+    """
+    total = int(data.index.memory_usage(deep=True))
+    for column in data.columns:
+        series = data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            category_sizes = np.array([sys.getsizeof(category) for category in series.cat.categories] + [0],
+                                      dtype=np.int64)
+            codes = series.cat.codes.to_numpy()
+            total += 8 * len(series) + int(category_sizes[codes].sum())
+        elif series.dtype == object:
+            total += int(series.memory_usage(index=False, deep=True))
+        else:
+            total += 8 * len(series)
+
+    return total
+
+
+def _fits_float32(values):
+    """
+    Проверяет, что float32 сохраняет каждое значение в исходной десятичной записи.
+
+    Значение проходит проверку, если кратчайшая запись его float32-представления
+    переводится обратно ровно в исходное float64 (например, -31.43, но не 1234567.891).
+    """
+    # Повторяющиеся значения (типично для данных Excel) проверяются один раз
+    finite = np.unique(values[np.isfinite(values)])
+    if finite.size and np.abs(finite).max() > np.finfo(np.float32).max:
+        return False
+    candidate = finite.astype(np.float32)
+    return bool(np.array_equal(candidate.astype(str).astype(np.float64), finite))
+
+
+def downcast_column(series):
+    """
+    Уменьшает тип числового столбца, если это не меняет значений.
+
+    Целые значения без пропусков хранятся в наименьшем целом типе, остальные
+    числа - во float32, если он сохраняет их десятичную запись.
+
+    Parameters:
+    - series: Series. Столбец данных.
+
+    Returns:
+    - Series. Столбец с уменьшенным типом или исходный столбец.
+    """
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series
+    values = series.to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return series
+
+    if pd.api.types.is_integer_dtype(series) or (not np.isnan(values).any() and np.all(values == np.round(values))):
+        if np.abs(values).max() <= np.iinfo(np.int64).max:
+            return pd.to_numeric(series.astype(np.int64), downcast='integer')
+    if series.dtype == np.float32:
+        return series
+
+    # Большинство неподходящих столбцов отсеивается по выборке, без проверки всех строк
+    if _fits_float32(values[:SAMPLE_SIZE]) and _fits_float32(values):
+        return series.astype(np.float32)
+
+    return series
+
+
+def widen_float32(data):
+    """
+    Переводит столбцы float32 во float64 через кратчайшую десятичную запись значения.
+
+    Простое приведение типа дописывает к числу хвост двоичной погрешности (-12.63 становится
+    -12.630000114440918); здесь же получается ровно то float64, которое было до downcast_column.
+    Остальные столбцы не копируются.
+
+    Returns:
+    - DataFrame. Данные без столбцов float32 (исходный DataFrame, если таких столбцов нет).
+    """
+    columns = [column for column in data.columns if data[column].dtype == np.float32]
+    if not columns:
+        return data
+
+    widened = data.copy(deep=False)
+    for column in columns:
+        # Повторяющиеся значения переводятся в текст один раз
+        unique, inverse = np.unique(data[column].to_numpy(), return_inverse=True)
+        widened[column] = unique.astype(str).astype(np.float64)[inverse]
+    return widened
+
+
+def categorize_column(series, max_share=MAX_CATEGORY_SHARE):
+    """Переводит текстовый столбец с повторяющимися значениями в Categorical."""
+    if series.dtype != object or len(series) == 0:
+        return series
+    if series.nunique(dropna=True) > max_share * len(series):
+        return series
+    return series.astype('category')
+
+
+def optimize_frame(data, exclude=(), categorize=True):
+    """
+    Уменьшает объем памяти DataFrame: числа приводятся к компактным типам,
+    текстовые метки - к Categorical. Столбцы datetime64 не изменяются.
+
+    Parameters:
+    - data: DataFrame. Данные.
+    - exclude: iterable, optional. Столбцы, которые нужно оставить без изменений.
+    - categorize: bool, optional. Переводить ли текстовые столбцы в Categorical.
+
+    Returns:
+    - Tuple. DataFrame с компактными типами и отчет (см. memory_report) с измененными
+      типами столбцов в 'columns' ({столбец: (старый тип, новый тип)}).
+    """
+    exclude = set(exclude)
+    before = frame_memory(data)
+    columns = {}
+    optimized = {}
+    for column in data.columns:
+        series = data[column]
+        if column not in exclude and not pd.api.types.is_datetime64_any_dtype(series):
+            series = downcast_column(series)
+            if categorize:
+                series = categorize_column(series)
+        if series.dtype != data[column].dtype:
+            columns[column] = (str(data[column].dtype), str(series.dtype))
+        optimized[column] = series
+
+    result = pd.DataFrame(optimized, index=data.index, copy=False)
+    result.attrs.update(data.attrs)
+    report = memory_report(result, before)
+    report['columns'] = columns
+
+    return result, report
+
+
+def lag_dtype(data, columns):
+    """Наименьший тип с плавающей точкой, в котором без потерь хранятся лаги столбцов."""
+    return np.result_type(np.float32, *(data[column].dtype for column in columns))
+
+
+def memory_report(data, default=None):
+    """
+    Отчет об объеме памяти DataFrame.
+
+    Parameters:
+    - data: DataFrame. Данные.
+    - default: int, optional. Объем без оптимизации; по умолчанию оценивается default_memory.
+
+    Returns:
+    - dict. Объем без оптимизации ('default'), фактический объем ('actual') и экономия ('saved') в байтах.
+    """
+    actual = frame_memory(data)
+    default = default_memory(data) if default is None else default
+
+    return {'default': default, 'actual': actual, 'saved': default - actual}
+
+
+def format_memory_report(report):
+    """Краткое текстовое описание отчета memory_report."""
+    megabyte = 1024 * 1024
+    share = report['saved'] / report['default'] * 100 if report['default'] else 0
+
+    return (f"Память данных: {report['actual'] / megabyte:.2f} МБ вместо {report['default'] / megabyte:.2f} МБ "
+            f"(сэкономлено {report['saved'] / megabyte:.2f} МБ, {share:.0f}%)")
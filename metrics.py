@@ -0,0 +1,203 @@
+"""
+Метрики качества прогноза: MAPE, sMAPE, MAE, RMSE, MASE и смещение (bias).
+
+Все метрики считаются за один проход по массивам NumPy: ошибки вычисляются один раз,
+а суммы по сегментам (обучающая и тестовая выборки, точки бэктеста, модели) - через
+np.bincount. В таблицу данных ничего не записывается, если не попросить явно.
+
+Строки с нулевым фактическим значением не входят в MAPE (их число возвращается в
+'zero_actuals'), а строки без факта или прогноза не учитываются вовсе. Итоговый MAPE
+модели (pipeline, batch, сохраненная модель) - значение сегмента 'Все'.
+"""
+import numpy as np
+import pandas as pd
+
+import forecast_engine
+
+METRICS = ('mape', 'smape', 'mae', 'rmse', 'mase', 'bias')
+SEGMENTS = (forecast_engine.TRAIN_LABEL, forecast_engine.TEST_LABEL)
+ALL_SEGMENT = 'Все'
+
+
+def naive_scale(actual, season=1):
+    """
+    Знаменатель MASE: средняя абсолютная ошибка сезонного наивного прогноза y[t] = y[t - season].
+
+    Parameters:
+    - actual: array. Фактические значения обучающей выборки.
+    - season: int, optional. Сезонный период (1 - обычный наивный прогноз).
+
+    Returns:
+    - float. Средняя абсолютная ошибка или nan, если ее нельзя посчитать.
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    if len(actual) <= season:
+        return np.nan
+    differences = np.abs(actual[season:] - actual[:-season])
+    differences = differences[~np.isnan(differences)]
+    if len(differences) == 0:
+        return np.nan
+    scale = differences.mean()
+    return scale if scale > 0 else np.nan
+
+
+def _sums(actual, forecast, groups, group_count):
+    """Суммы, из которых получаются все метрики, по каждой группе."""
+    valid = ~(np.isnan(actual) | np.isnan(forecast)) & (groups >= 0)
+    actual, forecast, groups = actual[valid], forecast[valid], groups[valid]
+
+    error = forecast - actual
+    abs_error = np.abs(error)
+    abs_actual = np.abs(actual)
+    nonzero = abs_actual > 0
+    denominator = abs_actual + np.abs(forecast)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = np.where(nonzero, abs_error / abs_actual, 0.0)
+        symmetric = np.where(denominator > 0, 2 * abs_error / denominator, 0.0)
+
+    def total(weights=None):
+        return np.bincount(groups, weights=weights, minlength=group_count)[:group_count].astype(np.float64)
+
+    return {
+        'count': total(),
+        'nonzero': total(nonzero.astype(np.float64)),
+        'ape': total(percentage),
+        'sape': total(symmetric),
+        'abs_error': total(abs_error),
+        'squared_error': total(error ** 2),
+        'error': total(error),
+    }
+
+
+def _from_sums(sums, scale):
+    """Метрики по суммам из _sums; scale - знаменатель MASE (число или массив по группам)."""
+    count = sums['count']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae = np.where(count > 0, sums['abs_error'] / count, np.nan)
+        return {
+            'count': count.astype(np.int64),
+            'zero_actuals': (count - sums['nonzero']).astype(np.int64),
+            'mape': np.where(sums['nonzero'] > 0, sums['ape'] / sums['nonzero'] * 100, np.nan),
+            'smape': np.where(count > 0, sums['sape'] / count * 100, np.nan),
+            'mae': mae,
+            'rmse': np.sqrt(np.where(count > 0, sums['squared_error'] / count, np.nan)),
+            'mase': mae / scale,
+            'bias': np.where(count > 0, sums['error'] / count, np.nan),
+        }
+
+
+def group_metrics(actual, forecast, groups, group_count=None, scale=np.nan):
+    """
+    Метрики для каждой группы строк за один проход.
+
+    Parameters:
+    - actual: array. Фактические значения.
+    - forecast: array. Прогнозные значения.
+    - groups: array of int. Номер группы каждой строки (отрицательный - строка не учитывается).
+    - group_count: int, optional. Количество групп (по умолчанию max(groups) + 1).
+    - scale: float или array, optional. Знаменатель MASE (см. naive_scale), общий или по группам.
+
+    Returns:
+    - dict. Метрика -> массив значений по группам (а также 'count' и 'zero_actuals').
+    """
+    actual = np.asarray(actual, dtype=np.float64).ravel()
+    forecast = np.asarray(forecast, dtype=np.float64).ravel()
+    groups = np.asarray(groups, dtype=np.int64).ravel()
+    if group_count is None:
+        group_count = int(groups.max()) + 1 if len(groups) else 0
+
+    return _from_sums(_sums(actual, forecast, groups, group_count), scale)
+
+
+def fold_metrics(actual, forecast, scale=np.nan):
+    """
+    Метрики по строкам двумерных массивов (например, точки бэктеста x горизонт).
+
+    Пропуски (nan) не учитываются, поэтому неполные строки допустимы.
+
+    Returns:
+    - DataFrame. Одна строка на строку массива, столбцы - метрики.
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    forecast = np.asarray(forecast, dtype=np.float64)
+    groups = np.repeat(np.arange(actual.shape[0]), actual.shape[1])
+
+    return pd.DataFrame(group_metrics(actual, forecast, groups, actual.shape[0], scale))
+
+
+def evaluate(actual, forecast, labels, season=1):
+    """
+    Метрики обучающей и тестовой выборок и всех фактических строк вместе.
+
+    Parameters:
+    - actual: array. Фактические значения.
+    - forecast: array. Прогнозные значения.
+    - labels: array. Метки строк ('Тип данных'); строки будущего прогноза не учитываются.
+    - season: int, optional. Сезонный период наивного прогноза для MASE.
+
+    Returns:
+    - dict. Сегмент ('Обучающая', 'Тестовая', 'Все') -> {метрика: значение}.
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    forecast = np.asarray(forecast, dtype=np.float64)
+    groups = pd.Categorical(labels, categories=SEGMENTS).codes.astype(np.int64)
+
+    # MASE всех сегментов нормируется ошибкой наивного прогноза на обучающей выборке
+    scale = naive_scale(actual[groups == 0], season)
+    sums = _sums(actual, forecast, groups, len(SEGMENTS))
+    sums = {name: np.append(values, values.sum()) for name, values in sums.items()}
+    values = _from_sums(sums, scale)
+
+    return {segment: {name: values[name][position].item() for name in values}
+            for position, segment in enumerate([*SEGMENTS, ALL_SEGMENT])}
+
+
+def evaluate_frame(data, actual_column, forecast_column=None, label_column='Тип данных', season=1,
+                   add_columns=False):
+    """
+    Метрики результата learn_on_params по сегментам 'Тип данных'.
+
+    Parameters:
+    - data: DataFrame. Данные с фактическими значениями, прогнозом и метками.
+    - actual_column: str. Столбец фактических значений.
+    - forecast_column: str, optional. Столбец прогноза (по умолчанию 'Прогноз <actual_column>').
+    - label_column: str, optional. Столбец с метками выборок.
+    - season: int, optional. Сезонный период наивного прогноза для MASE.
+    - add_columns: bool, optional. Записать в data построчные ошибки: 'APE' (nan при нулевом факте),
+      'Ошибка' (прогноз минус факт).
+
+    Returns:
+    - dict. См. evaluate.
+    """
+    forecast_column = forecast_column or f'Прогноз {actual_column}'
+    actual = data[actual_column].to_numpy(dtype=np.float64, na_value=np.nan)
+    forecast = data[forecast_column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    if add_columns:
+        error = forecast - actual
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data['APE'] = np.where(actual != 0, np.abs(error / actual) * 100, np.nan)
+        data['Ошибка'] = error
+
+    return evaluate(actual, forecast, data[label_column], season)
+
+
+def metrics_table(result):
+    """Результат evaluate в виде таблицы: строки - сегменты, столбцы - метрики."""
+    table = pd.DataFrame(result).T[['count', 'zero_actuals', *METRICS]]
+    return table.astype({'count': np.int64, 'zero_actuals': np.int64, **dict.fromkeys(METRICS, np.float64)})
+
+
+def format_metrics(result):
+    """Текст с метриками по сегментам."""
+    lines = []
+    for segment, values in result.items():
+        if not values['count']:
+            continue
+        line = (f"{segment}: MAPE {values['mape']:.2f}%, sMAPE {values['smape']:.2f}%, MAE {values['mae']:.4g}, "
+                f"RMSE {values['rmse']:.4g}, MASE {values['mase']:.3f}, bias {values['bias']:.4g} "
+                f"(строк {values['count']}")
+        if values['zero_actuals']:
+            line += f", с нулевым фактом {values['zero_actuals']} - не входят в MAPE"
+        lines.append(line + ')')
+    return '\n'.join(lines)
@@ -0,0 +1,199 @@
+"""
+Сохранение обученной ADL-модели в файл и прогноз по сохраненной модели.
+
+Файл модели (.adlmodel) - архив npz с вектором коэффициентов и описанием модели в
+JSON: прогнозируемый столбец, факторы, глубина лагов, формат даты и сведения
+об обучении. Для прогноза statsmodels не нужен: лаги строятся одним блоком,
+а прогноз считается одним матричным умножением.
+
+Запуск прогноза по сохраненной модели:
+    python model_artifact.py model.adlmodel --file data.xlsx --sheet Sheet1 --output forecast.csv
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import utilities as util
+
+ARTIFACT_VERSION = 1
+ARTIFACT_EXTENSION = '.adlmodel'
+
+
+class ModelArtifact:
+    """Коэффициенты и описание обученной модели."""
+
+    def __init__(self, coefficients, names, spec, metadata=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.names = list(names)
+        self.spec = spec
+        self.metadata = metadata or {}
+        if len(self.names) != len(self.coefficients) or self.names[0] != 'const':
+            raise ValueError('Описание модели не соответствует вектору коэффициентов')
+
+    @property
+    def params(self):
+        return pd.Series(self.coefficients, index=self.names)
+
+    @property
+    def factor_names(self):
+        return self.names[1:]
+
+    @property
+    def lags(self):
+        return self.spec['lags']
+
+    @classmethod
+    def from_params(cls, params, column_for_predict, column_time, selected_columns, create_lag_for_predict,
+                    lag_count=1, date_format='auto', metadata=None):
+        """
+        Создает описание модели по обученным параметрам.
+
+        Parameters:
+        - params: Series. Параметры модели ('const' и коэффициенты факторов).
+        - column_for_predict: str. Прогнозируемый столбец.
+        - column_time: str. Столбец с временными метками.
+        - selected_columns: list. Столбцы, для которых создавались лаги (см. pipeline.select_columns).
+        - create_lag_for_predict: bool. Создавались ли лаги прогнозируемого столбца.
+        - lag_count: int или dict, optional. Количество лагов.
+        - date_format: str, optional. Формат даты столбца времени.
+        - metadata: dict, optional. Сведения об обучении (источник, число строк, MAPE и т. п.).
+
+        Returns:
+        - ModelArtifact.
+        """
+        params = pd.Series(params, dtype='float64')
+        lags = util.lag_depths(util.lag_columns(selected_columns, create_lag_for_predict, column_for_predict),
+                               lag_count)
+        spec = {
+            'column_for_predict': column_for_predict,
+            'column_time': column_time,
+            'selected_columns': list(selected_columns),
+            'lag_count': lag_count,
+            'lags': {column: depth for column, depth in lags.items() if depth > 0},
+            'date_format': date_format,
+        }
+        metadata = {'created': datetime.datetime.now().isoformat(timespec='seconds'), **(metadata or {})}
+        names = ['const', *(name for name in params.index if name != 'const')]
+
+        return cls(params[names].to_numpy(), names, spec, metadata)
+
+    def save(self, path):
+        """Сохраняет модель в файл (запись через временный файл)."""
+        meta = {'version': ARTIFACT_VERSION, 'names': self.names, 'spec': self.spec, 'metadata': self.metadata}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as artifact_file:
+            np.savez(artifact_file, meta=np.array(json.dumps(meta, ensure_ascii=False, default=str)),
+                     coefficients=self.coefficients)
+        os.replace(temp_path, path)
+
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Загружает модель, сохраненную save."""
+        with np.load(path, allow_pickle=False) as artifact_file:
+            meta = json.loads(str(artifact_file['meta']))
+            if meta.get('version') != ARTIFACT_VERSION:
+                raise ValueError(f"Неподдерживаемая версия файла модели: {meta.get('version')}. "
+                                 f'Ожидается {ARTIFACT_VERSION}')
+            coefficients = artifact_file['coefficients']
+
+        return cls(coefficients, meta['names'], meta['spec'], meta['metadata'])
+
+    def design_matrix(self, data):
+        """
+        Матрица факторов модели со столбцом констант.
+
+        Лаговые столбцы берутся из data, если они там есть, иначе строятся по исходным
+        столбцам (первые строки без истории заполняются нулями, как в create_lags).
+
+        Parameters:
+        - data: DataFrame. Данные в хронологическом порядке.
+
+        Returns:
+        - np.ndarray. Матрица размера (число строк, число параметров).
+        """
+        missing_lags = {column: depth for column, depth in self.lags.items()
+                        if any(f'{column}_lag_{lag}' not in data.columns for lag in range(1, depth + 1))}
+        base_columns = dict.fromkeys([*missing_lags, *(name for name in self.factor_names if name in data.columns)])
+        base = pd.DataFrame({column: pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=np.float64)
+                             for column in base_columns}, index=pd.RangeIndex(len(data)))
+        base = base.fillna(0)
+        lag_data = util.build_lag_matrix(base, missing_lags, fill_value=0)
+
+        design = np.empty((len(data), len(self.names)), dtype=np.float64)
+        design[:, 0] = 1.0
+        for position, name in enumerate(self.factor_names, start=1):
+            if name in base.columns:
+                design[:, position] = base[name].to_numpy()
+            elif name in lag_data.columns:
+                design[:, position] = lag_data[name].to_numpy()
+            else:
+                raise ValueError(f'В данных нет столбца {name}')
+
+        return design
+
+    def score(self, data):
+        """
+        Прогноз для всех строк данных одним матричным умножением.
+
+        Returns:
+        - np.ndarray. Прогнозные значения.
+        """
+        return self.design_matrix(data) @ self.coefficients
+
+    def score_file(self, file, sheet, date_format=None):
+        """
+        Прогноз по листу Excel: лист готовится так же, как при обучении.
+
+        Returns:
+        - DataFrame. Подготовленные данные со столбцом 'Прогноз <столбец>'.
+        """
+        spec = self.spec
+        data = util.data_preparation(file, sheet, spec['column_time'], spec['column_for_predict'],
+                                     spec['selected_columns'], date_format or spec['date_format'])
+        data[f"Прогноз {spec['column_for_predict']}"] = self.score(data)
+
+        return data
+
+
+def artifact_path(result_path):
+    """Путь к файлу модели рядом с файлом результата."""
+    return os.path.splitext(result_path)[0] + ARTIFACT_EXTENSION
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Прогноз по сохраненной ADL-модели.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('model', help='файл модели (.adlmodel)')
+    parser.add_argument('--file', required=True, help='путь к файлу Excel с данными')
+    parser.add_argument('--sheet', required=True, help='название листа')
+    parser.add_argument('--date-format', default=None, help='формат даты (по умолчанию - как при обучении)')
+    parser.add_argument('--output', default=None, help='путь к файлу прогноза (.csv); по умолчанию вывод на экран')
+    args = parser.parse_args(argv)
+
+    try:
+        artifact = ModelArtifact.load(args.model)
+        result = artifact.score_file(args.file, args.sheet, args.date_format)
+    except Exception as e:
+        print(f'Ошибка: {e}', file=sys.stderr)
+        return 1
+
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f'Файл: {args.output}')
+    else:
+        print(result.to_string(index=False))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
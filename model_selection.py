@@ -0,0 +1,189 @@
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import utilities as util
+
+CRITERIA = ('aic', 'bic', 'mape')
+
+
+def build_candidate_matrix(data, candidate_factors, max_lag):
+    """
+    Строит матрицу всех столбцов, которые могут войти в модель: факторы и их лаги 1..max_lag.
+
+    Лаги, для которых нет предыдущих значений, заполняются нулями, как в create_lags.
+
+    Parameters:
+    - data: DataFrame. Подготовленные данные (без лагов).
+    - candidate_factors: list. Факторы-кандидаты.
+    - max_lag: int. Максимальный порядок лага.
+
+    Returns:
+    - Tuple. Матрица (строки, 1 + факторы * (max_lag + 1)) с единичным первым столбцом
+      и словарь {(фактор, лаг): номер столбца}.
+    """
+    values = data[candidate_factors].to_numpy(dtype=np.float64)
+    row_count, factor_count = values.shape
+
+    matrix = np.zeros((row_count, 1 + factor_count * (max_lag + 1)), dtype=np.float64)
+    matrix[:, 0] = 1.0
+    positions = {}
+    for lag in range(max_lag + 1):
+        first = 1 + lag * factor_count
+        if lag == 0:
+            matrix[:, first:first + factor_count] = values
+        elif lag < row_count:
+            matrix[lag:, first:first + factor_count] = values[:-lag]
+        for j, factor in enumerate(candidate_factors):
+            positions[(factor, lag)] = first + j
+
+    return np.nan_to_num(matrix), positions
+
+
+def candidate_columns(factors, lag_count, column_for_predict, positions):
+    """
+    Возвращает названия и номера столбцов модели в том же порядке, что и create_model.
+
+    Прогнозируемый столбец входит в модель только своими лагами.
+    """
+    names = ['const']
+    indexes = [0]
+    for factor in factors:
+        if factor != column_for_predict:
+            names.append(factor)
+            indexes.append(positions[(factor, 0)])
+    for factor in factors:
+        for lag in range(1, lag_count + 1):
+            names.append(f'{factor}_lag_{lag}')
+            indexes.append(positions[(factor, lag)])
+
+    return names, indexes
+
+
+def _information_criteria(rss, row_count, param_count):
+    """AIC и BIC по формулам statsmodels OLS (через логарифм функции правдоподобия)."""
+    if rss <= 0 or row_count == 0:
+        return -np.inf, -np.inf
+    llf = -row_count / 2 * (math.log(2 * math.pi * rss / row_count) + 1)
+    return -2 * llf + 2 * param_count, -2 * llf + param_count * math.log(row_count)
+
+
+def _holdout_mape(actual, forecast):
+    """MAPE на тестовой выборке (см. metrics: строки с нулевым фактом не учитываются)."""
+    if len(actual) == 0:
+        return np.nan
+    return float(metrics.group_metrics(actual, forecast, np.zeros(len(actual), dtype=np.int64), 1)['mape'][0])
+
+
+def search_models(data, column_for_predict, candidate_factors, max_lag=3, max_factors=4, train_percent=66,
+                  criterion='aic'):
+    """
+    Перебирает порядки лагов 1..max_lag и наборы факторов и ранжирует модели по AIC, BIC или MAPE.
+
+    Вместо отдельного sm.OLS для каждого варианта один раз считаются общие матрицы
+    XᵀX и Xᵀy по всем столбцам-кандидатам. Для каждого варианта из них выбирается
+    подматрица и решается небольшая система нормальных уравнений через разложение
+    Холецкого, поэтому сотни вариантов оцениваются за время нескольких обычных обучений.
+
+    Parameters:
+    - data: DataFrame. Подготовленные данные (результат data_preparation, без лагов).
+    - column_for_predict: str. Прогнозируемый столбец.
+    - candidate_factors: list. Факторы-кандидаты. Если среди них есть прогнозируемый столбец,
+      в перебор входят его лаги.
+    - max_lag: int, optional. Максимальный порядок лага.
+    - max_factors: int, optional. Максимальное количество факторов в модели.
+    - train_percent: int, optional. Процент данных для обучения, остальное - для расчета MAPE.
+    - criterion: str, optional. Критерий ранжирования: 'aic', 'bic' или 'mape'.
+
+    Returns:
+    - DataFrame. Варианты моделей, отсортированные по критерию (лучший - первый),
+      со столбцами lag_count, factors, param_count, rss, aic, bic, mape, params.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f'Неизвестный критерий: {criterion}. Допустимые значения: {CRITERIA}')
+    candidate_factors = list(dict.fromkeys(candidate_factors))
+    if not candidate_factors:
+        raise ValueError('Не выбраны факторы для прогноза!')
+
+    matrix, positions = build_candidate_matrix(data, candidate_factors, max_lag)
+    target = data[column_for_predict].to_numpy(dtype=np.float64)
+    split_index = int(len(data) * (train_percent / 100))
+
+    train_matrix, test_matrix = matrix[:split_index], matrix[split_index:]
+    train_target, test_target = target[:split_index], target[split_index:]
+
+    # Масштабирование столбцов улучшает обусловленность XᵀX и не меняет остатки модели
+    scale = np.sqrt((train_matrix ** 2).mean(axis=0))
+    scale[scale == 0] = 1.0
+    scaled_train = train_matrix / scale
+    gram = scaled_train.T @ scaled_train
+    cross = scaled_train.T @ train_target
+    target_square = float(train_target @ train_target)
+
+    results = []
+    for lag_count in range(1, max_lag + 1):
+        for factor_count in range(1, min(max_factors, len(candidate_factors)) + 1):
+            for factors in itertools.combinations(candidate_factors, factor_count):
+                names, indexes = candidate_columns(factors, lag_count, column_for_predict, positions)
+                if len(indexes) < 2:
+                    continue
+
+                sub_gram = gram[np.ix_(indexes, indexes)]
+                sub_cross = cross[indexes]
+                try:
+                    lower = np.linalg.cholesky(sub_gram)
+                    coefficients = np.linalg.solve(lower.T, np.linalg.solve(lower, sub_cross))
+                except np.linalg.LinAlgError:
+                    # Вырожденная матрица: решение с минимальной нормой
+                    coefficients = np.linalg.lstsq(sub_gram, sub_cross, rcond=None)[0]
+
+                rss = max(target_square - 2 * coefficients @ sub_cross + coefficients @ sub_gram @ coefficients, 0.0)
+                aic, bic = _information_criteria(rss, split_index, len(indexes))
+                params = coefficients / scale[indexes]
+                mape = _holdout_mape(test_target, test_matrix[:, indexes] @ params)
+
+                results.append({
+                    'lag_count': lag_count,
+                    'factors': list(factors),
+                    'param_count': len(indexes),
+                    'rss': rss,
+                    'aic': aic,
+                    'bic': bic,
+                    'mape': mape,
+                    'params': pd.Series(params, index=names),
+                })
+
+    ranking = pd.DataFrame(results)
+    if ranking.empty:
+        return ranking
+
+    return ranking.sort_values(criterion, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def select_model(file, sheet, column_for_predict, column_time, candidate_factors, max_lag=3, max_factors=4,
+                 train_percent=66, criterion='aic', date_format='auto'):
+    """
+    Читает лист и подбирает порядок лагов и набор факторов (см. search_models).
+
+    Parameters:
+    - file, sheet, column_time, date_format: источник данных (см. data_preparation).
+    - остальные параметры - как в search_models.
+
+    Returns:
+    - DataFrame. Результат search_models; лучший вариант - первая строка.
+    """
+    candidate_factors = list(dict.fromkeys(candidate_factors))
+    data = util.data_preparation(file, sheet, column_time, column_for_predict, candidate_factors, date_format)
+
+    return search_models(data, column_for_predict, candidate_factors, max_lag, max_factors, train_percent,
+                         criterion)
+
+
+def format_ranking(ranking, top=5):
+    """Текстовая таблица лучших вариантов подбора."""
+    table = ranking.head(top)[['lag_count', 'factors', 'param_count', 'aic', 'bic', 'mape']].copy()
+    table['factors'] = table['factors'].map(', '.join)
+    return table.to_string(index=False, float_format=lambda value: f'{value:.4g}')
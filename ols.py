@@ -0,0 +1,141 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+BACKENDS = ('lstsq', 'statsmodels')
+
+
+class OLSResult:
+    """
+    Результат МНК-оценки без зависимости от statsmodels.
+
+    Сразу доступны только коэффициенты (params). Остатки, R², стандартные ошибки,
+    t-статистики и информационные критерии считаются при первом обращении, поэтому
+    обычное обучение стоит одного вызова numpy.linalg.lstsq.
+    """
+
+    def __init__(self, params, exog, endog, rank):
+        self.params = params
+        self.exog = exog
+        self.endog = endog
+        self.rank = rank
+        self.nobs = exog.shape[0]
+        self.df_model = rank - 1
+        self.df_resid = self.nobs - rank
+        self._cache = {}
+
+    def _cached(self, name, function):
+        if name not in self._cache:
+            self._cache[name] = function()
+        return self._cache[name]
+
+    @property
+    def fittedvalues(self):
+        return self._cached('fittedvalues', lambda: self.exog @ self.params.to_numpy())
+
+    @property
+    def resid(self):
+        return self._cached('resid', lambda: self.endog - self.fittedvalues)
+
+    @property
+    def ssr(self):
+        return self._cached('ssr', lambda: float(self.resid @ self.resid))
+
+    @property
+    def centered_tss(self):
+        return self._cached('centered_tss', lambda: float(((self.endog - self.endog.mean()) ** 2).sum()))
+
+    @property
+    def rsquared(self):
+        return 1 - self.ssr / self.centered_tss if self.centered_tss else np.nan
+
+    @property
+    def rsquared_adj(self):
+        if self.df_resid <= 0:
+            return np.nan
+        return 1 - (self.nobs - 1) / self.df_resid * (1 - self.rsquared)
+
+    @property
+    def scale(self):
+        return self.ssr / self.df_resid if self.df_resid > 0 else np.nan
+
+    def cov_params(self):
+        """Ковариационная матрица оценок коэффициентов (метод, как в statsmodels)."""
+        def calculate():
+            pseudo_inverse = np.linalg.pinv(self.exog)
+            covariance = self.scale * (pseudo_inverse @ pseudo_inverse.T)
+            return pd.DataFrame(covariance, index=self.params.index, columns=self.params.index)
+
+        return self._cached('cov_params', calculate)
+
+    @property
+    def bse(self):
+        return pd.Series(np.sqrt(np.diag(self.cov_params())), index=self.params.index)
+
+    @property
+    def tvalues(self):
+        return self.params / self.bse
+
+    @property
+    def llf(self):
+        return -self.nobs / 2 * (math.log(2 * math.pi * self.ssr / self.nobs) + 1)
+
+    @property
+    def aic(self):
+        return -2 * self.llf + 2 * self.rank
+
+    @property
+    def bic(self):
+        return -2 * self.llf + self.rank * math.log(self.nobs)
+
+
+@instrumentation.traced()
+def fit_lstsq(X, y):
+    """
+    Оценивает параметры МНК через numpy.linalg.lstsq.
+
+    Parameters:
+    - X: DataFrame. Матрица факторов со столбцом 'const'.
+    - y: Series. Прогнозируемые значения.
+
+    Returns:
+    - OLSResult. Результат с параметрами, индексированными названиями столбцов X.
+    """
+    exog = X.to_numpy(dtype=np.float64)
+    endog = y.to_numpy(dtype=np.float64)
+    if exog.shape[0] == 0:
+        raise ValueError('Нет данных для обучения модели')
+    coefficients, _, rank, _ = np.linalg.lstsq(exog, endog, rcond=None)
+
+    return OLSResult(pd.Series(coefficients, index=X.columns), exog, endog, int(rank))
+
+
+@instrumentation.traced()
+def fit_statsmodels(X, y):
+    """Полная оценка statsmodels (сводка, ковариации, тесты); statsmodels импортируется только здесь."""
+    import statsmodels.api as sm
+
+    return sm.OLS(y, X).fit()
+
+
+def fit(X, y, backend='lstsq'):
+    """
+    Оценивает линейную регрессию выбранным способом.
+
+    Parameters:
+    - X: DataFrame. Матрица факторов со столбцом 'const'.
+    - y: Series. Прогнозируемые значения.
+    - backend: str, optional. 'lstsq' - быстрая оценка NumPy, 'statsmodels' - полная диагностика.
+
+    Returns:
+    - OLSResult или RegressionResultsWrapper statsmodels.
+    """
+    if backend == 'lstsq':
+        return fit_lstsq(X, y)
+    if backend == 'statsmodels':
+        return fit_statsmodels(X, y)
+
+    raise ValueError(f'Неизвестный способ оценки: {backend}. Допустимые значения: {BACKENDS}')
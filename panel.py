@@ -0,0 +1,272 @@
+"""
+Панельная ADL-модель: одна спецификация для многих групп (магазинов, счетчиков),
+которые хранятся в одном листе и различаются значением столбца-ключа.
+
+Лаги строятся одним блоком по всему листу, отсортированному по группе и времени;
+значения, которые попали бы в лаг из предыдущей группы, заменяются нулями, как
+первые строки без истории в create_lags. Модели всех групп оцениваются одной
+пакетной операцией: суммы XᵀX и Xᵀy по группам считаются через np.bincount, а
+нормальные уравнения всех групп решаются сразу (стопкой матриц k x k).
+
+Запуск:
+    python panel.py --file data.xlsx --sheet Sheet1 --group "Магазин" --target y --time-column date --factors x1 x2
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import excel_loader
+import export
+import forecast_engine
+import instrumentation
+import metrics
+import pipeline
+import utilities as util
+
+
+def order_by_group(data, group_column, column_time=None):
+    """
+    Сортирует строки по группе и времени; порядок строк внутри группы при равном времени сохраняется.
+
+    Строки без ключа группы удаляются.
+
+    Returns:
+    - Tuple. Отсортированный DataFrame (индекс 0..n-1), коды групп (int64) и значения ключей по коду.
+    """
+    data = data[data[group_column].notna()]
+    codes, keys = pd.factorize(data[group_column], sort=True)
+    order_columns = [codes] if column_time is None else [data[column_time].to_numpy(), codes]
+    # lexsort сортирует по последнему ключу, затем по предыдущим; сортировка устойчивая
+    order = np.lexsort(order_columns)
+    data = data.iloc[order].reset_index(drop=True)
+
+    return data, codes[order].astype(np.int64), keys
+
+
+def group_positions(codes):
+    """Номер строки внутри своей группы (строки одной группы идут подряд)."""
+    row_count = len(codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if row_count else np.empty(0, dtype=np.int64)
+    lengths = np.diff(np.r_[starts, row_count])
+    return np.arange(row_count) - np.repeat(starts, lengths)
+
+
+@instrumentation.traced()
+def create_group_lags(data, codes, columns, lag_count, need_create_lag_for_predictable, chosen_column_for_predict,
+                      dtype=np.float64):
+    """
+    Создает лаги как create_lags, но без переноса значений между группами.
+
+    Parameters:
+    - data: DataFrame. Данные, отсортированные по группе и времени (см. order_by_group).
+    - codes: array of int. Код группы каждой строки.
+    - остальные параметры - как в create_lags.
+
+    Returns:
+    - DataFrame. Данные с лагами; пропуски и лаги через границу группы заменены нулями.
+    """
+    columns_for_created_lags = util.lag_columns(columns, need_create_lag_for_predictable, chosen_column_for_predict)
+    depths = util.lag_depths(columns_for_created_lags, lag_count)
+    lag_data = util.build_lag_matrix(data, depths, dtype=dtype)
+
+    # Лаг k строки с номером p внутри группы существует, только если p >= k
+    positions = group_positions(codes)
+    for column, depth in depths.items():
+        for lag in range(1, depth + 1):
+            lag_data.loc[positions < lag, f'{column}_lag_{lag}'] = np.nan
+
+    data = pd.concat([data.drop(columns=lag_data.columns, errors='ignore'), lag_data], axis=1)
+
+    # Как в create_lags пропуски заменяются нулями, но только в числовых столбцах (ключ группы не меняется)
+    return data.fillna(dict.fromkeys(data.select_dtypes('number').columns, 0))
+
+
+def batched_least_squares(features, target, codes, group_count, min_rows=None):
+    """
+    Оценки МНК для всех групп одной пакетной операцией.
+
+    Суммы XᵀX и Xᵀy каждой группы считаются через np.bincount (k(k+1)/2 проходов по строкам),
+    затем все системы нормальных уравнений решаются сразу. Перед решением матрицы
+    масштабируются по своей диагонали, что улучшает обусловленность.
+
+    Parameters:
+    - features: np.ndarray. Матрица факторов со столбцом констант (строк x k).
+    - target: np.ndarray. Прогнозируемые значения.
+    - codes: array of int. Код группы каждой строки.
+    - group_count: int. Количество групп.
+    - min_rows: int, optional. Минимальное число строк группы (по умолчанию k);
+      для групп с меньшим числом строк коэффициенты равны nan.
+
+    Returns:
+    - Tuple. Коэффициенты (групп x k) и число строк каждой группы.
+    """
+    parameter_count = features.shape[1]
+    min_rows = parameter_count if min_rows is None else min_rows
+    rows = np.bincount(codes, minlength=group_count)
+
+    gram = np.empty((group_count, parameter_count, parameter_count))
+    cross = np.empty((group_count, parameter_count))
+    for i in range(parameter_count):
+        cross[:, i] = np.bincount(codes, weights=features[:, i] * target, minlength=group_count)
+        for j in range(i, parameter_count):
+            gram[:, i, j] = gram[:, j, i] = np.bincount(codes, weights=features[:, i] * features[:, j],
+                                                        minlength=group_count)
+
+    scale = np.sqrt(np.diagonal(gram, axis1=1, axis2=2)).copy()
+    scale[scale == 0] = 1.0
+    scaled_gram = gram / (scale[:, :, None] * scale[:, None, :])
+    # pinv для стопки симметричных матриц; вырожденные группы получают решение минимальной нормы
+    coefficients = (np.linalg.pinv(scaled_gram, hermitian=True) @ (cross / scale)[:, :, None])[:, :, 0] / scale
+    coefficients[rows < min_rows] = np.nan
+
+    return coefficients, rows
+
+
+def _group_naive_scale(target, codes, train_mask, group_count):
+    """Знаменатель MASE каждой группы: ошибка наивного прогноза на ее обучающей выборке."""
+    same_group = (codes[1:] == codes[:-1]) & train_mask[1:] & train_mask[:-1]
+    differences = np.abs(np.diff(target))[same_group]
+    previous_codes = codes[1:][same_group]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = (np.bincount(previous_codes, weights=differences, minlength=group_count)
+                 / np.bincount(previous_codes, minlength=group_count))
+    scale[scale == 0] = np.nan
+    return scale
+
+
+@instrumentation.traced()
+def fit_panel(data, group_column, column_for_predict, column_factors, lag_count=1, train_percent=66,
+              column_time=None, min_rows=None):
+    """
+    Строит ADL-модель для каждой группы по одной спецификации.
+
+    Обучающая выборка каждой группы - первые train_percent процентов ее строк
+    (как separation_data для одной группы), остальные строки - тестовая выборка.
+
+    Parameters:
+    - data: DataFrame. Подготовленные данные всех групп (см. read_panel).
+    - group_column: str. Столбец с ключом группы.
+    - column_for_predict: str. Прогнозируемый столбец.
+    - column_factors: list. Столбцы-факторы модели.
+    - lag_count: int или dict, optional. Количество лагов.
+    - train_percent: int, optional. Процент строк группы для обучения.
+    - column_time: str, optional. Столбец времени для сортировки строк внутри группы.
+    - min_rows: int, optional. Минимальное число обучающих строк группы (см. batched_least_squares).
+
+    Returns:
+    - dict. Параметры по группам ('params', DataFrame с индексом - ключом группы),
+      метрики тестовой выборки по группам ('metrics', см. metrics.group_metrics),
+      данные с лагами, прогнозом и 'Тип данных' ('data').
+    """
+    selected_columns, create_lag_flag = pipeline.select_columns(column_for_predict, column_factors)
+    data, codes, keys = order_by_group(data, group_column, column_time)
+    group_count = len(keys)
+    if group_count == 0:
+        raise ValueError('Нет данных для обучения модели')
+
+    data = create_group_lags(data, codes, selected_columns, lag_count, create_lag_flag, column_for_predict)
+    factor_names = util.model_factor_names(column_for_predict,
+                                           pipeline.model_columns(column_for_predict, selected_columns,
+                                                                  create_lag_flag),
+                                           lag_count)
+    features = np.column_stack([np.ones(len(data)), data[factor_names].to_numpy(dtype=np.float64)])
+    target = data[column_for_predict].to_numpy(dtype=np.float64)
+
+    group_sizes = np.bincount(codes, minlength=group_count)
+    train_mask = group_positions(codes) < (group_sizes * (train_percent / 100)).astype(np.int64)[codes]
+    coefficients, train_rows = batched_least_squares(features[train_mask], target[train_mask], codes[train_mask],
+                                                     group_count, min_rows)
+
+    data[f'Прогноз {column_for_predict}'] = np.einsum('ij,ij->i', features, coefficients[codes])
+    data['Тип данных'] = np.where(train_mask, forecast_engine.TRAIN_LABEL, forecast_engine.TEST_LABEL).astype(object)
+
+    index = pd.Index(keys, name=group_column)
+    params = pd.DataFrame(coefficients, index=index, columns=['const', *factor_names])
+    test_metrics = metrics.group_metrics(target, data[f'Прогноз {column_for_predict}'].to_numpy(),
+                                         np.where(train_mask, -1, codes), group_count,
+                                         _group_naive_scale(target, codes, train_mask, group_count))
+    group_table = pd.DataFrame({'rows': group_sizes, 'train_rows': train_rows, **test_metrics}, index=index)
+
+    return {'params': params, 'metrics': group_table, 'data': data}
+
+
+def read_panel(file, sheet, group_column, column_time, column_for_predict, column_factors, date_format='auto'):
+    """
+    Читает лист со всеми группами и разбирает столбец времени (как data_preparation).
+
+    Returns:
+    - DataFrame. Столбцы времени, ключа группы, факторов и прогнозируемого столбца.
+    """
+    selected_columns, _ = pipeline.select_columns(column_for_predict, column_factors)
+    usecols = list(dict.fromkeys([column_time, group_column, *selected_columns]))
+    data = excel_loader.read_sheet(file, sheet, usecols=usecols)
+
+    return util.prepare_frame(data, column_time, column_for_predict, [group_column, *selected_columns], date_format)
+
+
+def run_panel_pipeline(file, sheet, group_column, column_for_predict, column_time, column_factors, lag_count=1,
+                       train_percent=66, date_format='auto', output_directory=None, file_format='xlsx'):
+    """
+    Читает лист, строит модели всех групп и записывает прогноз и таблицу параметров.
+
+    Returns:
+    - dict. Результат fit_panel, а также результат записи прогноза ('result_write')
+      и путь к таблице параметров ('params_path').
+    """
+    data = read_panel(file, sheet, group_column, column_time, column_for_predict, column_factors, date_format)
+    result = fit_panel(data, group_column, column_for_predict, column_factors, lag_count, train_percent, column_time)
+
+    result['result_write'] = util.write_to_excel(result['data'], output_file=column_for_predict,
+                                                 output_directory=output_directory, file_format=file_format,
+                                                 sheet=column_for_predict)
+    result['params_path'] = None
+    if result['result_write']['Result']:
+        base_path, extension = os.path.splitext(result['result_write']['Path'])
+        table = result['params'].join(result['metrics']).reset_index()
+        result['params_path'] = export.export_frame(table, f'{base_path} params{extension}', file_format,
+                                                    sheet='Params')
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Построение ADL-моделей для всех групп листа.',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--file', required=True, help='путь к файлу Excel')
+    parser.add_argument('--sheet', required=True, help='название листа')
+    parser.add_argument('--group', required=True, help='столбец с ключом группы (магазин, счетчик)')
+    parser.add_argument('--target', required=True, help='столбец, который нужно прогнозировать')
+    parser.add_argument('--time-column', required=True, help='столбец с временными метками')
+    parser.add_argument('--factors', required=True, nargs='+', help='столбцы-факторы модели')
+    parser.add_argument('--lags', type=int, default=1, help='количество лагов (по умолчанию 1)')
+    parser.add_argument('--train-percent', type=int, default=66,
+                        help='процент строк каждой группы для обучения (по умолчанию 66)')
+    parser.add_argument('--date-format', default='auto', help='формат даты (по умолчанию auto)')
+    parser.add_argument('--output-format', default='xlsx', choices=export.FORMATS, help='формат файлов результата')
+    parser.add_argument('--output-dir', default=None, help='каталог для файлов результата (по умолчанию текущий)')
+    args = parser.parse_args(argv)
+
+    try:
+        result = run_panel_pipeline(args.file, args.sheet, args.group, args.target, args.time_column, args.factors,
+                                    args.lags, args.train_percent, args.date_format, args.output_dir,
+                                    args.output_format)
+    except Exception as e:
+        print(f'Ошибка: {e}', file=sys.stderr)
+        return 1
+
+    print(f"Групп: {len(result['params'])}")
+    print(result['params'].join(result['metrics'][['rows', 'mape', 'rmse']]).to_string())
+    if not result['result_write']['Result']:
+        print(f"Ошибка записи файла: {result['result_write'].get('Error')}", file=sys.stderr)
+        return 1
+    print(f"Файл: {result['result_write']['Path']}")
+    print(f"Параметры: {result['params_path']}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
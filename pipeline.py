@@ -0,0 +1,200 @@
+import os
+
+import forecast_engine
+import instrumentation
+import memory_optimization
+import metrics
+import model_artifact
+import utilities as util
+
+# Этапы построения модели: (ключ этапа, описание для пользователя)
+STAGES = [
+    ('read', 'Чтение данных'),
+    ('lags', 'Создание лагов'),
+    ('fit', 'Обучение модели'),
+    ('forecast', 'Прогнозирование'),
+    ('mape', 'Расчет MAPE'),
+    ('horizon', 'Прогноз на будущие периоды'),
+    ('write', 'Запись результата'),
+]
+
+
+class PipelineCancelled(Exception):
+    """Построение модели отменено пользователем."""
+
+
+def _report(stage_number, progress_callback, cancel_event):
+    """Проверяет запрос на отмену и сообщает о начале очередного этапа."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise PipelineCancelled('Построение модели отменено')
+    if progress_callback is not None:
+        percent = int(stage_number * 100 / len(STAGES))
+        stage_name = STAGES[stage_number][1] if stage_number < len(STAGES) else 'Готово'
+        progress_callback(percent, stage_name)
+
+
+def select_columns(column_for_predict, column_factors):
+    """
+    Формирует список столбцов для лагов и модели так же, как это делает окно создания модели.
+
+    Parameters:
+    - column_for_predict: str. Столбец, который нужно прогнозировать.
+    - column_factors: list. Выбранные столбцы-факторы.
+
+    Returns:
+    - Tuple. Список столбцов (прогнозируемый столбец добавлен в конец, если его нет среди факторов)
+      и признак создания лагов для прогнозируемого столбца.
+    """
+    selected_columns = list(column_factors)
+    if column_for_predict in selected_columns:
+        return selected_columns, True
+
+    selected_columns.append(column_for_predict)
+    return selected_columns, False
+
+
+def model_columns(column_for_predict, selected_columns, create_lag_for_chosen_column_for_predict):
+    """Столбцы, которые входят в модель вместе со своими лагами."""
+    if create_lag_for_chosen_column_for_predict:
+        return list(selected_columns)
+    return [column for column in selected_columns if column != column_for_predict]
+
+
+@instrumentation.traced()
+def run_model_pipeline(file, sheet, column_for_predict, column_time, column_factors, lag_count=1,
+                       train_percent=66, date_format='%d.%m.%Y', output_directory=None, file_format='xlsx',
+                       streaming=False, disk_cache=False, forecast_steps=0, future_factors=None, backend='lstsq',
+                       compact=False, compression=None, save_model=False, progress_callback=None, cancel_event=None):
+    """
+    Выполняет всю цепочку построения модели: чтение, лаги, обучение, прогноз, MAPE и запись.
+
+    Parameters:
+    - file: str. Путь к файлу Excel.
+    - sheet: str. Название листа.
+    - column_for_predict: str. Столбец, который нужно прогнозировать.
+    - column_time: str. Столбец с временными метками.
+    - column_factors: list. Столбцы-факторы модели.
+    - lag_count: int, optional. Количество лагов для каждого фактора.
+    - train_percent: int, optional. Процент данных для обучающей выборки.
+    - date_format: str, optional. Формат даты в столбце времени или 'auto'.
+    - output_directory: str, optional. Каталог для записи результата.
+    - file_format: str, optional. Формат файла результата: 'xlsx', 'csv', 'parquet' или 'feather'.
+    - streaming: bool, optional. Потоковое чтение листа (см. data_preparation).
+    - disk_cache: bool, optional. Кэш подготовленных данных на диске (см. data_preparation).
+    - forecast_steps: int, optional. Количество будущих периодов рекурсивного прогноза.
+    - future_factors: dict, optional. Будущие значения факторов (см. forecast_engine.forecast_horizon).
+    - backend: str, optional. Способ оценки модели (см. create_model).
+    - compact: bool, optional. Режим экономии памяти: компактные числовые типы, лаги во float32
+      (если позволяют исходные столбцы) и Categorical для 'Тип данных'.
+    - compression: str, optional. Сжатие файла результата (см. export.COMPRESSIONS).
+    - save_model: bool, optional. Сохранить модель рядом с файлом результата (см. model_artifact).
+    - progress_callback: callable, optional. Вызывается как progress_callback(процент, название этапа).
+    - cancel_event: threading.Event, optional. Установленное событие прерывает расчет перед очередным этапом.
+
+    Returns:
+    - dict. Результат записи ('result_write'), параметры модели ('params'), MAPE по обучающей
+      и тестовой выборкам вместе ('mape', как metrics[metrics.ALL_SEGMENT]['mape']),
+      метрики обучающей и тестовой выборок ('metrics', см. metrics.evaluate),
+      данные с прогнозом ('data'), обученная модель ('model') и отчет о разборе
+      столбца времени ('time_parsing', см. time_parsing.parse_time_column), а также
+      отчет об экономии памяти ('memory', см. memory_optimization.memory_report) в режиме compact
+      и путь к файлу модели ('model_path') при save_model; при чтении нескольких книг -
+      сведения о них ('ingestion', см. ingestion.read_sources).
+    """
+    if column_time == column_for_predict:
+        raise ValueError('Выбранные столбцы совпадают!')
+    if not column_factors:
+        raise ValueError('Не выбраны факторы для прогноза!')
+
+    selected_columns, create_lag_for_chosen_column_for_predict = select_columns(column_for_predict, column_factors)
+
+    _report(0, progress_callback, cancel_event)
+    prepared_data = util.data_preparation(
+        file=file,
+        sheet=sheet,
+        name_column_time=column_time,
+        name_column_for_predict=column_for_predict,
+        name_column_factors=selected_columns,
+        date_format=date_format,
+        streaming=streaming,
+        disk_cache=disk_cache
+    )
+
+    lag_dtype = float
+    if compact:
+        # Время остается datetime64, числовые столбцы хранятся в компактных типах
+        with instrumentation.span('memory_optimization.optimize_frame', len(prepared_data)):
+            prepared_data, _ = memory_optimization.optimize_frame(prepared_data, exclude=[column_time],
+                                                                  categorize=False)
+        lag_dtype = memory_optimization.lag_dtype(prepared_data, selected_columns)
+
+    _report(1, progress_callback, cancel_event)
+    data = util.create_lags(
+        prepared_data,
+        selected_columns,
+        lag_count,
+        create_lag_for_chosen_column_for_predict,
+        column_for_predict,
+        dtype=lag_dtype
+    )
+
+    _report(2, progress_callback, cancel_event)
+    data_learn, data_test = util.separation_data(data, train_percent)
+    model = util.create_model(data_learn, column_for_predict,
+                              model_columns(column_for_predict, selected_columns,
+                                            create_lag_for_chosen_column_for_predict),
+                              lag_count, backend)
+
+    _report(3, progress_callback, cancel_event)
+    result_data = util.learn_on_params(data, model.params, train_percent, column_for_predict,
+                                       categorical_labels=compact)
+
+    _report(4, progress_callback, cancel_event)
+    # Столбец 'MAPE' по строкам для файла результата; итоговый MAPE - по всем фактическим строкам из metrics
+    util.calculate_mape(result_data, column_for_predict)
+    model_metrics = metrics.evaluate_frame(result_data, column_for_predict)
+    mape = model_metrics[metrics.ALL_SEGMENT]['mape']
+
+    _report(5, progress_callback, cancel_event)
+    result_data = forecast_engine.append_horizon_forecast(result_data, model.params, column_for_predict,
+                                                          forecast_steps, future_factors, column_time)
+
+    _report(6, progress_callback, cancel_event)
+    result_write = util.write_to_excel(
+        result_data,
+        output_file=column_for_predict,
+        output_directory=output_directory,
+        file_format=file_format,
+        compression=compression,
+        sheet=column_for_predict
+    )
+
+    model_path = None
+    if save_model and result_write['Result']:
+        time_values = prepared_data[column_time]
+        artifact = model_artifact.ModelArtifact.from_params(
+            model.params, column_for_predict, column_time, selected_columns,
+            create_lag_for_chosen_column_for_predict, lag_count,
+            (prepared_data.attrs.get('time_parsing') or {}).get('format') or date_format,
+            metadata={
+                'source_file': os.path.abspath(file),
+                'sheet': sheet,
+                'rows': len(data),
+                'train_rows': len(data_learn),
+                'train_percent': train_percent,
+                'mape': float(mape),
+                'time_start': str(time_values.min()),
+                'time_end': str(time_values.max()),
+                'backend': backend,
+            }
+        )
+        with instrumentation.span('model_artifact.save'):
+            model_path = artifact.save(model_artifact.artifact_path(result_write['Path']))
+
+    _report(len(STAGES), progress_callback, None)
+
+    return {'result_write': result_write, 'params': model.params, 'mape': mape, 'data': result_data,
+            'metrics': model_metrics, 'model': model, 'time_parsing': prepared_data.attrs.get('time_parsing'),
+            'ingestion': prepared_data.attrs.get('ingestion'),
+            'memory': memory_optimization.memory_report(result_data) if compact else None,
+            'model_path': model_path}
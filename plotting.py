@@ -0,0 +1,296 @@
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Количество точек на один пиксель ширины графика, которое еще отличимо глазом
+POINTS_PER_PIXEL = 2
+
+PLOT_DIRECTORY = os.path.join(tempfile.gettempdir(), 'adl_plots')
+# Страницы графиков старше этого возраста (в секундах) остались от аварийно завершенных запусков
+STALE_PLOT_AGE = 24 * 60 * 60
+
+# Скрипт страницы графика: при изменении диапазона оси X запрашивает у программы
+# детальные данные через QWebChannel (объект 'bridge')
+ZOOM_SCRIPT = """
+var plot = document.getElementById('{plot_id}');
+var channelScript = document.createElement('script');
+channelScript.src = 'qrc:///qtwebchannel/qwebchannel.js';
+channelScript.onload = function () {
+    new QWebChannel(qt.webChannelTransport, function (channel) {
+        var bridge = channel.objects.bridge;
+        var timer = null;
+        plot.on('plotly_relayout', function (event) {
+            var range = event['xaxis.range'] || [event['xaxis.range[0]'], event['xaxis.range[1]']];
+            if (event['xaxis.autorange']) {
+                range = ['', ''];
+            } else if (range[0] === undefined) {
+                return;
+            }
+            clearTimeout(timer);
+            timer = setTimeout(function () { bridge.range_changed(String(range[0]), String(range[1])); }, 150);
+        });
+    });
+};
+document.head.appendChild(channelScript);
+"""
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Прореживание ряда алгоритмом Largest-Triangle-Three-Buckets.
+
+    Ряд делится на threshold - 2 корзины, из каждой берется точка, образующая
+    наибольший треугольник с предыдущей выбранной точкой и средним следующей корзины.
+    Форма графика (пики и провалы) при этом сохраняется.
+
+    Parameters:
+    - x: np.ndarray. Значения оси X (числа, по возрастанию).
+    - y: np.ndarray. Значения оси Y.
+    - threshold: int. Количество точек после прореживания.
+
+    Returns:
+    - np.ndarray. Номера выбранных точек.
+    """
+    point_count = len(x)
+    if threshold >= point_count or threshold < 3:
+        return np.arange(point_count)
+
+    bucket_size = (point_count - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, point_count)
+        if end < next_end:
+            average_x = x[end:next_end].mean()
+            average_y = y[end:next_end].mean()
+        else:
+            average_x, average_y = x[-1], y[-1]
+
+        areas = np.abs((x[selected] - average_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (average_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    indices[-1] = point_count - 1
+
+    return indices
+
+
+def minmax_indices(y, bucket_count):
+    """
+    Прореживание по минимуму и максимуму: из каждой корзины берутся две крайние точки.
+
+    Работает полностью векторно и подходит для очень длинных рядов.
+
+    Parameters:
+    - y: np.ndarray. Значения оси Y.
+    - bucket_count: int. Количество корзин (точек после прореживания - до 2 * bucket_count).
+
+    Returns:
+    - np.ndarray. Номера выбранных точек по возрастанию.
+    """
+    point_count = len(y)
+    if 2 * bucket_count >= point_count or bucket_count < 1:
+        return np.arange(point_count)
+
+    bucket_size = point_count // bucket_count
+    used = bucket_size * bucket_count
+    buckets = y[:used].reshape(bucket_count, bucket_size)
+    offsets = np.arange(bucket_count) * bucket_size
+    selected = [offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1), [0, point_count - 1]]
+    if used < point_count:
+        # Остаток, не поместившийся в равные корзины, образует еще одну корзину
+        remainder = y[used:]
+        selected.append([used + remainder.argmin(), used + remainder.argmax()])
+
+    selected = np.concatenate(selected)
+
+    return np.unique(selected)
+
+
+class PlotData:
+    """Отсортированные по X массивы графика, из которых вырезаются и прореживаются участки."""
+
+    def __init__(self, data, x_column, y_columns):
+        # Строки без значения по оси X на график не попадают
+        data = data[data[x_column].notna()]
+        x_values = data[x_column]
+        self.is_datetime = pd.api.types.is_datetime64_any_dtype(x_values)
+        if self.is_datetime:
+            x_numeric = x_values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+        else:
+            x_numeric = pd.to_numeric(x_values, errors='coerce').to_numpy(dtype=np.float64)
+            if np.isnan(x_numeric).all():
+                # Ось X не числовая (например, подписи) - используем номера строк
+                x_numeric = np.arange(len(x_values), dtype=np.float64)
+        order = np.argsort(x_numeric, kind='stable')
+
+        self.x_column = x_column
+        self.y_columns = list(y_columns)
+        self.x = x_numeric[order]
+        self.x_labels = x_values.to_numpy()[order]
+        self.y = {column: pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=np.float64)[order]
+                  for column in self.y_columns}
+
+    def parse_x(self, value):
+        """Переводит границу диапазона из события plotly в число на оси X."""
+        if value in ('', None):
+            return None
+        if self.is_datetime:
+            return float(pd.Timestamp(value).value)
+        return float(value)
+
+    def series(self, column, max_points, x_min=None, x_max=None, method='lttb'):
+        """
+        Возвращает прореженный участок ряда в диапазоне [x_min, x_max].
+
+        Parameters:
+        - column: str. Столбец оси Y.
+        - max_points: int. Максимальное количество точек.
+        - x_min, x_max: float, optional. Границы участка на числовой оси X.
+        - method: str, optional. 'lttb' или 'minmax'.
+
+        Returns:
+        - Tuple. Значения X (в исходном виде) и Y.
+        """
+        start = 0 if x_min is None else max(int(np.searchsorted(self.x, x_min, 'left')) - 1, 0)
+        end = len(self.x) if x_max is None else min(int(np.searchsorted(self.x, x_max, 'right')) + 1, len(self.x))
+
+        y = self.y[column][start:end]
+        valid = np.flatnonzero(~np.isnan(y))
+        if method == 'minmax':
+            selected = valid[minmax_indices(y[valid], max(max_points // 2, 1))]
+        else:
+            selected = valid[lttb_indices(self.x[start:end][valid], y[valid], max_points)]
+
+        return self.x_labels[start:end][selected], y[selected]
+
+    def traces(self, max_points, x_min=None, x_max=None, method='lttb'):
+        """Данные всех рядов участка в виде, пригодном для Plotly.restyle."""
+        x_values, y_values = [], []
+        for column in self.y_columns:
+            x_part, y_part = self.series(column, max_points, x_min, x_max, method)
+            x_values.append(_to_json_values(x_part))
+            y_values.append([None if np.isnan(value) else float(value) for value in y_part])
+        return {'x': x_values, 'y': y_values}
+
+
+def _to_json_values(values):
+    """Значения оси X для передачи в браузер (даты - строками ISO)."""
+    if len(values) and isinstance(values[0], (np.datetime64, pd.Timestamp)):
+        return [str(value) for value in pd.to_datetime(values)]
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+
+def build_figure(plot_data, max_points, title='Название графика', method='lttb'):
+    """
+    Строит фигуру plotly с WebGL-линиями (scattergl) по прореженным рядам.
+
+    Parameters:
+    - plot_data: PlotData. Данные графика.
+    - max_points: int. Максимальное количество точек на ряд.
+    - title: str, optional. Заголовок графика.
+    - method: str, optional. Способ прореживания: 'lttb' или 'minmax'.
+
+    Returns:
+    - plotly.graph_objects.Figure.
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for column in plot_data.y_columns:
+        x_values, y_values = plot_data.series(column, max_points, method=method)
+        fig.add_trace(go.Scattergl(x=x_values, y=y_values, mode='lines', name=column))
+    fig.update_layout(title=title, xaxis_title=plot_data.x_column)
+
+    return fig
+
+
+def _write_plotlyjs(directory):
+    """
+    Записывает plotly.js установленной версии plotly в каталог, если его там еще нет.
+
+    Версия входит в имя файла, поэтому после обновления plotly страницы не подключают
+    старую копию. Файл записывается через временный, чтобы параллельные запуски не
+    прочитали его недописанным.
+
+    Returns:
+    - str. Имя файла plotly.js в каталоге.
+    """
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    name = f'plotly-{plotly.__version__}.min.js'
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as plotlyjs_file:
+            plotlyjs_file.write(get_plotlyjs())
+        os.replace(temp_path, path)
+
+    return name
+
+
+def _remove_stale_pages(directory, max_age=STALE_PLOT_AGE):
+    """Удаляет страницы графиков, которые не были удалены при закрытии окна (например, после сбоя)."""
+    now = time.time()
+    for entry in os.scandir(directory):
+        if entry.name.startswith('plot-') and entry.name.endswith('.html'):
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def write_plot_html(fig, directory=PLOT_DIRECTORY, zoom_script=True):
+    """
+    Сохраняет график в HTML-файл с локальной копией plotly.js (работает без сети).
+
+    plotly.js записывается в каталог один раз для каждой версии plotly (см. _write_plotlyjs)
+    и подключается относительной ссылкой, поэтому страница не зависит от CDN и не упирается
+    в ограничение размера setHtml. Страница удаляется вызовом remove_plot_html, когда окно
+    графика закрывается.
+
+    Parameters:
+    - fig: plotly.graph_objects.Figure. График.
+    - directory: str, optional. Каталог для файлов графика.
+    - zoom_script: bool, optional. Добавить запрос детальных данных при изменении масштаба.
+
+    Returns:
+    - Tuple. Путь к HTML-файлу и идентификатор элемента графика на странице.
+    """
+    import plotly.io as pio
+
+    os.makedirs(directory, exist_ok=True)
+    _remove_stale_pages(directory)
+    plotlyjs_name = _write_plotlyjs(directory)
+
+    div_id = f'plot-{uuid.uuid4().hex}'
+    html = pio.to_html(fig, include_plotlyjs=plotlyjs_name, full_html=True, div_id=div_id,
+                       post_script=ZOOM_SCRIPT if zoom_script else None, config={'responsive': True})
+    html_path = os.path.join(directory, f'{div_id}.html')
+    with open(html_path, 'w', encoding='utf-8') as html_file:
+        html_file.write(html)
+
+    return html_path, div_id
+
+
+def remove_plot_html(html_path):
+    """Удаляет страницу графика, записанную write_plot_html (plotly.js остается для следующих графиков)."""
+    try:
+        os.remove(html_path)
+    except FileNotFoundError:
+        pass
+
+
+def restyle_script(div_id, traces):
+    """JavaScript, заменяющий данные всех рядов графика."""
+    return f"Plotly.restyle('{div_id}', {json.dumps(traces)});"
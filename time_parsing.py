@@ -0,0 +1,262 @@
+import datetime
+import numbers
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+AUTO_FORMAT = 'auto'
+# Явный формат для номеров дней Excel: числа разбираются во всем допустимом диапазоне
+SERIAL_FORMAT = 'serial'
+
+# Форматы, которые проверяются при автоматическом определении (кроме предложенных pandas)
+CANDIDATE_FORMATS = [
+    '%d.%m.%Y',
+    '%d.%m.%Y %H:%M',
+    '%d.%m.%Y %H:%M:%S',
+    '%d %b %Y %H:%M:%S',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y',
+    '%d/%m/%Y %H:%M',
+    '%m/%d/%Y',
+    '%d-%m-%Y',
+    '%Y.%m.%d',
+    '%Y%m%d',
+]
+
+# Начало отсчета дат Excel (с учетом ошибки Excel с 29.02.1900) и допустимый диапазон номеров дней
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+EXCEL_SERIAL_RANGE = (1, 2958465)
+# При автоматическом определении числа считаются датами Excel только в пределах 1950-2100 годов,
+# иначе годы (2019) или коды дат (20210101) превратились бы в даты начала XX века
+PLAUSIBLE_SERIAL_RANGE = (18264, 73051)
+
+SAMPLE_SIZE = 1000
+
+
+def infer_date_format(values, sample_size=SAMPLE_SIZE):
+    """
+    Определяет формат дат по выборке строк.
+
+    Проверяются форматы, предложенные pandas для первых значений выборки, и
+    CANDIDATE_FORMATS; выбирается формат, который разбирает наибольшую долю выборки.
+
+    Parameters:
+    - values: Series. Строковые значения дат.
+    - sample_size: int, optional. Размер выборки.
+
+    Returns:
+    - str или None. Формат strftime или None, если ни один формат не подошел.
+    """
+    strings = pd.Series(values, dtype=object).dropna()
+    if strings.empty:
+        return None
+    sample = strings if len(strings) <= sample_size else strings.sample(sample_size, random_state=0)
+    sample = sample.astype(str).str.strip()
+
+    candidates = []
+    with warnings.catch_warnings():
+        # pandas предупреждает, когда dayfirst неприменим к формату (например, %Y-%m-%d)
+        warnings.simplefilter('ignore', UserWarning)
+        for value in sample.iloc[:5]:
+            for dayfirst in (True, False):
+                guessed = guess_datetime_format(value, dayfirst=dayfirst)
+                if guessed is not None:
+                    candidates.append(guessed)
+    candidates = list(dict.fromkeys(CANDIDATE_FORMATS + candidates))
+
+    best_format, best_share = None, 0.0
+    for date_format in candidates:
+        share = pd.to_datetime(sample, format=date_format, errors='coerce').notna().mean()
+        if share > best_share:
+            best_format, best_share = date_format, share
+            if share == 1.0:
+                break
+
+    return best_format
+
+
+def parse_time_column(values, date_format=AUTO_FORMAT, sample_size=SAMPLE_SIZE):
+    """
+    Разбирает столбец с временными метками и сообщает, какие строки не удалось разобрать.
+
+    Поддерживаются значения, которые openpyxl уже вернул как datetime, номера дней Excel
+    (числа) и строки. Строки разбираются одним векторным вызовом pd.to_datetime
+    с заданным или определенным по выборке форматом (cache=True).
+
+    Числа при 'auto' считаются номерами дней Excel, только если попадают в
+    PLAUSIBLE_SERIAL_RANGE, при 'serial' - в любой допустимый номер дня. При явном
+    формате strftime числа разбираются как текст (например, 2019 с '%Y' или
+    20210101 с '%Y%m%d'). Остальные числа не разбираются и попадают в отчет.
+
+    Parameters:
+    - values: Series. Значения столбца времени.
+    - date_format: str, optional. Формат строк, 'serial' для номеров дней Excel
+      или 'auto' для автоматического определения.
+    - sample_size: int, optional. Размер выборки для определения формата.
+
+    Returns:
+    - Tuple. Series datetime64 (NaT для неразобранных значений) и отчет (dict):
+      rows, parsed, dropped, format, reasons (empty, unparsed_text, out_of_range_number,
+      unparsed_number, other)
+      и examples (несколько неразобранных значений).
+    """
+    values = pd.Series(values)
+    result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    reasons = {'empty': 0, 'unparsed_text': 0, 'out_of_range_number': 0, 'unparsed_number': 0, 'other': 0}
+    examples = []
+    used_format = None if date_format == AUTO_FORMAT else date_format
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        result = values.astype('datetime64[ns]')
+        reasons['empty'] = int(result.isna().sum())
+    elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        result, unparsed, reason = _parse_numbers(values, date_format)
+        reasons['empty'] = int(values.isna().sum())
+        reasons[reason] = int(unparsed.sum())
+        examples = values[unparsed].head(5).tolist()
+        if used_format is None and result.notna().any():
+            used_format = SERIAL_FORMAT
+    else:
+        empty = values.isna().to_numpy()
+        if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            # Только строки (и пустые ячейки): поэлементная проверка типов не нужна
+            is_text = ~empty
+            is_datetime = is_number = other = np.zeros(len(values), dtype=bool)
+        else:
+            # Тип ячейки определяется один раз для каждого встретившегося типа, а не для каждой строки
+            kinds = values.map(type, na_action='ignore')
+            kinds = kinds.map({value_type: _value_kind(value_type) for value_type in kinds.dropna().unique()})
+            is_text = (kinds == 'text').to_numpy()
+            is_datetime = (kinds == 'datetime').to_numpy()
+            is_number = (kinds == 'number').to_numpy()
+            other = (kinds == 'other').to_numpy()
+
+        if is_datetime.any():
+            result[is_datetime] = pd.to_datetime(values[is_datetime], errors='coerce')
+        if is_number.any():
+            numbers_parsed, unparsed, reason = _parse_numbers(values[is_number], date_format)
+            result[is_number] = numbers_parsed
+            reasons[reason] = int(unparsed.sum())
+            examples.extend(values[is_number][unparsed].head(5).tolist())
+        if is_text.any():
+            text = values[is_text]
+            if used_format is None:
+                used_format = infer_date_format(text, sample_size)
+            # Формат 'serial' относится только к числам, текст при нем не разбирается
+            text_format = None if used_format == SERIAL_FORMAT else used_format
+            if text_format is not None:
+                parsed = pd.to_datetime(text, format=text_format, errors='coerce', cache=True)
+            else:
+                parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+            # Пробелы по краям убираются только у строк, не разобранных с первого раза
+            retry = parsed.isna()
+            if retry.any():
+                text = text.copy()
+                text[retry] = text[retry].str.strip()
+                if text_format is not None:
+                    parsed[retry] = pd.to_datetime(text[retry], format=text_format, errors='coerce', cache=True)
+            empty_text = text == ''
+            parsed, text = parsed[~empty_text], text[~empty_text]
+            result[parsed.index] = parsed
+            unparsed = parsed.isna()
+            reasons['unparsed_text'] = int(unparsed.sum())
+            reasons['empty'] += int(empty_text.sum())
+            examples.extend(text[unparsed].head(5).tolist())
+
+        reasons['empty'] += int(empty.sum())
+        reasons['other'] = int(other.sum())
+        examples.extend(values[other].head(5).tolist())
+
+    parsed_count = int(result.notna().sum())
+    report = {
+        'rows': len(values),
+        'parsed': parsed_count,
+        'dropped': len(values) - parsed_count,
+        'format': used_format,
+        'reasons': {reason: count for reason, count in reasons.items() if count},
+        'examples': [str(example) for example in examples[:5]],
+    }
+
+    return result, report
+
+
+def _value_kind(value_type):
+    """Вид значения ячейки по его типу: text, datetime, number или other."""
+    if issubclass(value_type, str):
+        return 'text'
+    if issubclass(value_type, (datetime.datetime, datetime.date, np.datetime64)):
+        return 'datetime'
+    if issubclass(value_type, numbers.Number) and not issubclass(value_type, (bool, np.bool_)):
+        return 'number'
+    return 'other'
+
+
+def _parse_numbers(numbers_series, date_format):
+    """
+    Разбирает числовые значения времени (см. parse_time_column).
+
+    Returns:
+    - Tuple. Series datetime64, маска неразобранных чисел и причина для отчета.
+    """
+    if date_format == AUTO_FORMAT:
+        result, unparsed = _parse_excel_serial(numbers_series, PLAUSIBLE_SERIAL_RANGE)
+        return result, unparsed, 'out_of_range_number'
+    if date_format == SERIAL_FORMAT:
+        result, unparsed = _parse_excel_serial(numbers_series, EXCEL_SERIAL_RANGE)
+        return result, unparsed, 'out_of_range_number'
+
+    numbers_series = numbers_series.astype(np.float64)
+    text = numbers_series.map(_number_text, na_action='ignore')
+    result = pd.to_datetime(text, format=date_format, errors='coerce', cache=True)
+    return result, numbers_series.notna() & result.isna(), 'unparsed_number'
+
+
+def _number_text(value):
+    """Запись числа для разбора по формату: целые числа без дробной части (2019, а не 2019.0)."""
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _parse_excel_serial(numbers_series, serial_range=EXCEL_SERIAL_RANGE):
+    """Переводит номера дней Excel в даты; номера вне диапазона serial_range дают NaT."""
+    serial = numbers_series.astype(np.float64)
+    in_range = serial.between(*serial_range)
+    out_of_range = serial.notna() & ~in_range
+    result = pd.Series(pd.NaT, index=serial.index, dtype='datetime64[ns]')
+    result[in_range] = EXCEL_EPOCH + pd.to_timedelta(serial[in_range], unit='D')
+
+    return result, out_of_range
+
+
+def merge_reports(reports):
+    """Объединяет отчеты parse_time_column по порциям одного столбца."""
+    merged = {'rows': 0, 'parsed': 0, 'dropped': 0, 'format': None, 'reasons': {}, 'examples': []}
+    for report in reports:
+        merged['rows'] += report['rows']
+        merged['parsed'] += report['parsed']
+        merged['dropped'] += report['dropped']
+        merged['format'] = merged['format'] or report['format']
+        for reason, count in report['reasons'].items():
+            merged['reasons'][reason] = merged['reasons'].get(reason, 0) + count
+        merged['examples'] = (merged['examples'] + report['examples'])[:5]
+
+    return merged
+
+
+def format_report(report):
+    """Краткое текстовое описание отчета parse_time_column."""
+    if not report['dropped']:
+        return f"Разобрано строк: {report['parsed']} из {report['rows']}"
+    reason_names = {
+        'empty': 'пустые значения',
+        'unparsed_text': 'текст не соответствует формату',
+        'out_of_range_number': 'число вне диапазона дат Excel (укажите формат, например %Y или serial)',
+        'unparsed_number': 'число не соответствует формату',
+        'other': 'значения другого типа',
+    }
+    reasons = ', '.join(f'{reason_names[reason]}: {count}' for reason, count in report['reasons'].items())
+    examples = f" (например: {', '.join(report['examples'])})" if report['examples'] else ''
+    return f"Отброшено строк: {report['dropped']} из {report['rows']} - {reasons}{examples}"
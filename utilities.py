@@ -1,29 +1,92 @@
 import datetime
+import logging
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 import os
 import re
 
+import dataset_cache
+import excel_loader
+import export
+import forecast_engine
+import ingestion
+import instrumentation
+import ols
+import time_parsing
 
+logger = logging.getLogger(__name__)
+
+
+@instrumentation.traced()
 def data_preparation(file, sheet, name_column_time, name_column_for_predict, name_column_factors,
-                     date_format='%d.%m.%Y'):
+                     date_format='%d.%m.%Y', streaming=False, disk_cache=False):
     """
     Подготавливает данные из файла Excel.
 
     Parameters:
-    - file: str, путь к файлу Excel
-    - sheet: str, название листа в файле Excel
+    - file: str, путь к файлу Excel, каталогу или шаблону пути (несколько книг читаются
+      параллельно и объединяются по времени, см. ingestion.read_sources)
+    - sheet: str, название листа в файле Excel (для нескольких книг '*' - все листы)
     - name_column_time: str, название столбца с временными метками
     - name_column_factors: list, список названий столбцов-факторов
+    - date_format: str, формат даты в столбце времени или 'auto' для автоматического определения
+    - streaming: bool, потоковое чтение листа порциями (для очень больших файлов)
+    - disk_cache: bool, использовать кэш подготовленных данных на диске (dataset_cache)
 
     Returns:
     - result_df: DataFrame, подготовленные данные
     """
-    result_data = []
+    usecols = [name_column_time, *name_column_factors, name_column_for_predict]
+    multi_source = ingestion.is_multi_source(file)
+    # Кэш на диске привязан к одному файлу
+    disk_cache = disk_cache and not multi_source
+
+    # Если файл не менялся, подготовленные данные берутся из кэша на диске
+    if disk_cache:
+        cached_df = dataset_cache.load_prepared(file, sheet, usecols, date_format)
+        if cached_df is not None:
+            return cached_df
+
+    # Чтение из Excel файла только нужных столбцов
+    if multi_source:
+        # Книги читаются в отдельных процессах, время разбирается там же, повторы меток удаляются
+        data = ingestion.read_sources(file, sheet, usecols=usecols, column_time=name_column_time,
+                                      date_format=date_format)
+    elif streaming:
+        # Даты и числа разбираются по порциям, весь лист в память не загружается
+        data = excel_loader.read_sheet_streaming(file, sheet, usecols=usecols, date_columns=[name_column_time],
+                                                 date_format=date_format)
+    else:
+        # Повторные чтения берутся из кэша
+        data = excel_loader.read_sheet(file, sheet, usecols=usecols)
+
+    result_df = prepare_frame(data, name_column_time, name_column_for_predict, name_column_factors, date_format)
+    if 'ingestion' in data.attrs:
+        result_df.attrs['ingestion'] = data.attrs['ingestion']
+
+    if disk_cache:
+        dataset_cache.save_prepared(result_df, file, sheet, usecols, date_format)
+
+    return result_df
+
+
+@instrumentation.traced()
+def prepare_frame(data, name_column_time, name_column_for_predict, name_column_factors, date_format='%d.%m.%Y'):
+    """
+    Подготавливает уже прочитанный лист: отбирает нужные столбцы и разбирает временные метки.
+
+    Parameters:
+    - data: DataFrame, данные листа Excel
+    - name_column_time: str, название столбца с временными метками
+    - name_column_for_predict: str, название прогнозируемого столбца
+    - name_column_factors: list, список названий столбцов-факторов
+    - date_format: str, формат даты в столбце времени или 'auto' для автоматического определения
 
-    # Чтение данных из Excel файла
-    data = pd.read_excel(file, sheet, engine='openpyxl')
+    Returns:
+    - result_df: DataFrame, подготовленные данные; отчет о разборе времени (сколько строк
+      отброшено и почему) хранится в result_df.attrs['time_parsing']
+    """
+    result_data = []
 
     # Преобразование времени
     data_time = data[name_column_time]
@@ -34,50 +97,110 @@ def data_preparation(file, sheet, name_column_time, name_column_for_predict, nam
         factor_data = data[factor]
         result_data.append(factor_data)
 
+    # Проверяем, есть ли среди факторов столбец, который мы планируем прогнозировать
+    if name_column_for_predict not in name_column_factors:
+        result_data.append(data[name_column_for_predict])
+
     # Собираем все данные в один DataFrame
     result_df = pd.concat(result_data, axis=1)
 
-    # Проверяем, есть ли в результирующих данных столбец, который мы планируем прогнозировать
-    if name_column_for_predict not in result_df.columns:
-        # Преобразование времени
-        result_df.append(data[name_column_for_predict])
-
-    # Удаление строк, где значение в столбце name_column_time отличается от дд.мм.гггг
-    result_df[name_column_time] = pd.to_datetime(result_df[name_column_time], format=date_format, errors='coerce')
+    # Разбор времени (строки, даты Excel, ячейки datetime); неразобранные строки удаляются
+    result_df[name_column_time], time_report = time_parsing.parse_time_column(result_df[name_column_time],
+                                                                              date_format)
+    # При потоковом чтении даты уже разобраны по порциям, отчет берется оттуда
+    time_report = data.attrs.get('time_parsing', {}).get(name_column_time, time_report)
+    if time_report['rows'] and not time_report['parsed']:
+        raise ValueError(f'Не удалось разобрать столбец времени {name_column_time}. '
+                         f'{time_parsing.format_report(time_report)}')
     result_df = result_df.dropna(subset=[name_column_time])
 
     result_df.reset_index(drop=True, inplace=True)  # Переиндексируем DataFrame
+    result_df.attrs['time_parsing'] = time_report
 
     return result_df
 
 
-def create_lags(data, columns, lag_count, need_create_lag_for_predictable, chosen_column_for_predict):
+def lag_depths(columns, lag_count):
+    """
+    Приводит количество лагов к словарю {столбец: глубина лага}.
+
+    Parameters:
+    - columns: список, столбцы, для которых создаются лаги
+    - lag_count: int или dict, одинаковое количество лагов для всех столбцов
+      либо своя глубина для каждого столбца (распределенные лаги)
+
+    Returns:
+    - dict, глубина лага для каждого столбца
+    """
+    if isinstance(lag_count, dict):
+        return {column: int(lag_count.get(column, 0)) for column in columns}
+    return {column: int(lag_count) for column in columns}
+
+
+@instrumentation.traced()
+def build_lag_matrix(data, lags, fill_value=np.nan, dtype=np.float64):
+    """
+    Строит все лаги всех столбцов сразу одним непрерывным блоком (по умолчанию float64).
+
+    Parameters:
+    - data: DataFrame, исходные данные
+    - lags: dict, глубина лага для каждого столбца {столбец: количество лагов}
+    - fill_value: float, значение для строк, у которых нет предыдущих значений
+    - dtype: тип блока лагов (например, np.float32 для экономии памяти)
+
+    Returns:
+    - DataFrame, столбцы '<столбец>_lag_<номер>' в порядке: столбец, затем лаги 1..N
+    """
+    row_count = len(data)
+    lag_columns = [(column, depth) for column, depth in lags.items() if depth > 0]
+    names = [f'{column}_lag_{lag}' for column, depth in lag_columns for lag in range(1, depth + 1)]
+    result = np.empty((row_count, len(names)), dtype=dtype)
+
+    position = 0
+    for column, depth in lag_columns if row_count else []:
+        values = data[column].to_numpy(dtype=dtype)
+        # Окно i содержит значения i-depth..i, лаг k берется из позиции depth-k
+        padded = np.concatenate([np.full(depth, fill_value, dtype=dtype), values])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, depth + 1)[:row_count]
+        result[:, position:position + depth] = windows[:, depth - 1::-1]
+        position += depth
+
+    return pd.DataFrame(result, index=data.index, columns=names, copy=False)
+
+
+def lag_columns(columns, need_create_lag_for_predictable, chosen_column_for_predict):
+    """
+    Отбирает столбцы, для которых create_lags создает лаги.
+
+    Returns:
+    - list, столбцы columns; прогнозируемый столбец остается, только если для него нужны лаги
+    """
+    return [column for column in columns if need_create_lag_for_predictable or column != chosen_column_for_predict]
+
+
+@instrumentation.traced()
+def create_lags(data, columns, lag_count, need_create_lag_for_predictable, chosen_column_for_predict,
+                dtype=np.float64):
     """
     Создает лаги для указанных столбцов данных.
 
     Parameters:
     - data: DataFrame, исходные данные
-    - columns: список, столбцы, для которых нужно создать лаги
-    - lag_count: int, количество лагов, которые необходимо создать
+    - columns: список, столбцы, для которых нужно создать лаги (не изменяется)
+    - lag_count: int или dict, количество лагов, которые необходимо создать
+      (dict задает свою глубину для каждого столбца)
+    - dtype: тип столбцов с лагами (см. memory_optimization.lag_dtype)
 
     Returns:
     - DataFrame, обновленные данные с добавленными лагами
     """
 
-    columns_for_created_lags = columns
-
     # Проверка необходимости создания лага для предсказываемых значений
-    if not need_create_lag_for_predictable:
-        columns_for_created_lags.remove(chosen_column_for_predict)
-
-    # Проходим по каждому столбцу
-    for column in columns_for_created_lags:
-        # Создаем лаги для каждого столбца
-        for lag in range(1, lag_count + 1):
-            # Формируем имя нового столбца с учетом лага
-            lag_column_name = f'{column}_lag_{lag}'
-            # Добавляем новый столбец с лагом
-            data[lag_column_name] = data[column].shift(lag)
+    columns_for_created_lags = lag_columns(columns, need_create_lag_for_predictable, chosen_column_for_predict)
+
+    # Все лаги создаются одной матрицей и добавляются к данным одним объединением
+    lag_data = build_lag_matrix(data, lag_depths(columns_for_created_lags, lag_count), dtype=dtype)
+    data = pd.concat([data.drop(columns=lag_data.columns, errors='ignore'), lag_data], axis=1)
 
     # Заменяем пропущенные значения в данных на 0
     data = data.fillna(0)
@@ -85,18 +208,17 @@ def create_lags(data, columns, lag_count, need_create_lag_for_predictable, chose
     return data
 
 
-def create_model(data, column_for_predict, column_factors, lag_count=1):
+def model_factor_names(column_for_predict, column_factors, lag_count=1):
     """
-    Создает и обучает модель на основе данных.
+    Формирует список столбцов модели: факторы и их лаги, без прогнозируемого столбца.
 
     Parameters:
-    - data: DataFrame, исходные данные
     - column_for_predict: str, название столбца, который мы хотим предсказать
     - column_factors: список, столбцы-факторы для модели
-    - lag_count: int, количество лагов для каждого фактора
+    - lag_count: int или dict, количество лагов для каждого фактора
 
     Returns:
-    - model: обученная модель
+    - list, названия столбцов матрицы X (без константы)
     """
     # Создаем список для хранения факторов и их лагов
     all_factors = []
@@ -105,8 +227,9 @@ def create_model(data, column_for_predict, column_factors, lag_count=1):
     all_factors.extend(column_factors)
 
     # Добавляем колонны с лагами
+    depths = lag_depths(column_factors, lag_count)
     for column in column_factors:
-        for lag in range(1, lag_count + 1):
+        for lag in range(1, depths[column] + 1):
             lag_column_name = f'{column}_lag_{lag}'
             all_factors.append(lag_column_name)
 
@@ -114,20 +237,38 @@ def create_model(data, column_for_predict, column_factors, lag_count=1):
     if column_for_predict in all_factors:
         all_factors.remove(column_for_predict)
 
-    # Выводим в консоль для проверки
-    # print(all_factors)
-    # print(column_for_predict)
+    return all_factors
+
+
+@instrumentation.traced()
+def create_model(data, column_for_predict, column_factors, lag_count=1, backend='lstsq'):
+    """
+    Создает и обучает модель на основе данных.
+
+    Parameters:
+    - data: DataFrame, исходные данные
+    - column_for_predict: str, название столбца, который мы хотим предсказать
+    - column_factors: список, столбцы-факторы для модели
+    - lag_count: int или dict, количество лагов для каждого фактора
+    - backend: str, способ оценки: 'lstsq' (быстрая оценка NumPy, по умолчанию)
+      или 'statsmodels' (полная диагностика, statsmodels загружается только в этом случае)
+
+    Returns:
+    - model: обученная модель (params содержит 'const' и коэффициенты факторов)
+    """
+    all_factors = model_factor_names(column_for_predict, column_factors, lag_count)
 
     # Создание матрицы X и вектора Y
-    X = data[all_factors]
-    X = sm.add_constant(X)
+    X = data[all_factors].copy()
+    X.insert(0, 'const', 1.0)
     y = data[column_for_predict]
     # Оценка параметров с использованием МНК
-    model = sm.OLS(y, X).fit()
+    model = ols.fit(X, y, backend)
 
     return model
 
 
+@instrumentation.traced()
 def separation_data(data, percent):
     """
     Разделяет данные на обучающую и тестовую выборки.
@@ -149,6 +290,7 @@ def separation_data(data, percent):
     return data_learn, data_test
 
 
+@instrumentation.traced()
 def calculate_mape(df, actual_column):
     """
     Рассчитывает коэффициент MAPE (Mean Absolute Percentage Error) для прогноза и добавляет его в DataFrame.
@@ -160,13 +302,16 @@ def calculate_mape(df, actual_column):
 
     Returns:
     - float. Среднее значение коэффициента MAPE.
+
+    Строки с нулевым фактическим значением получают пустой MAPE и не входят в среднее,
+    как в metrics.evaluate (раньше они учитывались как нулевая ошибка и занижали MAPE).
     """
 
     forecast_column = f'Прогноз {actual_column}'
 
     # Рассчитываем MAPE для каждой строки в DataFrame
     df['MAPE'] = np.where(df[actual_column] != 0,
-                          abs((df[actual_column] - df[forecast_column]) / df[actual_column]) * 100, 0)
+                          abs((df[actual_column] - df[forecast_column]) / df[actual_column]) * 100, np.nan)
 
     # Рассчитываем среднее значение MAPE
     average_mape = df['MAPE'].mean()
@@ -174,7 +319,8 @@ def calculate_mape(df, actual_column):
     return average_mape
 
 
-def learn_on_params(data, params_train, len_dataset_learn, chosen_column_for_predict):
+@instrumentation.traced()
+def learn_on_params(data, params_train, len_dataset_learn, chosen_column_for_predict, categorical_labels=False):
     """
     Прогнозирует значения на основе обученных параметров для заданного процента тестовых данных.
 
@@ -182,39 +328,17 @@ def learn_on_params(data, params_train, len_dataset_learn, chosen_column_for_pre
     - data: DataFrame. Данные для прогноза.
     - params_train: dict. Обученные параметры, включая 'const' и другие параметры модели.
     - len_dataset_learn: int. Процент данных, используемых для обучения (от 1 до 100).
+    - categorical_labels: bool. Хранить метку 'Тип данных' как Categorical (экономия памяти).
 
     Returns:
     - DataFrame. Данные с добавленным столбцом 'Прогноз' и меткой 'Тип данных'.
     """
-    split_index = int(len(data) * (len_dataset_learn / 100))
-    # Инициализация переменных
-    forecast_values = []
-
-    # Извлечение выбранных параметров из params_train
-    const_param = params_train.get('const', 0)
-    selected_params = list(params_train.keys())[1:]  # Исключаем 'const'
-
-    # Прогнозирование для каждой строки в тестовой выборке
-    for index, row in data.iterrows():
-        # Прогнозирование с использованием выбранных параметров
-        forecast = const_param + sum(params_train[param] * row[param] for param in selected_params)
-        forecast_values.append(forecast)
-
-    # Добавление прогнозных значений в DataFrame
-    data[f'Прогноз {chosen_column_for_predict}'] = forecast_values
-
-    # Присвоение значения для обучающей выборки
-    data.loc[0:split_index - 1, 'Тип данных'] = 'Обучающая'
-
-    # Присвоение значения для тестовой выборки
-    data.loc[split_index:, 'Тип данных'] = 'Тестовая'
-
-    # Преобразование столбца 'Тип данных' к строковому типу
-    data['Тип данных'] = data['Тип данных'].astype(str)
-
-    return data
+    # Прогноз для всех строк считается одним матричным умножением (см. forecast_engine)
+    return forecast_engine.learn_on_params_vectorized(data, params_train, len_dataset_learn,
+                                                      chosen_column_for_predict, categorical_labels)
 
 
+@instrumentation.traced()
 def create_predict_one_day(data, params_train, chosen_column_for_predict):
     # Создаем копию последней строки
     new_row = data.iloc[-1].copy()
@@ -228,10 +352,10 @@ def create_predict_one_day(data, params_train, chosen_column_for_predict):
 
     # Добавляем значение прогноза в столбец
     new_column_name = f'Прогноз {chosen_column_for_predict}'
-    data[new_column_name].iloc[-1] = forecast
+    data.loc[data.index[-1], new_column_name] = forecast
 
     # Маркируем тип данных как 'Прогноз 1-го дня'
-    data['Тип данных'].iloc[-1] = 'Прогноз 1-го дня'
+    data.loc[data.index[-1], 'Тип данных'] = 'Прогноз 1-го дня'
 
     # Маркировка столбцов, которые испльзкуются в качестве фактора в модели *название*'_P'
     data = rename_columns_with_suffix(data, selected_params)
@@ -303,21 +427,28 @@ def process_string_filename(input_string):
     return processed_string
 
 
-def write_to_excel(data, output_file, output_directory=None, file_format="xlsx", sheet="Prediction"):
+@instrumentation.traced()
+def write_to_excel(data, output_file, output_directory=None, file_format="xlsx", sheet="Prediction",
+                   compression=None):
     """
-    Записывает данные в файл Excel или CSV.
+    Записывает данные в файл Excel, CSV, Parquet или Feather (см. модуль export).
 
     Parameters:
     - data: DataFrame. Данные для записи.
     - output_file: str. Имя файла (без расширения).
     - output_directory: str, optional. Директория для сохранения файла. Если не указана, используется текущая директория.
-    - file_format: str, optional. Формат файла: "xlsx" (по умолчанию) или "csv".
+    - file_format: str, optional. Формат файла: "xlsx" (по умолчанию), "csv", "parquet" или "feather".
+    - sheet: str, optional. Название листа (только для xlsx).
+    - compression: str, optional. Сжатие файла (см. export.COMPRESSIONS), по умолчанию без сжатия.
 
     Returns:
-    - result_write: str. Сообщение о результате операции записи.
+    - result_write: dict. Результат записи ('Result'), путь к файлу ('Path') или текст ошибки ('Error').
     """
+    result_write = {'Result': False, 'Path': None}
 
     try:
+        file_format = export.check_format(file_format, compression)
+
         # Обработка имени файла
         if not output_file.startswith('Prediction '):
             output_file = 'Prediction ' + output_file
@@ -338,21 +469,14 @@ def write_to_excel(data, output_file, output_directory=None, file_format="xlsx",
         current_datetime = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         file_name = f'{output_file}_{current_datetime}'
 
-        # Выбираем формат файла
-        file_extension = 'xlsx' if file_format.lower() == 'xlsx' else 'csv'
-
-        # Составляем полный путь к файлу в текущей директории с учетом формата
-        full_path = os.path.join(current_directory, f'{file_name}.{file_extension}')
-        # Записываем данные в файл
-        if file_extension == 'xlsx':
-            data.to_excel(full_path, sheet_name=sheet, index=False)
-        elif file_extension == 'csv':
-            data.to_csv(full_path, sheet_name=sheet, index=False)
+        # Составляем полный путь к файлу с учетом формата и сжатия и записываем данные
+        full_path = export.output_path(current_directory, file_name, file_format, compression)
+        export.export_frame(data, full_path, file_format, sheet, compression)
 
-        result_write = dict()
         result_write['Result'] = True
         result_write['Path'] = full_path
     except Exception as e:
-        result_write['Result'] = False
+        logger.exception("Exception occurred: %s", e)
+        result_write['Error'] = str(e)
 
     return result_write